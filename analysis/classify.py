@@ -1,3 +1,5 @@
+import numpy as np
+
 def classify_effect(track):
     dx = track["avg_dx"]
     dy = track["avg_dy"]
@@ -17,3 +19,20 @@ def classify_effect(track):
 
     # Fallback
     return "unknown", "low"
+
+
+def classify_effects(avg_dx, avg_dy, motion_ratio):
+    # Vectorized classify_effect over whole track columns; returns arrays of
+    # effect types and confidences, rule for rule the same as above
+    adx, ady = np.abs(avg_dx), np.abs(avg_dy)
+    sticky = (adx < 0.5) & (ady < 0.5)
+    parallax = ~sticky & (ady > adx) & (motion_ratio < 0.6)
+    horizontal = ~sticky & ~parallax & (adx > ady)
+
+    effects = np.select(
+        [sticky, parallax, horizontal],
+        ["sticky", "parallax", "horizontal_translate"],
+        "unknown"
+    )
+    confidence = np.select([sticky, parallax | horizontal], ["high", "medium"], "low")
+    return effects, confidence
@@ -1,38 +1,91 @@
-from analysis.classify import classify_effect
+import numpy as np
+from analysis.classify import classify_effect, classify_effects
 
-def build_frame_scroll_map(scroll_log, total_frames):
+def build_frame_scroll_map(scroll_log, total_frames, frame_times=None):
+    # Returns an array indexed by frame: the scroll position at that frame
     if not scroll_log:
-        return {}
-    
+        return np.empty(0)
+
+    if frame_times is not None and len(frame_times) == total_frames:
+        log_times = np.array([e["time"] for e in scroll_log], dtype=float)
+        log_scroll = np.array([e["scrollY"] for e in scroll_log], dtype=float)
+        order = np.argsort(log_times, kind="stable")
+        return np.interp(np.asarray(frame_times, dtype=float),
+                         log_times[order], log_scroll[order])
+
+    # No timestamps: assume frames are spread evenly over the scroll
     max_scroll = scroll_log[-1]['scrollY']
-    frame_scroll = {}
-    
-    for i in range(total_frames):
-        ratio = i / max(1, total_frames - 1)
-        frame_scroll[i] = ratio * max_scroll
-        
-    return frame_scroll
+    return np.linspace(0, max_scroll, total_frames) if total_frames > 1 else np.zeros(total_frames)
+
+def scroll_offsets(samples, scroll_log, scale=1.0):
+    # Yields the scroll position, in video pixels, of each analyzed frame.
+    # samples is read lazily, so it can be the list with_samples is still
+    # filling. The measured actualScrollY is preferred over step targets
+    entries = sorted(scroll_log, key=lambda e: e["time"])
+    log_times = np.array([e["time"] for e in entries], dtype=float)
+    log_scroll = np.array([e.get("actualScrollY", e["scrollY"]) for e in entries], dtype=float)
+
+    i = 0
+    while True:
+        yield scale * float(np.interp(samples[i][1], log_times, log_scroll))
+        i += 1
 
 def attach_scroll_to_tracks(tracks, frame_scroll_map):
-    enriched = []
+    if not tracks:
+        return []
 
-    for t in tracks:
-        scroll_positions = [
-            frame_scroll_map.get(f) for f in t["frames"]
-            if f in frame_scroll_map
-        ]
+    lengths = np.array([len(t["frames"]) for t in tracks])
+    frames = np.fromiter(
+        (f for t in tracks for f in t["frames"]), dtype=np.int64, count=lengths.sum()
+    )
+
+    # One gather for every track frame; frames past the map become NaN and
+    # are ignored by the per-track min/max
+    valid = (frames >= 0) & (frames < len(frame_scroll_map))
+    positions = np.full(len(frames), np.nan)
+    positions[valid] = frame_scroll_map[frames[valid]]
 
-        if not scroll_positions:
+    offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    nonempty = lengths > 0
+    starts = np.full(len(tracks), np.nan)
+    ends = np.full(len(tracks), np.nan)
+    starts[nonempty] = np.fmin.reduceat(positions, offsets[nonempty])
+    ends[nonempty] = np.fmax.reduceat(positions, offsets[nonempty])
+
+    enriched = []
+    for t, start, end in zip(tracks, starts, ends):
+        if np.isnan(start):
             continue
 
         enriched.append({
             **t,
-            "scroll_start": min(scroll_positions),
-            "scroll_end": max(scroll_positions)
+            "scroll_start": float(start),
+            "scroll_end": float(end)
         })
 
     return enriched
 
+def attach_scroll_columns(tracks, frame_scroll_map):
+    # attach_scroll_to_tracks over a TrackColumns table: adds scroll_start
+    # and scroll_end and drops tracks with no frame inside the map
+    if not len(tracks):
+        return tracks
+
+    frames = tracks["frames"]
+    lengths = frames.lengths()
+    valid = (frames.values >= 0) & (frames.values < len(frame_scroll_map))
+    positions = np.full(len(frames.values), np.nan)
+    positions[valid] = frame_scroll_map[frames.values[valid]]
+
+    nonempty = lengths > 0
+    starts = np.full(len(tracks), np.nan)
+    ends = np.full(len(tracks), np.nan)
+    starts[nonempty] = np.fmin.reduceat(positions, frames.offsets[:-1][nonempty])
+    ends[nonempty] = np.fmax.reduceat(positions, frames.offsets[:-1][nonempty])
+
+    keep = ~np.isnan(starts)
+    return tracks.with_columns(scroll_start=starts, scroll_end=ends).select(keep)
+
 def compute_motion_ratio(track):
     scroll_delta = max(1, track["scroll_end"] - track["scroll_start"])
     motion_delta = abs(track["avg_dy"]) + abs(track["avg_dx"])
@@ -60,3 +113,36 @@ def build_effects(tracks):
         })
 
     return effects
+
+def compute_motion_ratios(scroll_start, scroll_end, avg_dx, avg_dy):
+    # Vectorized compute_motion_ratio
+    scroll_delta = np.maximum(1, scroll_end - scroll_start)
+    return (np.abs(avg_dy) + np.abs(avg_dx)) / scroll_delta
+
+def build_effects_columns(tracks):
+    # build_effects over a TrackColumns table. Only the effects themselves
+    # become dicts; the rounding matches the per-track version exactly
+    if not len(tracks):
+        return []
+
+    ratios = compute_motion_ratios(
+        tracks["scroll_start"], tracks["scroll_end"], tracks["avg_dx"], tracks["avg_dy"]
+    )
+    effects, confidence = classify_effects(tracks["avg_dx"], tracks["avg_dy"], ratios)
+    keep = np.flatnonzero(effects != "unknown")
+
+    return [
+        {
+            "type": effect,
+            "scroll_range": [round(start, 1), round(end, 1)],
+            "motion_ratio": round(ratio, 3),
+            "confidence": conf
+        }
+        for effect, start, end, ratio, conf in zip(
+            effects[keep].tolist(),
+            tracks["scroll_start"][keep].tolist(),
+            tracks["scroll_end"][keep].tolist(),
+            ratios[keep].tolist(),
+            confidence[keep].tolist()
+        )
+    ]
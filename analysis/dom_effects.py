@@ -0,0 +1,79 @@
+import numpy as np
+
+def element_series(deltas):
+    # Forward-fills the incremental DOM deltas into (samples x elements)
+    # arrays of viewport-space centers; NaN where an element is absent
+    ids = sorted({i for d in deltas for i in d["id"]} | {i for d in deltas for i in d["removed"]})
+    column = {element_id: c for c, element_id in enumerate(ids)}
+    n, m = len(deltas), len(ids)
+
+    cx = np.full((n, m), np.nan)
+    cy = np.full((n, m), np.nan)
+    bottom = np.full((n, m), np.nan)
+    written = np.zeros((n, m), dtype=bool)
+
+    for k, d in enumerate(deltas):
+        cols = [column[i] for i in d["id"]]
+        x, y, w, h = (np.asarray(d[key], dtype=float) for key in ("x", "y", "w", "h"))
+        cx[k, cols] = x + w / 2
+        cy[k, cols] = y + h / 2
+        bottom[k, cols] = y + h
+        written[k, cols] = True
+        # Removal is written as NaN so it is carried forward too
+        written[k, [column[i] for i in d["removed"]]] = True
+
+    last_write = np.where(written, np.arange(n)[:, None], 0)
+    np.maximum.accumulate(last_write, axis=0, out=last_write)
+    cols = np.arange(m)
+
+    return {
+        "ids": ids,
+        "tags": {i: tag for d in deltas for i, tag in zip(d["id"], d["tag"])},
+        "scroll": np.array([d["scrollY"] for d in deltas], dtype=float),
+        "viewport_height": np.array([d.get("viewportHeight", np.inf) for d in deltas], dtype=float),
+        "cx": cx[last_write, cols],
+        "cy": cy[last_write, cols],
+        "bottom": bottom[last_write, cols]
+    }
+
+def summarize_elements(deltas, min_samples=3, min_travel=1.0):
+    # Builds summarize_tracks/attach_scroll_to_tracks-compatible tracks for
+    # elements that move relative to the document while on screen.
+    # Content that simply scrolls with the page keeps a constant document
+    # position and is skipped, like static content in the video diff
+    if not deltas:
+        return []
+
+    series = element_series(deltas)
+    scroll = series["scroll"]
+    cx, cy = series["cx"], series["cy"]
+    top = 2 * cy - series["bottom"]
+
+    visible = (
+        ~np.isnan(cx)
+        & (series["bottom"] > 0)
+        & (top < series["viewport_height"][:, None])
+    )
+    doc_y = cy + scroll[:, None]
+
+    tracks = []
+    for c, element_id in enumerate(series["ids"]):
+        rows = np.flatnonzero(visible[:, c])
+        if len(rows) < min_samples:
+            continue
+
+        travel = max(np.ptp(doc_y[rows, c]), np.ptp(cx[rows, c]))
+        if travel < min_travel:
+            continue
+
+        tracks.append({
+            "track_id": element_id,
+            "tag": series["tags"].get(element_id),
+            "avg_dx": float(np.diff(cx[rows, c]).mean()),
+            "avg_dy": float(np.diff(cy[rows, c]).mean()),
+            "frames": rows.tolist(),
+            "scroll_start": float(scroll[rows].min()),
+            "scroll_end": float(scroll[rows].max())
+        })
+
+    return tracks
@@ -1,24 +1,114 @@
 import cv2
 import os
+from pipeline import profiling
+
+def count_frames(video_path):
+    cap = cv2.VideoCapture(video_path)
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    return max(0, total)
+
+def frame_size(video_path):
+    cap = cv2.VideoCapture(video_path)
+    size = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    cap.release()
+    return size
+
+def iter_frames(video_path, every_n_frames=3, grayscale=True, debug_dir=None,
+                start=0, stop=None):
+    if debug_dir:
+        os.makedirs(debug_dir, exist_ok=True)
 
-def extract_frames(video_path, output_dir, every_n_frames=3):
-    os.makedirs(output_dir, exist_ok=True)
     cap = cv2.VideoCapture(video_path)
-    
     frame_idx = 0
+    profile = profiling.enabled
+
+    if start > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+        frame_idx = start
+
+    try:
+        while cap.isOpened() and (stop is None or frame_idx < stop):
+            # grab() skips the color conversion for frames we drop
+            if not cap.grab():
+                break
+
+            if frame_idx % every_n_frames == 0:
+                ret, frame = cap.retrieve()
+                if not ret:
+                    break
+
+                if debug_dir:
+                    with profiling.span("write_png"):
+                        cv2.imwrite(f"{debug_dir}/frame_{frame_idx:04d}.png", frame)
+
+                if profile:
+                    profiling.count("frames decoded")
+
+                if grayscale:
+                    frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+                # Presentation timestamp in seconds since the start of the video
+                yield frame_idx, cap.get(cv2.CAP_PROP_POS_MSEC) / 1000, frame
+
+            frame_idx += 1
+    finally:
+        cap.release()
+
+def with_times(frames, times):
+    # Passes decoded frames through, collecting their timestamps into `times`
+    for _, t, frame in frames:
+        times.append(t)
+        yield frame
+
+def with_samples(frames, samples):
+    # Like with_times, but collects (frame_idx, timestamp) pairs so frames
+    # kept by a sampler can be mapped back to the source video
+    for frame_idx, t, frame in frames:
+        samples.append((frame_idx, t))
+        yield frame
+
+def frame_change(thumb_a, thumb_b):
+    # Mean absolute difference per pixel, on the 0-255 scale
+    return cv2.norm(thumb_a, thumb_b, cv2.NORM_L1) / thumb_a.size
+
+def thumbnail(frame, width=64):
+    if frame.ndim == 3:
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    h, w = frame.shape
+    return cv2.resize(frame, (width, max(1, h * width // w)), interpolation=cv2.INTER_AREA)
+
+def adaptive_frames(frames, min_change=0.5, max_gap=30, thumb_width=64):
+    # Filters (frame_idx, timestamp, frame) tuples from a dense stream. A
+    # frame is kept once its thumbnail differs from the last kept one by
+    # min_change or more, so near-duplicates (settle waits) are dropped and
+    # fast scrolling keeps every frame. max_gap bounds the source frames
+    # between kept ones. The first and last frames are always kept, so
+    # segments sampled separately still share their boundary frame
+    last_thumb = None
+    last_kept = None
+    dropped = None
+    profile = profiling.enabled
+
+    for frame_idx, t, frame in frames:
+        thumb = thumbnail(frame, thumb_width)
+
+        if (last_thumb is None or frame_idx - last_kept >= max_gap
+                or frame_change(thumb, last_thumb) >= min_change):
+            last_thumb = thumb
+            last_kept = frame_idx
+            dropped = None
+            yield frame_idx, t, frame
+        else:
+            dropped = (frame_idx, t, frame)
+            if profile:
+                profiling.count("frames dropped")
+
+    if dropped is not None:
+        yield dropped
+
+def extract_frames(video_path, output_dir, every_n_frames=3):
     saved = 0
-    
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            break
-        
-        if frame_idx % every_n_frames == 0:
-            path = f"{output_dir}/frame_{frame_idx:04d}.png"
-            cv2.imwrite(path, frame)
-            saved += 1
-            
-        frame_idx += 1
-    
-    cap.release()
-    return saved
\ No newline at end of file
+    for _ in iter_frames(video_path, every_n_frames, grayscale=False, debug_dir=output_dir):
+        saved += 1
+    return saved
@@ -1,15 +1,113 @@
 import cv2
 import numpy as np
+from pipeline import profiling
+from analysis.tracks import TrackStore, summarize_store
 
 
+def to_gray(frame, out=None):
+    if frame.ndim == 2:
+        if out is None:
+            return frame
+        out[...] = frame
+        return out
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=out)
+
+def gray_stack(frames, out=None):
+    frames = np.asarray(frames)
+    if out is None:
+        out = np.empty(frames.shape[:3], dtype=np.uint8)
+
+    for i in range(len(frames)):
+        to_gray(frames[i], out=out[i])
+
+    return out
+
+def shift_rows(frame, dy, fill, out=None):
+    # Moves frame's content up by dy rows (down if negative), as scrolling
+    # down by dy would. Rows scrolled into view are copied from fill
+    h = frame.shape[0]
+    if out is None:
+        out = np.empty_like(frame)
+
+    if dy >= h or -dy >= h:
+        out[:] = fill
+    elif dy > 0:
+        out[:h - dy] = frame[dy:]
+        out[h - dy:] = fill[h - dy:]
+    elif dy < 0:
+        out[-dy:] = frame[:h + dy]
+        out[:-dy] = fill[:-dy]
+    else:
+        out[:] = frame
+    return out
+
+_windows = {}
+
+def _shift_cost(frame_a, frame_b, dy):
+    # Mean absolute difference of the rows both frames share after a dy scroll
+    h = frame_a.shape[0]
+    if dy >= 0:
+        a, b = frame_a[dy:], frame_b[:h - dy]
+    else:
+        a, b = frame_a[:h + dy], frame_b[-dy:]
+    return cv2.norm(a, b, cv2.NORM_L1) / max(1, a.size)
+
+def estimate_scroll_shift(frame_a, frame_b, level=2, min_response=0.05):
+    # Rows the page scrolled between two grayscale frames. Phase correlation
+    # runs on a copy downsampled `level` times, then the estimate is refined
+    # to the whole-pixel shift with the smallest difference. Weak peaks (no
+    # dominant translation) count as no scroll
+    while level > 0 and min(frame_a.shape) >> level < 64:
+        level -= 1
+    small_a, small_b = downsample(frame_a, level), downsample(frame_b, level)
+
+    h, w = small_a.shape
+    if (h, w) not in _windows:
+        _windows[(h, w)] = cv2.createHanningWindow((w, h), cv2.CV_32F)
+
+    (_, dy), response = cv2.phaseCorrelate(np.float32(small_a), np.float32(small_b), _windows[(h, w)])
+    if response < min_response:
+        return 0
+
+    coarse = -int(round(dy * 2 ** level))
+    if level == 0:
+        return coarse
+    return refine_shift(frame_a, frame_b, coarse, 2 ** level)
+
+def refine_shift(frame_a, frame_b, estimate, radius):
+    # The whole-pixel shift within radius of estimate with the smallest
+    # difference between the frames
+    limit = frame_a.shape[0] - 1
+    candidates = range(max(-limit, estimate - radius), min(limit, estimate + radius) + 1)
+    return min(candidates, key=lambda s: _shift_cost(frame_a, frame_b, s))
+
+def diff_frame_stack(frames, threshold=25, out=None, shifts=None, aligned=None):
+    # frames: (N, H, W[, 3]) stack; returns the N-1 masks between neighbours.
+    # With shifts (N-1 row offsets) each earlier frame is first scrolled to
+    # line up with the next, so content moving with the page cancels out
+    gray = frames if frames.ndim == 3 else gray_stack(frames)
+    n, h, w = gray.shape
+    if out is None:
+        out = np.empty((n - 1, h, w), dtype=np.uint8)
+
+    previous = gray[:-1]
+    if shifts is not None:
+        if aligned is None:
+            aligned = np.empty((n - 1, h, w), dtype=np.uint8)
+        for i, dy in enumerate(shifts):
+            shift_rows(gray[i], int(dy), gray[i + 1], out=aligned[i])
+        previous = aligned[:n - 1]
+
+    # Viewing each frame as one row lets a single absdiff/threshold pass
+    # cover every pair in the stack
+    flat = out.reshape(n - 1, h * w)
+    cv2.absdiff(gray[1:].reshape(n - 1, h * w), previous.reshape(n - 1, h * w), dst=flat)
+    cv2.threshold(flat, threshold, 255, cv2.THRESH_BINARY, dst=flat)
+
+    return out
+
 def diff_frames(frame_a, frame_b, threshold=25):
-    gray_a = cv2.cvtColor(frame_a, cv2.COLOR_BGR2GRAY)
-    gray_b = cv2.cvtColor(frame_b, cv2.COLOR_BGR2GRAY)
-    
-    diff = cv2.absdiff(gray_a, gray_b)
-    _, thresh = cv2.threshold(diff, threshold, 255, cv2.THRESH_BINARY)
-    
-    return thresh
+    return diff_frame_stack(np.stack([to_gray(frame_a), to_gray(frame_b)]), threshold)[0]
 
 def extract_motion_regions(diff_mask, min_area=500):
     contours, _ = cv2.findContours(
@@ -25,7 +123,221 @@ def extract_motion_regions(diff_mask, min_area=500):
             
     return regions
 
-def track_regions(region_sequences, max_dist=40):
+def extract_motion_regions_stack(diff_masks, min_area=500):
+    return [extract_motion_regions(mask, min_area) for mask in diff_masks]
+
+def downsample(gray, pyramid_level):
+    for _ in range(pyramid_level):
+        gray = cv2.pyrDown(gray)
+    return gray
+
+def scale_regions(regions, pyramid_level):
+    s = 2 ** pyramid_level
+    return [(x * s, y * s, w * s, h * s) for x, y, w, h in regions]
+
+def pyramid_params(pyramid_level, min_area=500, max_dist=40):
+    # Areas shrink by 4x per level. Boxes are mapped back to full resolution,
+    # so max_dist only widens by the coordinate error of one coarse pixel
+    return min_area / 4 ** pyramid_level, max_dist + 2 ** pyramid_level - 1
+
+def refine_regions(frame_a, frame_b, regions, threshold=25, min_area=500, pad=8):
+    h, w = frame_a.shape[:2]
+    refined = []
+
+    for x, y, rw, rh in regions:
+        x0, y0 = max(0, x - pad), max(0, y - pad)
+        x1, y1 = min(w, x + rw + pad), min(h, y + rh + pad)
+        diff = diff_frames(frame_a[y0:y1, x0:x1], frame_b[y0:y1, x0:x1], threshold)
+        for fx, fy, fw, fh in extract_motion_regions(diff, min_area):
+            refined.append((fx + x0, fy + y0, fw, fh))
+
+    return refined
+
+def detect_motion(frames, threshold=25, min_area=500, batch_size=8,
+                  pyramid_level=0, refine=False, compensate=False, offsets=None):
+    # Streams `frames` through a fixed (batch_size + 1)-frame buffer; the last
+    # frame of each batch is carried over as the first of the next.
+    # With pyramid_level > 0 masks are computed on a downsampled copy and
+    # boxes are returned in full-resolution coordinates.
+    # compensate=True removes page scrolling before diffing, using the
+    # vertical shift found by phase correlation; alternatively offsets
+    # gives each frame's scroll position in full-resolution pixels (read
+    # one per frame, after the frame) and the shift is their difference
+    coarse_area = pyramid_params(pyramid_level, min_area)[0]
+    refine = refine and pyramid_level > 0
+    scale = 2 ** pyramid_level
+    offsets = iter(offsets) if offsets is not None else None
+    compensate = compensate or offsets is not None
+    stack = None
+    masks = None
+    full = None
+    aligned = None
+    frame_offsets = np.zeros(batch_size + 1)
+    shifts = np.zeros(batch_size, dtype=np.int64)
+    # Shifts at full resolution for refining; coarse shifts are only
+    # accurate to a pyramid pixel
+    full_shifts = np.zeros(batch_size, dtype=np.int64)
+    filled = 0
+
+    def flush(n):
+        # Regions are built before yielding so the span excludes the consumer
+        with profiling.span("diff_batch", frames=n):
+            if compensate:
+                for i in range(n - 1):
+                    if offsets is not None:
+                        full_shifts[i] = round(frame_offsets[i + 1] - frame_offsets[i])
+                        shifts[i] = round(full_shifts[i] / scale)
+                    else:
+                        shifts[i] = estimate_scroll_shift(stack[i], stack[i + 1])
+                        if refine:
+                            full_shifts[i] = refine_shift(full[i], full[i + 1], int(shifts[i]) * scale, scale)
+
+            diff_frame_stack(stack[:n], threshold, out=masks[:n - 1],
+                             shifts=shifts[:n - 1] if compensate else None, aligned=aligned)
+            batch = []
+            for i, regions in enumerate(extract_motion_regions_stack(masks[:n - 1], coarse_area)):
+                regions = scale_regions(regions, pyramid_level)
+                if refine:
+                    previous = full[i]
+                    if compensate:
+                        previous = shift_rows(full[i], int(full_shifts[i]), full[i + 1])
+                    regions = refine_regions(previous, full[i + 1], regions, threshold,
+                                             min_area, pad=scale)
+                batch.append(regions)
+
+        if profiling.enabled:
+            for regions in batch:
+                profiling.gauge("regions per frame", len(regions))
+        yield from batch
+
+    for frame in frames:
+        gray = to_gray(frame)
+        small = downsample(gray, pyramid_level)
+
+        if stack is None:
+            h, w = small.shape
+            stack = np.empty((batch_size + 1, h, w), dtype=np.uint8)
+            masks = np.empty((batch_size, h, w), dtype=np.uint8)
+            if refine:
+                full = np.empty((batch_size + 1,) + gray.shape, dtype=np.uint8)
+            if compensate:
+                aligned = np.empty((batch_size, h, w), dtype=np.uint8)
+
+        stack[filled] = small
+        if refine:
+            full[filled] = gray
+        if offsets is not None:
+            frame_offsets[filled] = next(offsets)
+        filled += 1
+
+        if filled == batch_size + 1:
+            yield from flush(filled)
+            stack[0] = stack[-1]
+            frame_offsets[0] = frame_offsets[-1]
+            if refine:
+                full[0] = full[-1]
+            filled = 1
+
+    if filled > 1:
+        yield from flush(filled)
+
+def _new_track(track_id, frame_idx, center):
+    return {
+        "id": track_id,
+        "frames": [frame_idx],
+        "centers": [center],
+        "last_center": center
+    }
+
+class RegionTracker:
+    # Incremental tracker: update() takes one frame's regions at a time, so
+    # tracking can keep up with a live frame stream. Only tracks matched
+    # within the last `max_age` frames are candidates. Candidates come from
+    # a grid of max_dist-sized cells, and matches are assigned nearest-pair
+    # first so each track takes at most one region
+    def __init__(self, max_dist=40, max_age=5):
+        self.max_dist = max_dist
+        self.max_age = max_age
+        self.tracks = []
+        self.active = []
+        self.frame_idx = 0
+        self.profile = profiling.enabled
+        # Every match, in arrival order, as flat columns for store()
+        self.observed = ([], [], [], [])
+
+    def update(self, regions):
+        frame_idx = self.frame_idx
+        max_dist = self.max_dist
+        tracks = self.tracks
+        self.frame_idx += 1
+
+        active = [t for t in self.active if frame_idx - t["frames"][-1] <= self.max_age]
+        self.active = active
+        if self.profile:
+            profiling.gauge("active tracks", len(active))
+
+        grid = {}
+        for t in active:
+            px, py = t["last_center"]
+            grid.setdefault((int(px // max_dist), int(py // max_dist)), []).append(t)
+
+        centers = [(x + w/2, y + h/2) for x, y, w, h in regions]
+        pairs = []
+
+        for ri, (cx, cy) in enumerate(centers):
+            gx, gy = int(cx // max_dist), int(cy // max_dist)
+            for nx in (gx - 1, gx, gx + 1):
+                for ny in (gy - 1, gy, gy + 1):
+                    for t in grid.get((nx, ny), ()):
+                        px, py = t["last_center"]
+                        if abs(cx-px) < max_dist and abs(cy-py) < max_dist:
+                            pairs.append(((cx-px)**2 + (cy-py)**2, ri, t["id"], t))
+
+        pairs.sort(key=lambda p: p[:3])
+        used_regions = set()
+        used_tracks = set()
+        ids, frames, xs, ys = self.observed
+
+        for _, ri, tid, t in pairs:
+            if ri in used_regions or tid in used_tracks:
+                continue
+            used_regions.add(ri)
+            used_tracks.add(tid)
+            center = centers[ri]
+            t["frames"].append(frame_idx)
+            t["centers"].append(center)
+            t["last_center"] = center
+            ids.append(tid)
+            xs.append(center[0])
+            ys.append(center[1])
+
+        for ri, center in enumerate(centers):
+            if ri not in used_regions:
+                t = _new_track(len(tracks), frame_idx, center)
+                tracks.append(t)
+                active.append(t)
+                ids.append(t["id"])
+                xs.append(center[0])
+                ys.append(center[1])
+
+        frames.extend([frame_idx] * (len(ids) - len(frames)))
+
+    def store(self):
+        # Columnar copy of the tracks so far; callable mid-stream
+        return TrackStore.from_observations(*self.observed, num_tracks=len(self.tracks))
+
+    def summary(self):
+        # TrackColumns summaries of the tracks so far; callable mid-stream
+        return summarize_store(self.store())
+
+def track_regions(region_sequences, max_dist=40, max_age=5):
+    tracker = RegionTracker(max_dist, max_age)
+    for regions in region_sequences:
+        tracker.update(regions)
+    return tracker.tracks
+
+def track_regions_exhaustive(region_sequences, max_dist=40):
+    # Original first-match tracker; kept as the baseline for benchmarks
     tracks = []
     track_id = 0
     
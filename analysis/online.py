@@ -0,0 +1,109 @@
+import queue, threading
+from analysis.frames import with_samples
+from analysis.motion import detect_motion, RegionTracker
+from pipeline import profiling
+
+_DONE = object()
+
+def _drain(q):
+    while True:
+        item = q.get()
+        if item is _DONE:
+            return
+        yield item
+
+class OnlinePipeline:
+    # Analyzes a live (frame_idx, timestamp, frame) stream while it is being
+    # produced. Decoding, motion detection and tracking each run on their
+    # own thread, joined by bounded queues: a slow stage blocks the one
+    # feeding it and, through the source (e.g. a Screencast that acks
+    # frames only once queued), the producer. Tracks are complete as soon
+    # as the source ends. If a stage fails, it keeps draining its input so
+    # upstream stages and the producer never block; finish() re-raises.
+    # source is the raw queue frames are decoded from, ended by None (e.g. a
+    # Screencast's): a failed decode stops the frames generator, so the
+    # queue itself has to be drained
+    def __init__(self, frames, queue_size=16, max_dist=40, max_age=5, source=None, **motion_args):
+        self.frames = frames
+        self.source = source
+        self.finishing = threading.Event()
+        self.motion_args = motion_args
+        self.samples = []
+        self.tracker = RegionTracker(max_dist, max_age)
+        self.errors = []
+        self.decoded = queue.Queue(maxsize=queue_size)
+        self.regions = queue.Queue(maxsize=queue_size)
+        self.threads = []
+
+    def start(self):
+        for name, target, sink in (
+            ("decode", self._decode, self.decoded),
+            ("detect", self._detect, self.regions),
+            ("track", self._track, None)
+        ):
+            thread = threading.Thread(
+                target=self._run, args=(name, target, sink), daemon=True
+            )
+            thread.start()
+            self.threads.append(thread)
+        return self
+
+    def _run(self, name, target, sink):
+        try:
+            with profiling.span(f"online:{name}"):
+                target()
+        except Exception as e:
+            self.errors.append(e)
+            # Keep consuming so nothing upstream waits on a full queue
+            if name == "decode":
+                self._discard_source()
+            else:
+                for _ in _drain(self._input(name)):
+                    pass
+        finally:
+            if sink is not None:
+                sink.put(_DONE)
+
+    def _discard_source(self):
+        if self.source is None:
+            for _ in self.frames:
+                pass
+            return
+        # Until the end marker, or until finish() once the queue is empty
+        # (the generator may have taken the marker before it failed)
+        while True:
+            try:
+                if self.source.get(timeout=0.1) is None:
+                    return
+            except queue.Empty:
+                if self.finishing.is_set():
+                    return
+
+    def _input(self, name):
+        return self.decoded if name == "detect" else self.regions
+
+    def _decode(self):
+        for item in self.frames:
+            self.decoded.put(item)
+
+    def _detect(self):
+        profile = profiling.enabled
+        frames = with_samples(_drain(self.decoded), self.samples)
+        for regions in detect_motion(frames, **self.motion_args):
+            self.regions.put(regions)
+            if profile:
+                profiling.gauge("decoded frames queued", self.decoded.qsize())
+
+    def _track(self):
+        for regions in _drain(self.regions):
+            self.tracker.update(regions)
+
+    def finish(self):
+        # Waits for the stream to end; returns the TrackColumns summaries and each
+        # analyzed frame's (frame_idx, timestamp)
+        self.finishing.set()
+        for thread in self.threads:
+            thread.join()
+        if self.errors:
+            raise self.errors[0]
+        return self.tracker.summary(), self.samples
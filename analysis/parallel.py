@@ -0,0 +1,92 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from analysis.frames import count_frames, iter_frames, with_samples, adaptive_frames
+from analysis.motion import detect_motion
+from analysis.correlate import scroll_offsets
+
+def split_segments(total_frames, every_n_frames, workers):
+    sampled = list(range(0, total_frames, every_n_frames))
+    if len(sampled) < 2:
+        return []
+
+    workers = max(1, min(workers, len(sampled) - 1))
+    per_segment = (len(sampled) - 1) / workers
+    bounds = [sampled[round(k * per_segment)] for k in range(workers)] + [sampled[-1]]
+
+    # Each segment ends on the first frame of the next one, so the frame pair
+    # spanning a boundary is diffed exactly once. The last segment decodes
+    # to the end of the video, since the frame count may be reported short
+    return [(bounds[k], bounds[k + 1] + 1 if k < workers - 1 else None) for k in range(workers)]
+
+def segments_agree(segments, results):
+    # Each boundary frame is decoded by the segments on both sides; seeking
+    # by frame number is unreliable on some containers (WebM), so a segment
+    # that starts elsewhere shows up as a different index or timestamp
+    for k, (start, _) in enumerate(segments):
+        samples = results[k][1]
+        if not samples or samples[0][0] != start:
+            return False
+        if k + 1 < len(segments):
+            following = results[k + 1][1]
+            if not following or samples[-1][0] != following[0][0] \
+                    or abs(samples[-1][1] - following[0][1]) > 1e-3:
+                return False
+    return True
+
+def _analyze_segment(video_path, start, stop, every_n_frames, motion_args, sampling=None,
+                     scroll=None):
+    samples = []
+    frames = iter_frames(video_path, every_n_frames, start=start, stop=stop)
+    if sampling is not None:
+        frames = adaptive_frames(frames, **sampling)
+    offsets = scroll_offsets(samples, *scroll) if scroll else None
+    regions = list(detect_motion(with_samples(frames, samples), offsets=offsets, **motion_args))
+    return regions, samples
+
+def analyze_video_parallel(video_path, workers=None, every_n_frames=3,
+                           threshold=25, min_area=500, pyramid_level=0, refine=False,
+                           sampling=None, compensate=False, scroll_log=None, scroll_scale=1.0):
+    # Returns the region list of every consecutive pair of analyzed frames
+    # and the (frame_idx, timestamp) of each analyzed frame. With sampling
+    # (adaptive_frames arguments) the stride-every_n_frames stream is
+    # thinned adaptively, per segment. Page scrolling is compensated by
+    # phase correlation (compensate) or from scroll_log positions scaled
+    # to video pixels by scroll_scale
+    motion_args = {
+        "threshold": threshold,
+        "min_area": min_area,
+        "pyramid_level": pyramid_level,
+        "refine": refine,
+        "compensate": compensate
+    }
+    scroll = (scroll_log, scroll_scale) if scroll_log else None
+    workers = workers or os.cpu_count() or 1
+    total = count_frames(video_path)
+    segments = split_segments(total, every_n_frames, workers)
+
+    # Containers like WebM often report no frame count; decode sequentially
+    if workers == 1 or len(segments) < 2:
+        return _analyze_segment(video_path, 0, None, every_n_frames, motion_args, sampling, scroll)
+
+    with ProcessPoolExecutor(max_workers=len(segments)) as pool:
+        futures = [
+            pool.submit(_analyze_segment, video_path, start, stop,
+                        every_n_frames, motion_args, sampling, scroll)
+            for start, stop in segments
+        ]
+        results = [future.result() for future in futures]
+
+    if not segments_agree(segments, results):
+        print("Segment boundaries did not line up (inaccurate seeking or frame count); "
+              "analyzing sequentially")
+        return _analyze_segment(video_path, 0, None, every_n_frames, motion_args, sampling, scroll)
+
+    # Region list i covers the pair ending at sample i + 1. Each segment
+    # starts on the previous one's last frame, so that sample is shared
+    region_sequences = []
+    samples = []
+    for regions, segment_samples in results:
+        region_sequences.extend(regions)
+        samples.extend(segment_samples[1:] if samples else segment_samples)
+
+    return region_sequences, samples
@@ -0,0 +1,174 @@
+import itertools, json
+import numpy as np
+from pipeline.artifacts import Ragged, has_table, read_table, records_to_columns
+
+# Columnar track storage. TrackStore holds every tracked observation in flat
+# arrays (track_id, frame, cx, cy), sorted by track, with offsets marking
+# where each track starts: track i is rows offsets[i]:offsets[i + 1].
+# TrackColumns is the per-track table the later stages work on (one array
+# per field, frame lists as a Ragged column); its records() is the export
+# view, the same dicts summarize_tracks/attach_scroll_to_tracks produce.
+
+class TrackStore:
+    def __init__(self, track_id, frame, cx, cy, offsets):
+        self.track_id = track_id
+        self.frame = frame
+        self.cx = cx
+        self.cy = cy
+        self.offsets = offsets
+
+    @classmethod
+    def from_observations(cls, track_id, frame, cx, cy, num_tracks=None):
+        # Observations in arrival order (frame order within each track)
+        track_id = np.asarray(track_id, dtype=np.int64)
+        order = np.argsort(track_id, kind="stable")
+        counts = np.bincount(track_id, minlength=num_tracks or 0)
+        return cls(
+            track_id=track_id[order],
+            frame=np.asarray(frame, dtype=np.int64)[order],
+            cx=np.asarray(cx, dtype=np.float64)[order],
+            cy=np.asarray(cy, dtype=np.float64)[order],
+            offsets=np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+        )
+
+    @classmethod
+    def from_tracks(cls, tracks):
+        # tracks: RegionTracker/track_regions dicts
+        lengths = np.fromiter((len(t["frames"]) for t in tracks), dtype=np.int64, count=len(tracks))
+        total = int(lengths.sum())
+        ids = np.fromiter((t["id"] for t in tracks), dtype=np.int64, count=len(tracks))
+        centers = np.fromiter(
+            itertools.chain.from_iterable(itertools.chain.from_iterable(t["centers"] for t in tracks)),
+            dtype=np.float64, count=2 * total
+        ).reshape(total, 2)
+
+        return cls(
+            track_id=np.repeat(ids, lengths),
+            frame=np.fromiter(
+                itertools.chain.from_iterable(t["frames"] for t in tracks),
+                dtype=np.int64, count=total
+            ),
+            cx=centers[:, 0],
+            cy=centers[:, 1],
+            offsets=np.concatenate(([0], np.cumsum(lengths))).astype(np.int64)
+        )
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def lengths(self):
+        return np.diff(self.offsets)
+
+    def ids(self):
+        return self.track_id[self.offsets[:-1]]
+
+    def tracks(self):
+        # Export view in the tracker's dict format
+        frames = self.frame.tolist()
+        centers = list(zip(self.cx.tolist(), self.cy.tolist()))
+        out = []
+        for tid, start, end in zip(self.ids().tolist(), self.offsets[:-1].tolist(), self.offsets[1:].tolist()):
+            out.append({
+                "id": tid,
+                "frames": frames[start:end],
+                "centers": centers[start:end],
+                "last_center": centers[end - 1]
+            })
+        return out
+
+def summarize_store(store, min_length=3):
+    # Vectorized summarize_tracks: the mean step of a track telescopes to
+    # (last - first) / (n - 1), so it needs only each track's endpoints.
+    # Matches the loop version up to float rounding
+    lengths = store.lengths()
+    keep = lengths >= min_length
+    first = store.offsets[:-1][keep]
+    last = store.offsets[1:][keep] - 1
+    steps = lengths[keep] - 1
+
+    return TrackColumns({
+        "track_id": store.track_id[first],
+        "avg_dx": (store.cx[last] - store.cx[first]) / steps,
+        "avg_dy": (store.cy[last] - store.cy[first]) / steps,
+        "frames": Ragged(store.frame, store.offsets).select(keep)
+    }, rows=int(keep.sum()))
+
+def _column_array(values):
+    present = [v for v in values if v is not None]
+    if present and all(isinstance(v, (list, tuple)) for v in present):
+        return Ragged.from_lists(values)
+    if present and all(isinstance(v, bool) for v in present):
+        return np.array(values, dtype=bool) if len(present) == len(values) else np.array(values, dtype=object)
+    if all(isinstance(v, (int, float, np.integer, np.floating)) and not isinstance(v, bool) for v in present):
+        if len(present) == len(values) and all(isinstance(v, (int, np.integer)) for v in present):
+            return np.array(values, dtype=np.int64)
+        return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+    return np.array(values, dtype=object)
+
+class TrackColumns:
+    # Per-track table: {name: array or Ragged}, all with the same row count
+    def __init__(self, data, rows=None):
+        self.data = data
+        self.rows = rows if rows is not None else len(next(iter(data.values()), ()))
+
+    @classmethod
+    def from_records(cls, records):
+        columns = records_to_columns(records)
+        return cls({name: _column_array(values) for name, values in columns.items()}, rows=len(records))
+
+    @classmethod
+    def from_table(cls, table):
+        data = {}
+        for name in table.names():
+            entry = table.spec["columns"][name]
+            if entry["kind"] == "ragged" and entry["values"]["kind"] in ("int", "float"):
+                data[name] = Ragged(np.array(table.raw(name)), np.array(table.offsets(name)))
+            elif entry["kind"] in ("int", "float", "bool"):
+                data[name] = np.array(table.raw(name))
+            else:
+                data[name] = _column_array(table.column(name))
+        return cls(data, rows=table.rows)
+
+    @classmethod
+    def load(cls, run_dir, name):
+        # Like load_artifact, without building per-row dicts for bundles
+        if has_table(run_dir, name):
+            return cls.from_table(read_table(run_dir, name))
+        with open(f"{run_dir}/{name}.json") as f:
+            return cls.from_records(json.load(f))
+
+    def __len__(self):
+        return self.rows
+
+    def __contains__(self, name):
+        return name in self.data
+
+    def __getitem__(self, name):
+        return self.data[name]
+
+    def columns(self):
+        return self.data
+
+    def select(self, rows):
+        # rows: boolean mask or index array
+        data = {name: values.select(rows) if isinstance(values, Ragged) else values[rows]
+                for name, values in self.data.items()}
+        count = int(np.count_nonzero(rows)) if np.asarray(rows).dtype == bool else len(rows)
+        return TrackColumns(data, rows=count)
+
+    def with_columns(self, **columns):
+        return TrackColumns({**self.data, **columns}, rows=self.rows)
+
+    def records(self):
+        # Export view: one dict per track, dropping missing values
+        cols = {name: values.tolist() for name, values in self.data.items()}
+        out = []
+        for i in range(self.rows):
+            row = {}
+            for name, values in cols.items():
+                v = values[i]
+                if v is None or (isinstance(v, float) and np.isnan(v)):
+                    continue
+                row[name] = v
+            out.append(row)
+        return out
@@ -0,0 +1,299 @@
+import argparse, json, os, platform, subprocess, sys, tempfile, time
+import cv2
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from analysis.frames import iter_frames
+from analysis.motion import (
+    diff_frame_stack,
+    extract_motion_regions_stack,
+    detect_motion,
+    track_regions,
+    summarize_tracks
+)
+from analysis.tracks import TrackStore, summarize_store
+from analysis.correlate import (
+    scroll_offsets,
+    build_frame_scroll_map,
+    attach_scroll_to_tracks,
+    attach_scroll_columns,
+    build_effects,
+    build_effects_columns
+)
+from benchmarks.bench_tracker import synthetic_regions
+from benchmarks.synthetic import make_scene, write_video, scene_scroll_log, scene_truth
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def rate(count, seconds):
+    return round(count / seconds, 2) if seconds > 0 else None
+
+def bench_decode(video_path, every_n_frames):
+    frames, times = [], []
+    start = time.perf_counter()
+    for _, t, frame in iter_frames(video_path, every_n_frames=every_n_frames):
+        frames.append(frame)
+        times.append(t)
+    seconds = time.perf_counter() - start
+
+    return frames, times, {
+        "seconds": round(seconds, 4),
+        "frames": len(frames),
+        "fps": rate(len(frames), seconds)
+    }
+
+def bench_diff_regions(frames, threshold, min_area, batch_size=8):
+    # Times the two halves of detect_motion separately on the same batches
+    stack = np.stack(frames)
+    out = np.empty((batch_size,) + stack.shape[1:], dtype=np.uint8)
+    diff_seconds = region_seconds = 0.0
+    region_counts = []
+
+    for i in range(0, len(stack) - 1, batch_size):
+        batch = stack[i:i + batch_size + 1]
+
+        start = time.perf_counter()
+        masks = diff_frame_stack(batch, threshold, out=out[:len(batch) - 1])
+        diff_seconds += time.perf_counter() - start
+
+        start = time.perf_counter()
+        regions = extract_motion_regions_stack(masks, min_area)
+        region_seconds += time.perf_counter() - start
+
+        region_counts.extend(len(r) for r in regions)
+
+    pairs = len(region_counts)
+    return {
+        "diff": {"seconds": round(diff_seconds, 4), "pairs": pairs, "fps": rate(pairs, diff_seconds)},
+        "regions": {
+            "seconds": round(region_seconds, 4),
+            "masks": pairs,
+            "fps": rate(pairs, region_seconds),
+            "mean_regions_per_frame": round(float(np.mean(region_counts)), 2) if region_counts else 0.0
+        }
+    }
+
+def bench_detect(frames, threshold, min_area, compensate="off", times=None, scroll_log=None):
+    offsets = None
+    if compensate == "scroll":
+        offsets = scroll_offsets([(None, t) for t in times], scroll_log)
+
+    start = time.perf_counter()
+    region_sequences = list(detect_motion(
+        iter(frames), threshold=threshold, min_area=min_area,
+        compensate=compensate == "phase", offsets=offsets
+    ))
+    seconds = time.perf_counter() - start
+    return region_sequences, {
+        "seconds": round(seconds, 4),
+        "pairs": len(region_sequences),
+        "fps": rate(len(region_sequences), seconds)
+    }
+
+def bench_track(region_sequences):
+    start = time.perf_counter()
+    tracks = track_regions(region_sequences)
+    seconds = time.perf_counter() - start
+    total_regions = sum(len(r) for r in region_sequences)
+    return tracks, {
+        "seconds": round(seconds, 4),
+        "regions": total_regions,
+        "tracks": len(tracks),
+        "regions_per_second": rate(total_regions, seconds)
+    }
+
+def bench_tracker_scaling(num_frames, counts):
+    results = []
+    for count in counts:
+        sequences = synthetic_regions(num_frames, count)
+        start = time.perf_counter()
+        tracks = track_regions(sequences)
+        seconds = time.perf_counter() - start
+        results.append({
+            "regions_per_frame": count,
+            "frames": num_frames,
+            "seconds": round(seconds, 4),
+            "tracks": len(tracks)
+        })
+    return results
+
+def bench_correlate(tracks, scroll_log, pair_times):
+    # Columnar path (what the pipeline runs), with the per-track dict
+    # functions timed alongside as the reference
+    frame_scroll_map = build_frame_scroll_map(scroll_log, len(pair_times), frame_times=pair_times)
+
+    start = time.perf_counter()
+    store = TrackStore.from_tracks(tracks)
+    convert_seconds = time.perf_counter() - start
+    motion_tracks = summarize_store(store)
+    effects = build_effects_columns(attach_scroll_columns(motion_tracks, frame_scroll_map))
+    seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    dict_effects = build_effects(attach_scroll_to_tracks(summarize_tracks(tracks), frame_scroll_map))
+    dict_seconds = time.perf_counter() - start
+
+    return effects, {
+        "seconds": round(seconds, 4),
+        "store_seconds": round(convert_seconds, 4),
+        "dict_seconds": round(dict_seconds, 4),
+        "matches_dicts": effects == dict_effects,
+        "tracks": len(motion_tracks),
+        "effects": len(effects)
+    }
+
+def range_iou(a, b):
+    overlap = min(a[1], b[1]) - max(a[0], b[0])
+    union = max(a[1], b[1]) - min(a[0], b[0])
+    return max(0.0, overlap) / union if union > 0 else float(a == b)
+
+def score_effects(effects, truth, min_iou=0.3):
+    # Greedy one-to-one matching of detected effects to truth objects of
+    # the same type, best scroll-range overlap first
+    pairs = sorted(
+        ((range_iou(e["scroll_range"], t["scroll_range"]), ei, ti)
+         for ei, e in enumerate(effects)
+         for ti, t in enumerate(truth)
+         if e["type"] == t["type"]),
+        reverse=True
+    )
+    matched_effects, matched_truth = set(), set()
+    for iou, ei, ti in pairs:
+        if iou < min_iou:
+            break
+        if ei in matched_effects or ti in matched_truth:
+            continue
+        matched_effects.add(ei)
+        matched_truth.add(ti)
+
+    scores = {}
+    for effect_type in sorted({e["type"] for e in effects} | {t["type"] for t in truth}):
+        detected = [i for i, e in enumerate(effects) if e["type"] == effect_type]
+        expected = [i for i, t in enumerate(truth) if t["type"] == effect_type]
+        tp = sum(1 for i in expected if i in matched_truth)
+        scores[effect_type] = {
+            "true_positives": tp,
+            "false_positives": len(detected) - tp,
+            "false_negatives": len(expected) - tp,
+            "precision": round(tp / len(detected), 3) if detected else None,
+            "recall": round(tp / len(expected), 3) if expected else None
+        }
+
+    tp = len(matched_truth)
+    scores["overall"] = {
+        "true_positives": tp,
+        "false_positives": len(effects) - tp,
+        "false_negatives": len(truth) - tp,
+        "precision": round(tp / len(effects), 3) if effects else None,
+        "recall": round(tp / len(truth), 3) if truth else None
+    }
+    return scores
+
+def compare(current, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+
+    print(f"\nAgainst {baseline_path} (commit {baseline.get('commit')}):")
+    for stage, stats in current["stages"].items():
+        old = baseline.get("stages", {}).get(stage, {})
+        if stats.get("seconds") and old.get("seconds"):
+            print(f"  {stage:>10}: {old['seconds']:.4f}s -> {stats['seconds']:.4f}s "
+                  f"({old['seconds'] / stats['seconds']:.2f}x)")
+
+    old_overall = baseline.get("accuracy", {}).get("overall", {})
+    new_overall = current["accuracy"]["overall"]
+    print(f"  precision {old_overall.get('precision')} -> {new_overall['precision']}, "
+          f"recall {old_overall.get('recall')} -> {new_overall['recall']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the analysis stages on a synthetic scroll video")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--frames", type=int, default=300, help="Video length in frames")
+    parser.add_argument("--objects", type=int, default=6, help="Parallax and carousel objects")
+    parser.add_argument("--scroll-speed", type=float, default=6.0, help="Page pixels scrolled per frame")
+    parser.add_argument("--every-n-frames", type=int, default=3)
+    parser.add_argument("--threshold", type=int, default=25)
+    parser.add_argument("--min-area", type=int, default=500)
+    parser.add_argument("--compensate", choices=["off", "phase", "scroll"], default="off",
+                        help="Scroll compensation for the detect stage")
+    parser.add_argument("--counts", default="10,40,160,320", help="Regions per frame for the tracker sweep")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Results file (default: output/benchmarks/pipeline-<commit>.json)")
+    parser.add_argument("--compare", metavar="FILE", help="Earlier results file to compare against")
+    args = parser.parse_args()
+
+    scene = make_scene(
+        width=args.width, height=args.height, num_frames=args.frames,
+        num_objects=args.objects, scroll_speed=args.scroll_speed, seed=args.seed
+    )
+    truth = scene_truth(scene)
+    scroll_log = scene_scroll_log(scene)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        video_path = write_video(scene, os.path.join(tmp, "synthetic.mp4"))
+        frames, times, decode_stats = bench_decode(video_path, args.every_n_frames)
+
+    stages = {"decode": decode_stats}
+    stages.update(bench_diff_regions(frames, args.threshold, args.min_area))
+    region_sequences, stages["detect"] = bench_detect(
+        frames, args.threshold, args.min_area, args.compensate, times, scroll_log
+    )
+    tracks, stages["track"] = bench_track(region_sequences)
+    effects, stages["correlate"] = bench_correlate(tracks, scroll_log, times[1:])
+
+    commit = git_commit()
+    results = {
+        "commit": commit,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "platform": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "opencv": cv2.__version__,
+            "cpus": os.cpu_count()
+        },
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        "stages": stages,
+        "tracker_scaling": bench_tracker_scaling(
+            args.frames // args.every_n_frames, [int(c) for c in args.counts.split(",")]
+        ),
+        "accuracy": score_effects(effects, truth),
+        "truth": truth,
+        "effects": effects
+    }
+
+    output = args.output or f"output/benchmarks/pipeline-{commit or int(time.time())}.json"
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    print(f"{'stage':>10} {'seconds':>9} {'items/s':>10}")
+    for stage, stats in stages.items():
+        throughput = stats.get("fps") or stats.get("regions_per_second") or "-"
+        print(f"{stage:>10} {stats['seconds']:>9.4f} {throughput:>10}")
+
+    print(f"\n{'regions/frame':>14} {'tracker s':>10}")
+    for r in results["tracker_scaling"]:
+        print(f"{r['regions_per_frame']:>14} {r['seconds']:>10.4f}")
+
+    print(f"\n{'effect':>22} {'tp':>4} {'fp':>4} {'fn':>4} {'precision':>10} {'recall':>7}")
+    for effect_type, s in results["accuracy"].items():
+        print(f"{effect_type:>22} {s['true_positives']:>4} {s['false_positives']:>4} "
+              f"{s['false_negatives']:>4} {str(s['precision']):>10} {str(s['recall']):>7}")
+
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import argparse, os, sys, time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analysis.motion import track_regions, track_regions_exhaustive
+
+def synthetic_regions(num_frames, regions_per_frame, width=1920, height=1080, seed=0):
+    # Objects drift a few pixels per frame and are replaced every ~30 frames,
+    # so long runs accumulate many short-lived tracks
+    rng = np.random.default_rng(seed)
+    pos = rng.uniform((0, 0), (width, height), size=(regions_per_frame, 2))
+    vel = rng.uniform(-4, 4, size=(regions_per_frame, 2))
+
+    sequences = []
+    for _ in range(num_frames):
+        respawn = rng.random(regions_per_frame) < 1 / 30
+        pos[respawn] = rng.uniform((0, 0), (width, height), size=(respawn.sum(), 2))
+        pos += vel
+        sequences.append([(int(x) - 20, int(y) - 20, 40, 40) for x, y in pos])
+
+    return sequences
+
+def time_tracker(fn, sequences):
+    start = time.perf_counter()
+    tracks = fn(sequences)
+    return time.perf_counter() - start, len(tracks)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare region tracker scaling")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--counts", default="10,40,160,320")
+    args = parser.parse_args()
+
+    print(f"{'regions/frame':>14} {'exhaustive s':>13} {'tracks':>7} {'indexed s':>10} {'tracks':>7} {'speedup':>8}")
+    for count in (int(c) for c in args.counts.split(",")):
+        sequences = synthetic_regions(args.frames, count)
+        slow, slow_tracks = time_tracker(track_regions_exhaustive, sequences)
+        fast, fast_tracks = time_tracker(track_regions, sequences)
+        print(f"{count:>14} {slow:>13.3f} {slow_tracks:>7} {fast:>10.3f} {fast_tracks:>7} {slow / fast:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
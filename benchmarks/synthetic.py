@@ -0,0 +1,135 @@
+import cv2
+import numpy as np
+
+# Synthetic scroll recordings with known ground truth. A scene is a tall
+# textured page scrolled at a constant speed, plus overlay objects whose
+# screen position is a function of scrollY:
+#   sticky     - a header pinned to the top of the viewport
+#   parallax   - a layer rising through the viewport at `ratio` x the scroll
+#   horizontal - a carousel pinned vertically, sliding sideways as the page
+#                scrolls (classified as horizontal_translate)
+# Each object's truth entry holds the effect type and the scroll range over
+# which it is on screen, in the same units the pipeline reports.
+
+def _page_texture(rng, width, height):
+    # Light page with darker "content" blocks so scrolling shows up in diffs
+    page = np.full((height, width, 3), 235, dtype=np.uint8)
+    for _ in range(max(1, height * width // 40000)):
+        w, h = rng.integers(40, width // 3), rng.integers(20, 160)
+        x, y = rng.integers(0, width - w), rng.integers(0, height - h)
+        page[y:y + h, x:x + w] = rng.integers(60, 200)
+    return page
+
+def _patch(rng, width, height):
+    color = rng.integers(0, 256, size=3)
+    patch = np.empty((height, width, 3), dtype=np.uint8)
+    patch[:] = color
+    # Inner stripes keep the object distinct from the flat page colour
+    patch[height // 4:height // 4 + max(2, height // 10)] = 255 - color
+    return patch
+
+def make_scene(width=1280, height=720, num_frames=300, num_objects=6, scroll_speed=6.0,
+               fps=30, parallax_ratios=(0.3, 0.5), carousel_speed=1.5, header_height=60,
+               seed=0):
+    # scroll_speed is page pixels per video frame; parallax and carousel
+    # objects alternate until num_objects are placed
+    rng = np.random.default_rng(seed)
+    total_scroll = scroll_speed * (num_frames - 1)
+
+    objects = []
+    if header_height:
+        objects.append({
+            "type": "sticky",
+            "patch": _patch(rng, width, header_height),
+            "scroll_range": [0.0, total_scroll]
+        })
+
+    for i in range(num_objects):
+        w, h = int(rng.integers(width // 10, width // 5)), int(rng.integers(height // 10, height // 5))
+        start = float(rng.uniform(0, total_scroll * 0.5))
+
+        if i % 2 == 0:
+            ratio = parallax_ratios[(i // 2) % len(parallax_ratios)]
+            end = start + (height + h) / ratio
+            objects.append({
+                "type": "parallax",
+                "patch": _patch(rng, w, h),
+                "x": int(rng.integers(0, width - w)),
+                "ratio": ratio,
+                "scroll_range": [start, min(end, total_scroll)]
+            })
+        else:
+            end = start + (width + w) / carousel_speed
+            objects.append({
+                "type": "horizontal_translate",
+                "patch": _patch(rng, w, h),
+                "y": int(rng.integers(header_height, height - h)),
+                "speed": carousel_speed,
+                "scroll_range": [start, min(end, total_scroll)]
+            })
+
+    return {
+        "width": width,
+        "height": height,
+        "num_frames": num_frames,
+        "fps": fps,
+        "scroll_speed": scroll_speed,
+        "page": _page_texture(rng, width, height + int(np.ceil(total_scroll)) + 1),
+        "objects": objects
+    }
+
+def _paste(frame, patch, x, y):
+    h, w = patch.shape[:2]
+    fh, fw = frame.shape[:2]
+    x0, y0 = max(0, x), max(0, y)
+    x1, y1 = min(fw, x + w), min(fh, y + h)
+    if x0 < x1 and y0 < y1:
+        frame[y0:y1, x0:x1] = patch[y0 - y:y1 - y, x0 - x:x1 - x]
+
+def render_frame(scene, frame_idx):
+    scroll = scene["scroll_speed"] * frame_idx
+    top = int(round(scroll))
+    frame = scene["page"][top:top + scene["height"]].copy()
+
+    # Sticky last, so it covers anything scrolling beneath it
+    for obj in sorted(scene["objects"], key=lambda o: o["type"] == "sticky"):
+        start, end = obj["scroll_range"]
+        if not start <= scroll <= end:
+            continue
+
+        offset = scroll - start
+        if obj["type"] == "sticky":
+            _paste(frame, obj["patch"], 0, 0)
+        elif obj["type"] == "parallax":
+            _paste(frame, obj["patch"], obj["x"], int(round(scene["height"] - obj["ratio"] * offset)))
+        else:
+            w = obj["patch"].shape[1]
+            _paste(frame, obj["patch"], int(round(obj["speed"] * offset - w)), obj["y"])
+
+    return frame
+
+def iter_scene_frames(scene):
+    for i in range(scene["num_frames"]):
+        yield render_frame(scene, i)
+
+def write_video(scene, path):
+    writer = cv2.VideoWriter(
+        path, cv2.VideoWriter_fourcc(*"mp4v"), scene["fps"], (scene["width"], scene["height"])
+    )
+    for frame in iter_scene_frames(scene):
+        writer.write(frame)
+    writer.release()
+    return path
+
+def scene_scroll_log(scene):
+    # One entry per video frame, in the scroll_page log format
+    return [
+        {"time": round(i / scene["fps"], 4), "scrollY": scene["scroll_speed"] * i}
+        for i in range(scene["num_frames"])
+    ]
+
+def scene_truth(scene):
+    return [
+        {"type": obj["type"], "scroll_range": [round(v, 1) for v in obj["scroll_range"]]}
+        for obj in scene["objects"]
+    ]
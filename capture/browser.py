@@ -1,6 +1,7 @@
+import time
 from playwright.sync_api import Page, sync_playwright
 
-def launch_browser():
+def launch_browser(record_video=True):
     pw = sync_playwright().start()
     browser = pw.chromium.launch(
         headless=False,
@@ -8,10 +9,67 @@ def launch_browser():
     )
     context = browser.new_context(
         viewport=None,  # Use actual window size
-        record_video_dir="output/runs"
+        record_video_dir="output/runs" if record_video else None
     )
     # Set navigation timeout on the context
     context.set_default_navigation_timeout(60000)  # 60 seconds
     context.set_default_timeout(60000)  # 60 seconds for all operations
     page = context.new_page()
-    return pw, browser, context, page
\ No newline at end of file
+    return pw, browser, context, page
+
+def maximize_window(context, page):
+    # Maximize window BEFORE loading the page so website adjusts properly.
+    # Returns the CDP session used, or None if it could not be opened
+    cdp_session = None
+    try:
+        cdp_session = context.new_cdp_session(page)
+        targets_response = cdp_session.send("Target.getTargets")
+        target_infos = targets_response.get("targetInfos", [])
+    
+        page_target = None
+        for target in target_infos:
+            if target.get("type") == "page":
+                page_target = target
+                break
+    
+        if page_target:
+            window_info = cdp_session.send("Browser.getWindowForTarget", {"targetId": page_target["targetId"]})
+            window_id = window_info.get("windowId")
+        
+            if window_id:
+                cdp_session.send("Browser.setWindowBounds", {
+                    "windowId": window_id,
+                    "bounds": {"windowState": "maximized"}
+                })
+                time.sleep(1.0)  # Wait for window to maximize
+    except Exception as e:
+        print(f"Note: Could not maximize window automatically: {e}")
+        print("Please maximize the browser window manually.")
+    return cdp_session
+
+def fit_viewport(page):
+    # Get actual window dimensions and ensure viewport matches
+    try:
+        window_size = page.evaluate("""
+            () => {
+                return {
+                    width: window.outerWidth,
+                    height: window.outerHeight,
+                    innerWidth: window.innerWidth,
+                    innerHeight: window.innerHeight
+                };
+            }
+        """)
+        print(f"Window size: {window_size['width']}x{window_size['height']}, Content area: {window_size['innerWidth']}x{window_size['innerHeight']}")
+    
+        # Set viewport to match actual content area
+        page.set_viewport_size({
+            "width": window_size['innerWidth'],
+            "height": window_size['innerHeight']
+        })
+    
+        # Trigger resize event to ensure website adjusts
+        page.evaluate("window.dispatchEvent(new Event('resize'))")
+        time.sleep(0.5)
+    except Exception as e:
+        print(f"Note: Could not set viewport size: {e}")
@@ -1,20 +1,224 @@
-def snapshot_dom(page):
-    return page.evaluate("""
-    () => {
-        return Array.from(document.querySelectorAll('*')).map(el => {
-            const rect = el.getBoundingClientRect();
+import json
+
+COLUMNS = ["id", "tag", "x", "y", "w", "h", "position", "opacity", "transform", "willChange"]
+
+# Keeps only elements that can produce scroll effects (fixed/sticky position,
+# non-identity transform, opacity < 1, will-change) and reports them as
+# parallel column arrays. Element ids are stable for the page's lifetime so
+# incremental deltas can refer back to earlier rows.
+DOM_JS = """
+() => {
+    if (window.__scrolldnaDom) return;
+
+    const COLUMNS = __COLUMNS__;
+
+    const ids = new WeakMap();
+    let nextId = 0;
+    const idOf = (el) => {
+        if (!ids.has(el)) ids.set(el, nextId++);
+        return ids.get(el);
+    };
+
+    const isCandidate = (style) =>
+        style.position === 'fixed' ||
+        style.position === 'sticky' ||
+        (style.transform !== 'none' && style.transform !== 'matrix(1, 0, 0, 1, 0, 0)') ||
+        parseFloat(style.opacity) < 1 ||
+        style.willChange !== 'auto';
+
+    const row = (el, style) => {
+        const rect = el.getBoundingClientRect();
+        return [
+            idOf(el), el.tagName,
+            rect.x, rect.y, rect.width, rect.height,
+            style.position, parseFloat(style.opacity), style.transform, style.willChange
+        ];
+    };
+
+    const toColumns = (rows) => {
+        const cols = {};
+        COLUMNS.forEach((name, i) => { cols[name] = rows.map(r => r[i]); });
+        return cols;
+    };
+
+    const state = {
+        candidates: new Set(),
+        touched: new Set(),
+        dirty: true,
+        last: new Map(),
+        lastPosition: null,
+        stepPosition: null,
+        buffer: [],
+        tracking: false,
+        lastCapture: 0
+    };
+
+    const scan = () => {
+        state.candidates = new Set();
+        for (const el of document.querySelectorAll('*')) {
+            if (isCandidate(window.getComputedStyle(el))) state.candidates.add(el);
+        }
+        state.touched.clear();
+        state.dirty = false;
+    };
+
+    // Added/removed nodes force a full re-scan; class/style changes only
+    // re-check the elements they touched
+    const refresh = () => {
+        if (state.dirty) {
+            scan();
+            return;
+        }
+        for (const el of state.touched) {
+            if (isCandidate(window.getComputedStyle(el))) state.candidates.add(el);
+        }
+        state.touched.clear();
+    };
+
+    state.snapshot = () => {
+        scan();
+        return toColumns(Array.from(state.candidates, el => row(el, window.getComputedStyle(el))));
+    };
+
+    new MutationObserver((records) => {
+        for (const r of records) {
+            if (r.type === 'childList') state.dirty = true;
+            else state.touched.add(r.target);
+        }
+    }).observe(document.documentElement, {
+        subtree: true,
+        childList: true,
+        attributes: true,
+        attributeFilter: ['class', 'style']
+    });
+
+    // Custom scrollers move content with wheel handlers and transforms, so
+    // window.scrollY stays at 0 and no native scroll event fires. Stepped
+    // captures pass where the scroller is instead: telemetry progress over
+    // totalHeight when the page reports any, else the step's scrollY. Once
+    // steps are captured they are the only source of positions, so the
+    // final drain repeats the last step rather than reading scrollY
+    const scrollPosition = (pos) => {
+        const telemetry = window.__scrolldna && window.__scrolldna.last;
+        if (pos && pos.totalHeight && telemetry && telemetry.progress > 0) {
+            return Math.round((telemetry.progress / 100) * pos.totalHeight);
+        }
+        if (pos && pos.scrollY != null) return pos.scrollY;
+        return window.pageYOffset || window.scrollY || document.documentElement.scrollTop || 0;
+    };
+
+    const captureDelta = (pos = state.stepPosition) => {
+        refresh();
+
+        const changed = [];
+        const seen = new Set();
+        for (const el of state.candidates) {
+            if (!el.isConnected) {
+                state.candidates.delete(el);
+                continue;
+            }
             const style = window.getComputedStyle(el);
+            if (!isCandidate(style)) continue;
+
+            const r = row(el, style);
+            const key = r.slice(2).join('|');
+            seen.add(r[0]);
+            if (state.last.get(r[0]) !== key) {
+                state.last.set(r[0], key);
+                changed.push(r);
+            }
+        }
+
+        const removed = [];
+        for (const id of state.last.keys()) {
+            if (!seen.has(id)) removed.push(id);
+        }
+        removed.forEach(id => state.last.delete(id));
+
+        // Every capture records the scroll position, even with no rows
+        // changed: fixed and sticky elements only change once, and the
+        // forward-fill needs the positions they were seen at. Only a repeat
+        // of the previous sample is skipped
+        const scrollY = scrollPosition(pos);
+        const position = `${scrollY}|${window.innerHeight}`;
+        if (changed.length || removed.length || position !== state.lastPosition) {
+            state.lastPosition = position;
+            state.buffer.push({
+                t: Date.now() / 1000,
+                scrollY: scrollY,
+                viewportHeight: window.innerHeight,
+                ...toColumns(changed),
+                removed: removed
+            });
+        }
+    };
+
+    // Coalesces scroll events into at most one capture per minInterval;
+    // a throttled capture is deferred rather than dropped so the final
+    // resting position is always recorded
+    let scheduled = false;
+    const onScroll = () => {
+        if (!state.tracking || state.stepPosition || scheduled) return;
+        scheduled = true;
+        const wait = Math.max(0, state.minInterval - (performance.now() - state.lastCapture));
+        setTimeout(() => requestAnimationFrame(() => {
+            scheduled = false;
+            state.lastCapture = performance.now();
+            captureDelta();
+        }), wait);
+    };
+
+    state.start = (minInterval) => {
+        state.minInterval = minInterval;
+        state.tracking = true;
+        state.last.clear();
+        state.lastPosition = null;
+        state.stepPosition = null;
+        state.buffer = [];
+        captureDelta();
+    };
+
+    state.capture = (pos) => {
+        if (!state.tracking) return;
+        state.stepPosition = pos;
+        captureDelta(pos);
+    };
+
+    state.drain = () => {
+        captureDelta();
+        const out = state.buffer;
+        state.buffer = [];
+        return out;
+    };
+
+    window.addEventListener('scroll', onScroll, { capture: true, passive: true });
+    window.__scrolldnaDom = state;
+}
+""".replace("__COLUMNS__", json.dumps(COLUMNS))
+
+def snapshot_dom(page):
+    page.evaluate(DOM_JS)
+    return page.evaluate("() => window.__scrolldnaDom.snapshot()")
+
+def start_dom_tracking(page, min_interval_ms=100):
+    # Records a delta of changed candidate rows (plus removed ids) after
+    # native scroll movement, at most once per min_interval_ms, and on every
+    # capture_dom_delta; the first delta holds every candidate
+    page.evaluate(DOM_JS)
+    page.evaluate("(ms) => window.__scrolldnaDom.start(ms)", min_interval_ms)
+
+def capture_dom_delta(page, scroll_y=None, total_height=None):
+    # Records a delta once a scroll step has settled, whether or not the page
+    # fired scroll events. Pass total_height for custom scrollers so the
+    # position comes from telemetry progress when there is any
+    page.evaluate(
+        "(pos) => window.__scrolldnaDom && window.__scrolldnaDom.capture(pos)",
+        {"scrollY": scroll_y, "totalHeight": total_height}
+    )
 
-            return {
-                tag: el.tagName,
-                x: rect.x,
-                y: rect.y,
-                w: rect.width,
-                h: rect.height,
-                position: style.position,
-                opacity: style.opacity,
-                transform: style.transform
-            };
-        });
-    }
-    """)
+def drain_dom_deltas(page, start_time=None):
+    deltas = page.evaluate("() => window.__scrolldnaDom ? window.__scrolldnaDom.drain() : []")
+    if start_time is not None:
+        for d in deltas:
+            d["t"] = round(d["t"] - start_time, 3)
+    return deltas
@@ -0,0 +1,79 @@
+import os
+from urllib.parse import urlparse
+from pipeline import profiling
+
+# Network archive and request filtering for captures. In record mode every
+# response is written to a HAR archive (a .zip keeps bodies as separate
+# entries) when the browser context closes; replay serves the page from the
+# archive and aborts anything it lacks, so a replayed capture never touches
+# the network. "auto" replays when an archive exists and records otherwise.
+HAR_MODES = ("off", "record", "replay", "auto")
+RESOURCE_TYPES = (
+    "document", "stylesheet", "image", "media", "font", "script", "texttrack",
+    "xhr", "fetch", "eventsource", "websocket", "manifest", "other"
+)
+
+def recording_path(har_path):
+    # Archives are recorded beside their final path and renamed into place
+    # once complete, so an interrupted capture never leaves a partial
+    # archive for "auto" to replay
+    head, tail = os.path.split(har_path)
+    return os.path.join(head, f".recording-{tail}")
+
+def resolve_har_mode(mode, har_path):
+    if mode == "auto":
+        return "replay" if os.path.exists(har_path) else "record"
+    if mode == "replay" and not os.path.exists(har_path):
+        raise FileNotFoundError(f"No network archive at {har_path}; capture with --har record first")
+    return mode
+
+def domain_matcher(domains):
+    # Matches each domain and its subdomains
+    domains = tuple(d.lower().strip(".") for d in domains if d)
+
+    def matches(url):
+        host = (urlparse(url).hostname or "").lower()
+        return any(host == d or host.endswith("." + d) for d in domains)
+    return matches
+
+def setup_network(context, har_path=None, har_mode="off", block_types=(), block_domains=()):
+    # Installs archive routing and the blocklist on a fresh context, before
+    # any navigation. Returns the archive mode in effect ("off", "record" or
+    # "replay"); recordings must be finished with finish_recording() after
+    # the context closes
+    mode = resolve_har_mode(har_mode, har_path) if har_mode != "off" else "off"
+
+    if mode == "replay":
+        print(f"Replaying network from {har_path}")
+        context.route_from_har(har_path, not_found="abort")
+    elif mode == "record":
+        print(f"Recording network to {har_path}")
+        os.makedirs(os.path.dirname(har_path) or ".", exist_ok=True)
+        context.route_from_har(
+            recording_path(har_path), update=True, update_content="attach", update_mode="full"
+        )
+
+    if block_types or block_domains:
+        types = frozenset(block_types)
+        blocked_domain = domain_matcher(block_domains)
+
+        # Registered after the archive route so it runs first: blocked
+        # requests are never recorded or replayed
+        def handle(route):
+            request = route.request
+            if request.resource_type in types or blocked_domain(request.url):
+                profiling.count("requests blocked")
+                route.abort("blockedbyclient")
+            else:
+                route.fallback()
+
+        context.route("**/*", handle)
+
+    return mode
+
+def finish_recording(har_path):
+    recorded = recording_path(har_path)
+    if os.path.exists(recorded):
+        os.replace(recorded, har_path)
+        return True
+    return False
@@ -0,0 +1,98 @@
+import queue, re, shutil, subprocess, tempfile, threading, time
+from playwright.sync_api import sync_playwright
+
+BATCH_VIEWPORT = {"width": 1920, "height": 1080}
+
+def launch_shared_browser():
+    # Starts one headless Chromium that every worker connects to over CDP.
+    # Sync Playwright objects can't be shared across threads, so each worker
+    # drives the browser through its own connection
+    with sync_playwright() as pw:
+        executable = pw.chromium.executable_path
+
+    user_data_dir = tempfile.mkdtemp(prefix="scrolldna-")
+    proc = subprocess.Popen(
+        [
+            executable,
+            "--headless=new",
+            "--remote-debugging-port=0",
+            f"--user-data-dir={user_data_dir}",
+            "--no-first-run",
+            "--no-default-browser-check",
+            "about:blank"
+        ],
+        stderr=subprocess.PIPE,
+        text=True
+    )
+
+    endpoint = None
+    for line in proc.stderr:
+        match = re.search(r"DevTools listening on (ws://\S+)", line)
+        if match:
+            endpoint = match.group(1)
+            break
+
+    if endpoint is None:
+        proc.kill()
+        raise RuntimeError("Chromium exited before exposing a DevTools endpoint")
+
+    # Keep draining stderr so Chromium never blocks on a full pipe
+    threading.Thread(target=lambda: [None for _ in proc.stderr], daemon=True).start()
+
+    def close():
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        shutil.rmtree(user_data_dir, ignore_errors=True)
+
+    return endpoint, close
+
+def run_capture_pool(urls, job, concurrency=4):
+    # Runs job(browser, url) for every URL on `concurrency` worker threads
+    # sharing one browser. Each call should open its own context.
+    # Returns one result dict per URL, in input order
+    endpoint, close_browser = launch_shared_browser()
+    pending = queue.Queue()
+    for index, url in enumerate(urls):
+        pending.put((index, url))
+
+    results = [None] * len(urls)
+
+    def worker():
+        pw = sync_playwright().start()
+        browser = pw.chromium.connect_over_cdp(endpoint)
+        try:
+            while True:
+                try:
+                    index, url = pending.get_nowait()
+                except queue.Empty:
+                    return
+
+                start = time.time()
+                result = {"url": url}
+                try:
+                    result.update(job(browser, url) or {})
+                    result["status"] = "ok"
+                except Exception as e:
+                    result["status"] = "error"
+                    result["error"] = f"{type(e).__name__}: {e}"
+                result["seconds"] = round(time.time() - start, 2)
+                results[index] = result
+
+                print(f"[{result['status']}] {url} ({result['seconds']}s)")
+        finally:
+            browser.close()
+            pw.stop()
+
+    threads = [threading.Thread(target=worker) for _ in range(max(1, min(concurrency, len(urls))))]
+    try:
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        close_browser()
+
+    return results
@@ -0,0 +1,64 @@
+import os, shutil, time
+from urllib.parse import urlparse
+from capture.browser import fit_viewport
+from capture.scroll import scroll_page
+from capture.dom import snapshot_dom, start_dom_tracking, drain_dom_deltas
+from pipeline.artifacts import save_artifact
+from pipeline import profiling
+
+def normalize_url(url):
+    if not url.startswith(('http://', 'https://')):
+        url = 'https://' + url
+    return url
+
+def site_name(url):
+    parsed_url = urlparse(url)
+    website_name = parsed_url.netloc or parsed_url.path.split('/')[0]
+    website_name = website_name.split(':')[0]
+    return website_name.replace('.', '_')
+
+def record_page(page, url, run_dir, scroll_step, start_time, resize=True, on_ready=None,
+                artifact_format="binary", wait_until="networkidle", scroll=None):
+    # Loads the page, scrolls it and saves the scroll_log and dom_snapshots
+    # artifacts into run_dir. on_ready runs just before scrolling;
+    # scroll(page, step, start_time) replaces scroll_page
+    profiling.wrap_calls(page, "evaluate", "page.evaluate")
+
+    with profiling.span("goto"):
+        page.goto(url, wait_until=wait_until)
+    time.sleep(1.0)
+
+    if resize:
+        fit_viewport(page)
+
+    if on_ready:
+        on_ready()
+
+    start_dom_tracking(page)
+    with profiling.span("scroll_page"):
+        scroll_log = (scroll or scroll_page)(page, step=scroll_step, start_time=start_time)
+
+    # Final columnar snapshot of effect candidates, plus the per-scroll
+    # deltas (changed rows and removed ids) recorded while scrolling
+    dom_snapshots = {
+        "snapshot": snapshot_dom(page),
+        "deltas": drain_dom_deltas(page, start_time)
+    }
+
+    os.makedirs(run_dir, exist_ok=True)
+
+    save_artifact(run_dir, "scroll_log", scroll_log, artifact_format)
+    save_artifact(run_dir, "dom_snapshots", dom_snapshots, artifact_format)
+
+    return scroll_log, dom_snapshots
+
+def save_video(video_path, run_dir, website_name):
+    if video_path and os.path.exists(video_path):
+        video_ext = os.path.splitext(video_path)[1] or '.webm'
+        new_video_path = os.path.join(run_dir, f"{website_name}{video_ext}")
+        shutil.move(video_path, new_video_path)
+        print(f"Video saved to: {new_video_path}")
+        return new_video_path
+
+    print("Warning: Video file not found or could not be accessed")
+    return None
@@ -0,0 +1,70 @@
+import base64, time
+import cv2
+import numpy as np
+
+class Screencast:
+    # Streams compositor frames from Page.startScreencast into a bounded
+    # queue as (timestamp, jpeg_bytes). Frames are acked only once queued,
+    # so a slow consumer throttles Chrome instead of growing memory.
+    def __init__(self, cdp_session, frame_queue, start_time=None, quality=80,
+                 max_width=None, max_height=None, every_nth_frame=1):
+        self.cdp_session = cdp_session
+        self.queue = frame_queue
+        self.start_time = time.time() if start_time is None else start_time
+        self.params = {"format": "jpeg", "quality": quality, "everyNthFrame": every_nth_frame}
+        # Downscaling happens in the browser before encoding
+        if max_width:
+            self.params["maxWidth"] = max_width
+        if max_height:
+            self.params["maxHeight"] = max_height
+        self.frames = 0
+        self.running = False
+
+    def _on_frame(self, params):
+        if self.running:
+            # metadata.timestamp is the compositor frame time in epoch seconds
+            timestamp = params.get("metadata", {}).get("timestamp") or time.time()
+            self.queue.put((timestamp - self.start_time, base64.b64decode(params["data"])))
+            self.frames += 1
+
+        self.cdp_session.send("Page.screencastFrameAck", {"sessionId": params["sessionId"]})
+
+    def start(self):
+        self.running = True
+        self.cdp_session.on("Page.screencastFrame", self._on_frame)
+        self.cdp_session.send("Page.startScreencast", self.params)
+
+    def stop(self):
+        self.running = False
+        self.cdp_session.send("Page.stopScreencast")
+        self.queue.put(None)
+
+def iter_screencast_frames(frame_queue, grayscale=True, crop=None):
+    # Yields (frame_idx, timestamp, frame) like analysis.frames.iter_frames
+    # until the Screencast is stopped. crop is (x, y, w, h) in frame pixels
+    mode = cv2.IMREAD_GRAYSCALE if grayscale else cv2.IMREAD_COLOR
+    frame_idx = 0
+    size = None
+
+    while True:
+        item = frame_queue.get()
+        if item is None:
+            return
+
+        timestamp, data = item
+        frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), mode)
+        if frame is None:
+            continue
+
+        if crop:
+            x, y, w, h = crop
+            frame = frame[y:y + h, x:x + w]
+
+        # Keep every frame the size of the first (the viewport can be resized)
+        if size is None:
+            size = frame.shape[1], frame.shape[0]
+        elif (frame.shape[1], frame.shape[0]) != size:
+            frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+
+        yield frame_idx, timestamp, frame
+        frame_idx += 1
@@ -1,50 +1,123 @@
 import time
+from capture.telemetry import install_telemetry, drain_telemetry, stop_telemetry, step_for_time
+from capture.settle import NetworkMonitor, install_settle, wait_for_settle
+from capture.dom import capture_dom_delta
+from pipeline import profiling
 
-def scroll_page(page, step=120, delay=0.5, network_idle_timeout=2000):
+# Scrollbar, overflow and document height, to tell native scrolling from
+# custom (wheel-driven) scroll implementations
+SCROLL_INFO_JS = """
+() => {
+    const hasScrollbar = document.documentElement.scrollHeight > document.documentElement.clientHeight ||
+                         document.body.scrollHeight > document.body.clientHeight;
+
+    // Check for common custom scroll indicators
+    const bodyStyle = window.getComputedStyle(document.body);
+    const htmlStyle = window.getComputedStyle(document.documentElement);
+    const isFixed = bodyStyle.overflow === 'hidden' || htmlStyle.overflow === 'hidden';
+
+    // Try to find scroll progress indicator
+    const progressBar = document.querySelector('[class*="progress"], [id*="progress"], [class*="scroll"], [id*="scroll"]');
+
+    return {
+        hasScrollbar: hasScrollbar,
+        isFixed: isFixed,
+        bodyOverflow: bodyStyle.overflow,
+        htmlOverflow: htmlStyle.overflow,
+        hasProgressBar: !!progressBar,
+        totalHeight: Math.max(
+            document.body.scrollHeight,
+            document.body.offsetHeight,
+            document.documentElement.clientHeight,
+            document.documentElement.scrollHeight,
+            document.documentElement.offsetHeight
+        )
+    };
+}
+"""
+
+def page_scroll_info(page):
+    return page.evaluate(SCROLL_INFO_JS)
+
+def is_custom_scroll(scroll_info):
+    return scroll_info['isFixed'] or not scroll_info['hasScrollbar']
+
+def log_quiet_steps(scroll_log, step_times, start_time, settle_fields, method, targets=None):
+    # Telemetry only keeps samples where something moved, so a step where
+    # nothing did (stuck, or at the end of the page) would lose its settle
+    # wait. Each such step gets an entry repeating the last known position
+    # at the time the step was issued
+    logged = {e["step"] for e in scroll_log}
+    entries = []
+    last = 0
+    for i, t in enumerate(step_times):
+        t = round(t - start_time, 3)
+        while last < len(scroll_log) and scroll_log[last]["time"] <= t:
+            last += 1
+        if i in logged:
+            continue
+        entry = {**scroll_log[last - 1]} if last else {"scrollY": 0, "method": method}
+        entry.update(time=t, step=i, **settle_fields(i))
+        if targets:
+            entry["scrollY"] = targets[i]
+        entries.append(entry)
+
+    if entries:
+        scroll_log[:] = sorted(scroll_log + entries, key=lambda e: e["time"])
+
+def scroll_page(page, step=120, delay=0.5, network_idle_timeout=2000, start_time=None,
+                drain_every=10, adaptive=True, max_settle=2.5):
     scroll_log = []
     
+    # Adaptive mode moves on once scrolling, DOM mutations, finite animations
+    # and network requests have all gone quiet (bounded by max_settle seconds).
+    # Otherwise each step waits the fixed 0.1s + delay + networkidle.
+    network = NetworkMonitor(page) if adaptive else None
+    settle_times = []
+    
+    @profiling.profiled("settle")
+    def settle(fixed_wait=None):
+        settle_start = time.time()
+        if adaptive:
+            _, reason = wait_for_settle(page, network, max_wait=max_settle)
+        elif fixed_wait is not None:
+            time.sleep(fixed_wait)
+            reason = "fixed"
+        else:
+            time.sleep(0.1)
+            time.sleep(delay)
+            reason = "fixed"
+            try:
+                with profiling.span("networkidle"):
+                    page.wait_for_load_state("networkidle", timeout=network_idle_timeout)
+            except:
+                reason = "network"
+        settle_times.append((time.time() - settle_start, reason))
+    
+    def settle_fields(sample_step):
+        if sample_step >= len(settle_times):
+            return {}
+        waited, reason = settle_times[sample_step]
+        return {"settle_ms": round(waited * 1000), "settle_reason": reason}
+    
     # First, try to detect if this is a custom scroll implementation
-    scroll_info = page.evaluate("""
-        () => {
-            const hasScrollbar = document.documentElement.scrollHeight > document.documentElement.clientHeight ||
-                                 document.body.scrollHeight > document.body.clientHeight;
-            
-            // Check for common custom scroll indicators
-            const bodyStyle = window.getComputedStyle(document.body);
-            const htmlStyle = window.getComputedStyle(document.documentElement);
-            const isFixed = bodyStyle.overflow === 'hidden' || htmlStyle.overflow === 'hidden';
-            
-            // Try to find scroll progress indicator
-            const progressBar = document.querySelector('[class*="progress"], [id*="progress"], [class*="scroll"], [id*="scroll"]');
-            
-            return {
-                hasScrollbar: hasScrollbar,
-                isFixed: isFixed,
-                bodyOverflow: bodyStyle.overflow,
-                htmlOverflow: htmlStyle.overflow,
-                hasProgressBar: !!progressBar,
-                totalHeight: Math.max(
-                    document.body.scrollHeight,
-                    document.body.offsetHeight,
-                    document.documentElement.clientHeight,
-                    document.documentElement.scrollHeight,
-                    document.documentElement.offsetHeight
-                )
-            };
-        }
-    """)
+    scroll_info = page_scroll_info(page)
     
     total_height = scroll_info['totalHeight']
-    is_custom_scroll = scroll_info['isFixed'] or not scroll_info['hasScrollbar']
+    custom_scroll = is_custom_scroll(scroll_info)
     
     scroll_y = 0
-    start_time = time.time()
+    if start_time is None:
+        start_time = time.time()
     last_progress = 0
     
+    if adaptive:
+        install_settle(page)
+    
     # Get viewport height for calculating scroll steps
     viewport_height = page.evaluate("() => window.innerHeight || document.documentElement.clientHeight")
     
-    if is_custom_scroll:
+    if custom_scroll:
         # Use mouse wheel events for custom scroll implementations
         print("Detected custom scroll implementation - using mouse wheel events")
         
@@ -58,252 +131,137 @@ def scroll_page(page, step=120, delay=0.5, network_idle_timeout=2000):
         
         print(f"Starting scroll with {num_steps} steps (estimated total height: {total_height}px, step size: {step}px)")
         
-        for i in range(num_steps):
+        # Scroll position, progress and height are sampled in the page on
+        # every animation frame and drained in bulk every `drain_every` steps
+        install_telemetry(page)
+        step_times = []
+        steps_since_drain = 0
+        last_sample_step = -1
+        last_report = -20
+        progress = 0
+        
+        def log_samples(samples):
+            nonlocal scroll_y, last_sample_step, progress
+            for s in samples:
+                sample_step = step_for_time(step_times, s["t"])
+                progress = s["progress"]
+                if progress > 0:
+                    scroll_y = int((progress / 100) * total_height)
+                else:
+                    scroll_y += step * max(0, sample_step - last_sample_step)
+                last_sample_step = sample_step
+                
+                scroll_log.append({
+                    "time": round(s["t"] - start_time, 3),
+                    "scrollY": scroll_y,
+                    "progress": round(progress, 2),
+                    "method": "wheel",
+                    "step": sample_step,
+                    **settle_fields(sample_step)
+                })
+            return samples
+        
+        def capture_dom():
+            # Wheel-driven scrollers fire no native scroll events for the DOM
+            # tracker. Between drains the position is estimated as log_samples
+            # does; the tracker prefers the page's progress when it has one
+            estimate = scroll_y + step * (len(step_times) - 1 - last_sample_step)
+            capture_dom_delta(page, estimate, total_height)
+        
+        i = 0
+        while i < num_steps:
             # Trigger wheel event (deltaY positive = scroll down)
             page.mouse.wheel(0, step)
+            step_times.append(time.time())
+            steps_since_drain += 1
             
-            time.sleep(0.1)  # Wait for scroll animation
-            
-            # Check scroll progress by reading progress bar or scroll position
-            progress = page.evaluate("""
-                () => {
-                    // Try multiple selectors for progress bar
-                    const selectors = [
-                        '[class*="progress"]',
-                        '[id*="progress"]',
-                        '[class*="scroll"]',
-                        '[id*="scroll"]',
-                        '[data-progress]',
-                        '.progress-bar',
-                        '#progress-bar'
-                    ];
-                    
-                    let progressBar = null;
-                    for (const selector of selectors) {
-                        progressBar = document.querySelector(selector);
-                        if (progressBar) break;
-                    }
-                    
-                    if (progressBar) {
-                        const style = window.getComputedStyle(progressBar);
-                        const rect = progressBar.getBoundingClientRect();
-                        
-                        // Try width-based progress
-                        const width = parseFloat(style.width) || rect.width || 0;
-                        const parent = progressBar.parentElement;
-                        if (parent) {
-                            const parentStyle = window.getComputedStyle(parent);
-                            const parentRect = parent.getBoundingClientRect();
-                            const maxWidth = parseFloat(parentStyle.width) || parentRect.width || 100;
-                            if (maxWidth > 0 && width > 0) {
-                                const widthProgress = (width / maxWidth) * 100;
-                                if (widthProgress >= 0 && widthProgress <= 100) return widthProgress;
-                            }
-                        }
-                        
-                        // Try transform-based progress (common in custom scroll)
-                        const transform = style.transform;
-                        if (transform && transform !== 'none') {
-                            const matrix = transform.match(/matrix[^)]*\\)/);
-                            if (matrix) {
-                                const values = matrix[0].match(/-?\\d+\\.?\\d*/g);
-                                if (values && values.length >= 5) {
-                                    const translateY = parseFloat(values[5]);
-                                    if (!isNaN(translateY)) {
-                                        // This is a heuristic - adjust based on actual implementation
-                                        return Math.abs(translateY) / 10;
-                                    }
-                                }
-                            }
-                        }
-                        
-                        // Try height-based progress
-                        const height = parseFloat(style.height) || rect.height || 0;
-                        if (parent) {
-                            const parentHeight = parseFloat(window.getComputedStyle(parent).height) || parent.getBoundingClientRect().height || 100;
-                            if (parentHeight > 0 && height > 0) {
-                                const heightProgress = (height / parentHeight) * 100;
-                                if (heightProgress >= 0 && heightProgress <= 100) return heightProgress;
-                            }
-                        }
-                        
-                        // Try data attribute
-                        const dataProgress = progressBar.getAttribute('data-progress');
-                        if (dataProgress) {
-                            const val = parseFloat(dataProgress);
-                            if (!isNaN(val) && val >= 0 && val <= 100) return val;
-                        }
-                    }
-                    
-                    // Fallback: try to get scroll position from window or custom scroll
-                    const scrollPos = window.pageYOffset || window.scrollY || 
-                                    document.documentElement.scrollTop || 
-                                    document.body.scrollTop || 0;
-                    const maxScroll = Math.max(
-                        document.body.scrollHeight,
-                        document.documentElement.scrollHeight
-                    ) - (window.innerHeight || document.documentElement.clientHeight);
-                    
-                    if (maxScroll > 0) {
-                        return (scrollPos / maxScroll) * 100;
-                    }
-                    
-                    return 0;
-                }
-            """)
-            
-            now = time.time() - start_time
-            scroll_y = int((progress / 100) * total_height) if progress > 0 else scroll_y + step
-            
-            scroll_log.append({
-                "time": round(now, 3),
-                "scrollY": scroll_y,
-                "progress": round(progress, 2),
-                "method": "wheel",
-                "step": i
-            })
-            
-            # Check if progress is stuck
-            progress_changed = abs(progress - last_progress) >= 0.5
+            settle()  # Wait for scroll animation and the page to settle
+            capture_dom()
             
-            if not progress_changed:
-                consecutive_no_progress += 1
-                stuck_count += 1
-            else:
-                consecutive_no_progress = 0
-                stuck_count = 0
-            
-            # Track if we're stuck at 0% progress (indicates detection failure)
-            if progress == 0:
-                zero_progress_count += 1
-            else:
-                zero_progress_count = 0
-            
-            # Early exit if stuck at 0% for too long (progress detection likely failed)
-            if zero_progress_count >= 30:
-                print(f"Warning: Progress detection appears to be failing (stuck at 0% for {zero_progress_count} steps)")
-                print("Attempting to continue with visual-based detection...")
-                # Try to detect if we've actually scrolled by checking viewport changes
-                viewport_check = page.evaluate("""
-                    () => {
-                        // Check if content has moved by comparing first visible element
-                        const firstEl = document.elementFromPoint(window.innerWidth / 2, 10);
-                        return firstEl ? firstEl.tagName : 'UNKNOWN';
-                    }
-                """)
-                # If we've scrolled many times but progress is still 0, likely at end or detection broken
-                if i > 50:
-                    print(f"Scrolled {i} steps with no progress detected. Assuming completion or detection issue.")
-                    break
-            
-            # Debug output every 20 steps
-            if i % 20 == 0:
-                print(f"Step {i}/{num_steps}: Progress={progress:.2f}%, Stuck count={stuck_count}, Zero progress count={zero_progress_count}")
-            
-            # Only break if we're at the end AND stuck for many attempts
-            # Be very conservative - don't break early
-            if progress >= 99.9:
-                stuck_count += 1
-                if stuck_count >= 20:  # Require many more confirmations at the end
-                    print(f"Reached end of page (progress: {progress:.2f}%) after {i} steps")
-                    break
-            elif progress >= 98 and stuck_count >= max_stuck_count:
-                # If we're very close to end and stuck, try harder
-                print(f"Near end but stuck at {progress:.2f}%, trying alternative scroll methods...")
-                # Try multiple scroll methods
-                page.keyboard.press("PageDown")
-                time.sleep(0.2)
-                page.mouse.wheel(0, step * 2)  # Larger wheel scroll
-                time.sleep(0.2)
-                page.keyboard.press("ArrowDown")
-                time.sleep(0.2)
-                # Re-check progress
-                progress = page.evaluate("""
-                    () => {
-                        const progressBar = document.querySelector('[class*="progress"], [id*="progress"]');
-                        if (progressBar) {
-                            const style = window.getComputedStyle(progressBar);
-                            const width = parseFloat(style.width) || progressBar.getBoundingClientRect().width || 0;
-                            const parent = progressBar.parentElement;
-                            if (parent) {
-                                const maxWidth = parseFloat(window.getComputedStyle(parent).width) || parent.getBoundingClientRect().width || 100;
-                                if (maxWidth > 0 && width > 0) return (width / maxWidth) * 100;
-                            }
-                        }
-                        return 0;
-                    }
-                """)
-                stuck_count = 0  # Reset stuck count after alternative scroll methods
-            
-            last_progress = progress
-            time.sleep(delay)
-            
-            # Update total height
-            new_height = page.evaluate("""
-                () => {
-                    return Math.max(
-                        document.body.scrollHeight,
-                        document.body.offsetHeight,
-                        document.documentElement.clientHeight,
-                        document.documentElement.scrollHeight,
-                        document.documentElement.offsetHeight
-                    );
-                }
-            """)
-            if new_height > total_height:
-                old_total = total_height
-                total_height = new_height
-                # Extend num_steps if content grew significantly
-                additional_steps = int((new_height - old_total) / step) + 20
-                num_steps = max(num_steps, i + additional_steps)
-                print(f"Content grew: {old_total} -> {new_height}, extending steps to {num_steps}")
+            if steps_since_drain >= drain_every or i == num_steps - 1:
+                samples = log_samples(drain_telemetry(page))
+                
+                # Check if progress is stuck; counters advance by the number
+                # of steps covered by this drain
+                progress_changed = abs(progress - last_progress) >= 0.5
+                
+                if not progress_changed:
+                    consecutive_no_progress += steps_since_drain
+                    stuck_count += steps_since_drain
+                else:
+                    consecutive_no_progress = 0
+                    stuck_count = 0
+                
+                # Track if we're stuck at 0% progress (indicates detection failure)
+                if progress == 0:
+                    zero_progress_count += steps_since_drain
+                else:
+                    zero_progress_count = 0
+                
+                # Early exit if stuck at 0% for too long (progress detection likely failed)
+                if zero_progress_count >= 30:
+                    print(f"Warning: Progress detection appears to be failing (stuck at 0% for {zero_progress_count} steps)")
+                    print("Attempting to continue with visual-based detection...")
+                    # If we've scrolled many times but progress is still 0, likely at end or detection broken
+                    if i > 50:
+                        print(f"Scrolled {i} steps with no progress detected. Assuming completion or detection issue.")
+                        break
+                
+                # Debug output every 20 steps
+                if i - last_report >= 20:
+                    print(f"Step {i}/{num_steps}: Progress={progress:.2f}%, Stuck count={stuck_count}, Zero progress count={zero_progress_count}")
+                    last_report = i
+                
+                # Only break if we're at the end AND stuck for many attempts
+                # Be very conservative - don't break early
+                if progress >= 99.9:
+                    stuck_count += 1
+                    if stuck_count >= 20:  # Require many more confirmations at the end
+                        print(f"Reached end of page (progress: {progress:.2f}%) after {i} steps")
+                        break
+                elif progress >= 98 and stuck_count >= max_stuck_count:
+                    # If we're very close to end and stuck, try harder
+                    print(f"Near end but stuck at {progress:.2f}%, trying alternative scroll methods...")
+                    # Try multiple scroll methods
+                    page.keyboard.press("PageDown")
+                    time.sleep(0.2)
+                    page.mouse.wheel(0, step * 2)  # Larger wheel scroll
+                    time.sleep(0.2)
+                    page.keyboard.press("ArrowDown")
+                    time.sleep(0.2)
+                    log_samples(drain_telemetry(page))
+                    stuck_count = 0  # Reset stuck count after alternative scroll methods
+                
+                last_progress = progress
+                steps_since_drain = 0
+                
+                # Update total height
+                new_height = max((s["height"] for s in samples), default=total_height)
+                if new_height > total_height:
+                    old_total = total_height
+                    total_height = new_height
+                    # Extend num_steps if content grew significantly
+                    additional_steps = int((new_height - old_total) / step) + 20
+                    num_steps = max(num_steps, i + additional_steps)
+                    print(f"Content grew: {old_total} -> {new_height}, extending steps to {num_steps}")
             
-            try:
-                page.wait_for_load_state("networkidle", timeout=network_idle_timeout)
-            except:
-                pass
+            i += 1
         
         # Final scroll attempts to ensure we reach the absolute end
         print("Performing final scrolls to reach end...")
         for final_scroll in range(30):  # More final scrolls
             page.mouse.wheel(0, step * 2)  # Larger scroll steps
-            time.sleep(0.2)
-            progress = page.evaluate("""
-                () => {
-                    const progressBar = document.querySelector('[class*="progress"], [id*="progress"]');
-                    if (progressBar) {
-                        const style = window.getComputedStyle(progressBar);
-                        const width = parseFloat(style.width) || progressBar.getBoundingClientRect().width || 0;
-                        const parent = progressBar.parentElement;
-                        if (parent) {
-                            const maxWidth = parseFloat(window.getComputedStyle(parent).width) || parent.getBoundingClientRect().width || 100;
-                            if (maxWidth > 0 && width > 0) return (width / maxWidth) * 100;
-                        }
-                    }
-                    return 0;
-                }
-            """)
+            step_times.append(time.time())
+            settle(fixed_wait=0.2)
+            capture_dom()
+            log_samples(drain_telemetry(page))
             if progress >= 99.9:
                 break
             time.sleep(0.1)
         
         # Log final progress
-        final_progress = page.evaluate("""
-            () => {
-                const progressBar = document.querySelector('[class*="progress"], [id*="progress"]');
-                if (progressBar) {
-                    const style = window.getComputedStyle(progressBar);
-                    const width = parseFloat(style.width) || progressBar.getBoundingClientRect().width || 0;
-                    const parent = progressBar.parentElement;
-                    if (parent) {
-                        const maxWidth = parseFloat(window.getComputedStyle(parent).width) || parent.getBoundingClientRect().width || 100;
-                        if (maxWidth > 0 && width > 0) return (width / maxWidth) * 100;
-                    }
-                }
-                return 0;
-            }
-        """)
-        print(f"Final scroll progress: {final_progress:.2f}%")
+        log_samples(stop_telemetry(page))
+        print(f"Final scroll progress: {progress:.2f}%")
     else:
         # Standard scroll implementation
         print("Using standard scroll implementation")
@@ -317,8 +275,25 @@ def scroll_page(page, step=120, delay=0.5, network_idle_timeout=2000):
             }
         """)
         
+        # Actual scroll position and document height come from the in-page
+        # recorder, drained every `drain_every` steps
+        install_telemetry(page)
+        step_times = []
+        step_targets = []
+        steps_since_drain = 0
         last_actual_scroll = 0
-        stuck_count = 0
+        
+        def log_samples(samples):
+            for s in samples:
+                scroll_log.append({
+                    "time": round(s["t"] - start_time, 3),
+                    "scrollY": step_targets[step_for_time(step_times, s["t"])] if step_targets else 0,
+                    "actualScrollY": s["scrollY"],
+                    "method": "standard",
+                    "step": step_for_time(step_times, s["t"]),
+                    **settle_fields(step_for_time(step_times, s["t"]))
+                })
+            return samples
         
         while scroll_y < total_height:
             # Use multiple scroll methods for better compatibility
@@ -332,23 +307,19 @@ def scroll_page(page, step=120, delay=0.5, network_idle_timeout=2000):
                     }}
                 }}
             """)
+            step_times.append(time.time())
+            step_targets.append(scroll_y)
+            steps_since_drain += 1
             
-            time.sleep(0.1)
-            
-            actual_scroll = page.evaluate("() => window.pageYOffset || window.scrollY || document.documentElement.scrollTop || document.body.scrollTop")
-            
-            now = time.time() - start_time
-            
-            scroll_log.append({
-                "time": round(now, 3),
-                "scrollY": scroll_y,
-                "actualScrollY": actual_scroll,
-                "method": "standard"
-            })
+            settle()
+            capture_dom_delta(page, scroll_y)
             
-            if abs(actual_scroll - last_actual_scroll) < 5 and scroll_y > 0:
-                stuck_count += 1
-                if stuck_count > 3:
+            if steps_since_drain >= drain_every or scroll_y + step >= total_height:
+                samples = log_samples(drain_telemetry(page))
+                actual_scroll = samples[-1]["scrollY"] if samples else last_actual_scroll
+                
+                # No movement across a whole drain window: re-issue the scroll
+                if abs(actual_scroll - last_actual_scroll) < 5 and scroll_y > 0:
                     page.evaluate(f"""
                         () => {{
                             window.scrollTo(0, {scroll_y});
@@ -356,36 +327,26 @@ def scroll_page(page, step=120, delay=0.5, network_idle_timeout=2000):
                         }}
                     """)
                     time.sleep(0.2)
-                    actual_scroll = page.evaluate("() => window.pageYOffset || window.scrollY || document.documentElement.scrollTop")
-                    stuck_count = 0
-            else:
-                stuck_count = 0
-            
-            last_actual_scroll = actual_scroll
-            
-            new_height = page.evaluate("""
-                () => {
-                    return Math.max(
-                        document.body.scrollHeight,
-                        document.body.offsetHeight,
-                        document.documentElement.clientHeight,
-                        document.documentElement.scrollHeight,
-                        document.documentElement.offsetHeight
-                    );
-                }
-            """)
-            if new_height > total_height:
-                total_height = new_height
-            
-            try:
-                page.wait_for_load_state("networkidle", timeout=network_idle_timeout)
-            except:
-                pass
+                
+                last_actual_scroll = actual_scroll
+                steps_since_drain = 0
+                
+                new_height = max((s["height"] for s in samples), default=total_height)
+                if new_height > total_height:
+                    total_height = new_height
+                
+                if actual_scroll >= total_height - 10:
+                    break
             
-            time.sleep(delay)
             scroll_y += step
-            
-            if actual_scroll >= total_height - 10:
-                break
+        
+        log_samples(stop_telemetry(page))
+    
+    log_quiet_steps(scroll_log, step_times, start_time, settle_fields,
+                    "wheel" if custom_scroll else "standard",
+                    targets=None if custom_scroll else step_targets)
+    
+    if network:
+        network.stop()
     
-    return scroll_log
\ No newline at end of file
+    return scroll_log
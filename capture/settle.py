@@ -0,0 +1,130 @@
+import itertools, time
+from playwright.sync_api import Error as PlaywrightError
+
+# Tracks the last scroll, scrollend and DOM mutation times in the page.
+SETTLE_JS = """
+() => {
+    if (window.__scrolldnaSettle) return;
+
+    const state = {
+        lastScroll: 0,
+        lastScrollEnd: 0,
+        lastMutation: 0
+    };
+
+    window.addEventListener('scroll', () => { state.lastScroll = performance.now(); }, { capture: true, passive: true });
+    window.addEventListener('scrollend', () => { state.lastScrollEnd = performance.now(); }, { capture: true, passive: true });
+
+    new MutationObserver(() => { state.lastMutation = performance.now(); }).observe(document.documentElement, {
+        subtree: true,
+        childList: true,
+        attributes: true,
+        characterData: true
+    });
+
+    window.__scrolldnaSettle = state;
+}
+"""
+
+# Polled by wait_for_function: the first call for a wait id starts a check
+# on every animation frame, and later calls return its result once
+# scrolling has ended, the DOM has been quiet for quietMs and no finite
+# animation is still running, or maxMs has passed. A timer also ends the
+# wait, since animation frames stop in hidden pages. The listeners are
+# reinstalled if a navigation dropped them
+WAIT_JS = """
+(opts) => {
+    if (!window.__scrolldnaSettle) (""" + SETTLE_JS.strip() + """)();
+    const st = window.__scrolldnaSettle;
+
+    if (!st.wait || st.wait.id !== opts.id) {
+        const wait = { id: opts.id, start: performance.now(), result: null };
+        st.wait = wait;
+
+        const check = () => {
+            if (wait.result) return;
+            const now = performance.now();
+            const elapsed = now - wait.start;
+
+            const scrolling = now - st.lastScroll < opts.quietMs && st.lastScrollEnd < st.lastScroll;
+            const mutating = now - st.lastMutation < opts.quietMs;
+            // Looping animations never finish, so only finite ones count
+            const animating = document.getAnimations().some(a =>
+                a.playState === 'running' &&
+                a.effect && isFinite(a.effect.getComputedTiming().endTime)
+            );
+
+            if (elapsed >= opts.minMs && !scrolling && !mutating && !animating) {
+                wait.result = { ms: elapsed, reason: 'settled' };
+            } else if (elapsed >= opts.maxMs) {
+                wait.result = { ms: elapsed, reason: scrolling ? 'scroll' : mutating ? 'mutation' : 'animation' };
+            } else {
+                requestAnimationFrame(check);
+            }
+        };
+
+        setTimeout(() => {
+            if (!wait.result) wait.result = { ms: performance.now() - wait.start, reason: 'timeout' };
+        }, opts.maxMs);
+        requestAnimationFrame(check);
+    }
+    return st.wait.result;
+}
+"""
+
+class NetworkMonitor:
+    # Counts requests still in flight; requests pending longer than
+    # `stale_after` seconds (long polling, streams) are ignored
+    def __init__(self, page, stale_after=5.0):
+        self.page = page
+        self.stale_after = stale_after
+        self.inflight = {}
+        page.on("request", self._on_request)
+        page.on("requestfinished", self._on_done)
+        page.on("requestfailed", self._on_done)
+
+    def _on_request(self, request):
+        if request.resource_type not in ("websocket", "eventsource"):
+            self.inflight[request] = time.time()
+
+    def _on_done(self, request):
+        self.inflight.pop(request, None)
+
+    def pending(self):
+        cutoff = time.time() - self.stale_after
+        return sum(1 for started in self.inflight.values() if started >= cutoff)
+
+    def stop(self):
+        self.page.remove_listener("request", self._on_request)
+        self.page.remove_listener("requestfinished", self._on_done)
+        self.page.remove_listener("requestfailed", self._on_done)
+
+_wait_ids = itertools.count()
+
+def install_settle(page):
+    page.evaluate(SETTLE_JS)
+
+def wait_for_settle(page, network=None, max_wait=2.5, quiet_ms=100, min_ms=50, grace=1.0):
+    # Playwright enforces its own timeout (max_wait + grace seconds) on the
+    # wait, so a page that stops responding or keeps navigating cannot hang
+    # the capture
+    start = time.time()
+    try:
+        result = page.wait_for_function(WAIT_JS, arg={
+            "id": next(_wait_ids),
+            "quietMs": quiet_ms,
+            "minMs": min_ms,
+            "maxMs": max_wait * 1000
+        }, polling=20, timeout=(max_wait + grace) * 1000).json_value()
+        reason = result["reason"]
+    except PlaywrightError:
+        reason = "timeout"
+
+    # Playwright delivers request events while we wait on the page
+    while network and network.pending() and time.time() - start < max_wait:
+        page.wait_for_timeout(50)
+
+    if network and network.pending():
+        reason = "network"
+
+    return time.time() - start, reason
@@ -0,0 +1,169 @@
+import bisect
+from pipeline import profiling
+
+# Installs a requestAnimationFrame sampler that records scroll position,
+# progress-indicator value and document height into an in-page buffer.
+# The progress element is looked up once and only re-queried if it is
+# removed from the document.
+TELEMETRY_JS = """
+() => {
+    if (window.__scrolldna) {
+        const existing = window.__scrolldna;
+        existing.buffer = [];
+        if (!existing.running) {
+            existing.running = true;
+            requestAnimationFrame(existing.sample);
+        }
+        return;
+    }
+
+    const selectors = [
+        '[class*="progress"]',
+        '[id*="progress"]',
+        '[class*="scroll"]',
+        '[id*="scroll"]',
+        '[data-progress]',
+        '.progress-bar',
+        '#progress-bar'
+    ];
+
+    const findProgressBar = () => {
+        for (const selector of selectors) {
+            const el = document.querySelector(selector);
+            if (el) return el;
+        }
+        return null;
+    };
+
+    const readProgress = (progressBar) => {
+        if (progressBar) {
+            const style = window.getComputedStyle(progressBar);
+            const rect = progressBar.getBoundingClientRect();
+            const parent = progressBar.parentElement;
+
+            // Width-based progress
+            const width = parseFloat(style.width) || rect.width || 0;
+            if (parent) {
+                const parentRect = parent.getBoundingClientRect();
+                const maxWidth = parseFloat(window.getComputedStyle(parent).width) || parentRect.width || 100;
+                if (maxWidth > 0 && width > 0) {
+                    const widthProgress = (width / maxWidth) * 100;
+                    if (widthProgress >= 0 && widthProgress <= 100) return widthProgress;
+                }
+            }
+
+            // Transform-based progress (common in custom scroll)
+            const transform = style.transform;
+            if (transform && transform !== 'none') {
+                const matrix = transform.match(/matrix[^)]*\\)/);
+                if (matrix) {
+                    const values = matrix[0].match(/-?\\d+\\.?\\d*/g);
+                    if (values && values.length >= 5) {
+                        const translateY = parseFloat(values[5]);
+                        if (!isNaN(translateY)) return Math.abs(translateY) / 10;
+                    }
+                }
+            }
+
+            // Height-based progress
+            const height = parseFloat(style.height) || rect.height || 0;
+            if (parent) {
+                const parentHeight = parseFloat(window.getComputedStyle(parent).height) || parent.getBoundingClientRect().height || 100;
+                if (parentHeight > 0 && height > 0) {
+                    const heightProgress = (height / parentHeight) * 100;
+                    if (heightProgress >= 0 && heightProgress <= 100) return heightProgress;
+                }
+            }
+
+            const dataProgress = progressBar.getAttribute('data-progress');
+            if (dataProgress) {
+                const val = parseFloat(dataProgress);
+                if (!isNaN(val) && val >= 0 && val <= 100) return val;
+            }
+        }
+
+        // Fallback: native scroll position
+        const scrollPos = window.pageYOffset || window.scrollY ||
+                          document.documentElement.scrollTop ||
+                          document.body.scrollTop || 0;
+        const maxScroll = Math.max(
+            document.body.scrollHeight,
+            document.documentElement.scrollHeight
+        ) - (window.innerHeight || document.documentElement.clientHeight);
+
+        return maxScroll > 0 ? (scrollPos / maxScroll) * 100 : 0;
+    };
+
+    const state = {
+        buffer: [],
+        progressBar: findProgressBar(),
+        last: null,
+        running: true
+    };
+
+    const sample = () => {
+        if (!state.running) return;
+
+        if (state.progressBar && !state.progressBar.isConnected) {
+            state.progressBar = findProgressBar();
+        }
+
+        const s = {
+            t: Date.now() / 1000,
+            scrollY: window.pageYOffset || window.scrollY ||
+                     document.documentElement.scrollTop ||
+                     (document.body && document.body.scrollTop) || 0,
+            progress: readProgress(state.progressBar),
+            height: Math.max(
+                document.body.scrollHeight,
+                document.body.offsetHeight,
+                document.documentElement.clientHeight,
+                document.documentElement.scrollHeight,
+                document.documentElement.offsetHeight
+            )
+        };
+
+        // Only keep frames where something changed
+        const last = state.last;
+        if (!last || last.scrollY !== s.scrollY || last.progress !== s.progress || last.height !== s.height) {
+            state.buffer.push(s);
+            state.last = s;
+        }
+
+        requestAnimationFrame(sample);
+    };
+
+    state.drain = () => {
+        const out = state.buffer;
+        state.buffer = [];
+        // Always report the latest state, even if nothing changed since
+        // the previous drain
+        if (!out.length && state.last) out.push({...state.last, t: Date.now() / 1000});
+        return out;
+    };
+
+    state.sample = sample;
+    window.__scrolldna = state;
+    requestAnimationFrame(sample);
+}
+"""
+
+def install_telemetry(page):
+    page.evaluate(TELEMETRY_JS)
+
+@profiling.profiled("drain_telemetry")
+def drain_telemetry(page):
+    return page.evaluate("() => window.__scrolldna ? window.__scrolldna.drain() : []")
+
+def stop_telemetry(page):
+    return page.evaluate("""
+        () => {
+            if (!window.__scrolldna) return [];
+            window.__scrolldna.running = false;
+            return window.__scrolldna.drain();
+        }
+    """)
+
+def step_for_time(step_times, t):
+    # Index of the last scroll step issued at or before wall time t
+    return max(0, bisect.bisect_right(step_times, t) - 1)
@@ -0,0 +1,210 @@
+import base64, time
+import cv2
+import numpy as np
+from capture.scroll import page_scroll_info, is_custom_scroll
+from capture.dom import capture_dom_delta
+from capture.telemetry import install_telemetry, drain_telemetry, stop_telemetry
+from pipeline import profiling
+
+# Capture on CDP virtual time. The page clock is paused and only moves when
+# advanced by a fixed budget, so timers, CSS/JS animations and
+# requestAnimationFrame all run a known amount of page time per scroll step
+# no matter how long the renderer takes. A frame is screenshotted after each
+# tick and written to a video whose frame rate is the tick rate, so video
+# timestamps are page time and the usual video analysis applies unchanged.
+# Captures run as fast as frames can be produced and repeat exactly.
+
+class VirtualClock:
+    # Page time in ms since the clock started. initial_time (epoch seconds)
+    # becomes the page's Date.now(), so in-page timestamps minus
+    # initial_time are virtual elapsed time
+    def __init__(self, page, cdp_session, initial_time, network_wait=5.0):
+        self.page = page
+        self.cdp_session = cdp_session
+        self.network_wait = network_wait
+        self.elapsed = 0.0
+        self.expired = False
+        self.stalls = 0
+        cdp_session.on("Emulation.virtualTimeBudgetExpired", self._on_expired)
+        cdp_session.send("Emulation.setVirtualTimePolicy", {
+            "policy": "pause", "initialVirtualTime": initial_time
+        })
+
+    def _on_expired(self, params):
+        self.expired = True
+
+    def _run(self, policy, budget, wait):
+        # Returns whether the budget was used up within `wait` real seconds
+        self.expired = False
+        self.cdp_session.send("Emulation.setVirtualTimePolicy", {"policy": policy, "budget": budget})
+        deadline = time.time() + wait
+        while not self.expired:
+            if time.time() > deadline:
+                return False
+            # Lets Playwright dispatch the expiry event
+            self.page.wait_for_timeout(1)
+        return True
+
+    @profiling.profiled("advance_virtual_time")
+    def advance(self, ms):
+        # Time waits for in-flight requests, so content arriving over the
+        # network lands at the same page time on every run. A request that
+        # never finishes (long polling, streams) would stall the clock; after
+        # network_wait seconds the tick runs regardless
+        if not self._run("pauseIfNetworkFetchesPending", ms, self.network_wait):
+            self.stalls += 1
+            profiling.count("virtual time network stalls")
+            self._run("advance", ms, self.network_wait)
+        self.elapsed += ms
+
+    def release(self):
+        # Back to real time for whatever runs after the capture
+        self.cdp_session.send("Emulation.setVirtualTimePolicy", {"policy": "advance"})
+
+@profiling.profiled("screenshot")
+def capture_frame(cdp_session, quality=85, max_width=None):
+    data = cdp_session.send("Page.captureScreenshot", {
+        "format": "jpeg", "quality": quality, "optimizeForSpeed": True
+    })["data"]
+    frame = cv2.imdecode(np.frombuffer(base64.b64decode(data), dtype=np.uint8), cv2.IMREAD_COLOR)
+    if frame is not None and max_width and frame.shape[1] > max_width:
+        height = round(frame.shape[0] * max_width / frame.shape[1])
+        frame = cv2.resize(frame, (max_width, height), interpolation=cv2.INTER_AREA)
+    return frame
+
+class FrameWriter:
+    # Constant-rate video of the captured ticks; frames are resized to the
+    # first frame's size if the viewport changes
+    def __init__(self, path, fps):
+        self.path = path
+        self.fps = fps
+        self.writer = None
+        self.size = None
+        self.last = None
+        self.frames = 0
+
+    def write(self, frame):
+        if frame is None:
+            # Keep the frame count on the tick grid
+            if self.last is None:
+                return
+            frame = self.last
+        if self.writer is None:
+            self.size = (frame.shape[1], frame.shape[0])
+            self.writer = cv2.VideoWriter(self.path, cv2.VideoWriter_fourcc(*"mp4v"), self.fps, self.size)
+            if not self.writer.isOpened():
+                # Frames written to an unopened writer are silently dropped
+                raise RuntimeError(f"Could not open {self.path} for writing (is OpenCV's mp4v encoder available?)")
+        elif (frame.shape[1], frame.shape[0]) != self.size:
+            frame = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        self.writer.write(frame)
+        self.last = frame
+        self.frames += 1
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.release()
+
+def virtual_scroll(page, cdp_session, video_path, step=120, start_time=None, step_ms=100,
+                   frames_per_step=2, max_width=None, quality=85, max_steps=5000):
+    # Scrolls one step per step_ms of page time, capturing frames_per_step
+    # frames per step into video_path. Returns the scroll log, timed in page
+    # time since start_time like scroll_page's
+    if start_time is None:
+        start_time = time.time()
+    tick_ms = step_ms / frames_per_step
+
+    scroll_info = page_scroll_info(page)
+    total_height = scroll_info["totalHeight"]
+    custom_scroll = is_custom_scroll(scroll_info)
+    method = "wheel" if custom_scroll else "standard"
+    print(f"Virtual time capture ({method} scrolling): {step}px per {step_ms:g}ms of page time, "
+          f"{frames_per_step} frames per step")
+
+    if not custom_scroll:
+        page.evaluate("""
+            () => {
+                document.documentElement.style.scrollBehavior = 'auto';
+                if (document.body) {
+                    document.body.style.scrollBehavior = 'auto';
+                }
+            }
+        """)
+
+    started = time.time()
+    clock = VirtualClock(page, cdp_session, start_time)
+    # Installed once the clock is paused, so every sample carries page time
+    install_telemetry(page)
+    writer = FrameWriter(video_path, fps=1000 / tick_ms)
+    scroll_log = []
+    progress = 0
+
+    def log_samples(samples, sample_step, target):
+        nonlocal progress
+        for s in samples:
+            entry = {"time": round(s["t"] - start_time, 3), "scrollY": target,
+                     "actualScrollY": s["scrollY"], "method": "virtual", "step": sample_step}
+            if custom_scroll:
+                progress = s["progress"]
+                if progress > 0:
+                    entry["scrollY"] = int((progress / 100) * total_height)
+                entry["progress"] = round(progress, 2)
+            scroll_log.append(entry)
+        return samples
+
+    # Custom scrollers stop once progress sits at the end or stops moving;
+    # without readable progress each wheel step is assumed to land
+    num_steps = min(max_steps, int((total_height / step) * 2) + 100) if custom_scroll else max_steps
+    at_end = unchanged = 0
+    last_progress = 0
+    last_step = target = 0
+
+    try:
+        # Frame 0 is the page as loaded, at page time 0
+        writer.write(capture_frame(cdp_session, quality, max_width))
+
+        for i in range(num_steps):
+            if custom_scroll:
+                target = step * (i + 1)
+                page.mouse.wheel(0, step)
+            else:
+                if step * i >= total_height:
+                    break
+                target = step * i
+                page.evaluate(f"""
+                    () => {{
+                        window.scrollTo({{ top: {target}, left: 0, behavior: 'instant' }});
+                        document.documentElement.scrollTop = {target};
+                        if (document.body) {{
+                            document.body.scrollTop = {target};
+                        }}
+                    }}
+                """)
+            last_step = i
+
+            for _ in range(frames_per_step):
+                clock.advance(tick_ms)
+                writer.write(capture_frame(cdp_session, quality, max_width))
+            capture_dom_delta(page, target, total_height if custom_scroll else None)
+
+            samples = log_samples(drain_telemetry(page), i, target)
+            total_height = max([total_height] + [s["height"] for s in samples])
+
+            if custom_scroll:
+                at_end = at_end + 1 if progress >= 99.9 else 0
+                unchanged = unchanged + 1 if abs(progress - last_progress) < 0.5 else 0
+                last_progress = progress
+                # Progress stuck at 0 past 50 steps: detection failed, as in scroll_page
+                if at_end >= 10 or (unchanged >= 30 and (progress or i > 50)):
+                    break
+
+        log_samples(stop_telemetry(page), last_step, target)
+    finally:
+        writer.close()
+        clock.release()
+
+    seconds = time.time() - started
+    print(f"Captured {writer.frames} frames covering {clock.elapsed / 1000:.1f}s of page time "
+          f"in {seconds:.1f}s"
+          + (f" ({clock.stalls} ticks ran with requests still pending)" if clock.stalls else ""))
+    return scroll_log
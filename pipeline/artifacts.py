@@ -0,0 +1,300 @@
+import json, os
+import numpy as np
+
+# Binary run bundle: one raw .npy file per column under <run_dir>/bundle,
+# described by a small header.json. Numeric columns are stored as-is,
+# strings are dictionary-encoded, and list-valued columns are flattened
+# with an offsets array. Readers memory-map the .npy files, so loading a
+# run touches only the columns it actually reads.
+BUNDLE_VERSION = 1
+TABLE_ARTIFACTS = ("scroll_log", "motion_tracks", "scroll_tracks", "frame_map")
+
+def bundle_dir(run_dir):
+    return os.path.join(run_dir, "bundle")
+
+def _read_header(path):
+    header_path = os.path.join(path, "header.json")
+    if not os.path.exists(header_path):
+        return {"version": BUNDLE_VERSION, "tables": {}}
+    with open(header_path) as f:
+        return json.load(f)
+
+def _write_header(path, header):
+    tmp_path = os.path.join(path, "header.json.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(header, f)
+    os.replace(tmp_path, os.path.join(path, "header.json"))
+
+def _is_number(v):
+    return isinstance(v, (int, float, np.integer, np.floating)) and not isinstance(v, bool)
+
+class Ragged:
+    # A list-valued column kept flat: row i is values[offsets[i]:offsets[i + 1]]
+    def __init__(self, values, offsets):
+        self.values = values
+        self.offsets = offsets
+
+    @classmethod
+    def from_lists(cls, lists):
+        lengths = [len(v) if v is not None else 0 for v in lists]
+        offsets = np.concatenate(([0], np.cumsum(lengths))).astype(np.int64)
+        values = np.array([x for v in lists if v is not None for x in v])
+        return cls(values, offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def lengths(self):
+        return np.diff(self.offsets)
+
+    def select(self, rows):
+        # rows: boolean mask or index array over rows
+        lengths = self.lengths()
+        mask = np.zeros(len(self), dtype=bool)
+        mask[rows] = True
+        kept = lengths[mask]
+        return Ragged(
+            self.values[np.repeat(mask, lengths)],
+            np.concatenate(([0], np.cumsum(kept))).astype(np.int64)
+        )
+
+    def tolist(self):
+        values = self.values.tolist()
+        offsets = self.offsets.tolist()
+        return [values[offsets[i]:offsets[i + 1]] for i in range(len(self))]
+
+_ARRAY_KINDS = {"b": "bool", "i": "int", "u": "int", "f": "float"}
+
+def _encode(path, stem, values):
+    # Writes one column and returns its header entry
+    if isinstance(values, Ragged):
+        np.save(os.path.join(path, f"{stem}.offsets.npy"), np.asarray(values.offsets, dtype=np.int64))
+        return {"kind": "ragged", "offsets": f"{stem}.offsets.npy",
+                "values": _encode(path, f"{stem}.values", values.values)}
+
+    if isinstance(values, np.ndarray):
+        kind = _ARRAY_KINDS.get(values.dtype.kind)
+        if kind is None:
+            values = values.tolist()
+        else:
+            dtype = {"bool": bool, "int": np.int64, "float": np.float64}[kind]
+            np.save(os.path.join(path, f"{stem}.npy"), values.astype(dtype, copy=False))
+            return {"kind": kind, "file": f"{stem}.npy"}
+
+    present = [v for v in values if v is not None]
+
+    if present and all(isinstance(v, (list, tuple)) for v in present):
+        lengths = [len(v) if v is not None else 0 for v in values]
+        offsets = np.concatenate(([0], np.cumsum(lengths))).astype(np.int64)
+        np.save(os.path.join(path, f"{stem}.offsets.npy"), offsets)
+        flat = [x for v in values if v is not None for x in v]
+        return {"kind": "ragged", "offsets": f"{stem}.offsets.npy",
+                "values": _encode(path, f"{stem}.values", flat)}
+
+    if all(isinstance(v, bool) for v in present) and present:
+        np.save(os.path.join(path, f"{stem}.npy"), np.array([bool(v) for v in values]))
+        return {"kind": "bool", "file": f"{stem}.npy"}
+
+    if all(_is_number(v) for v in present):
+        if len(present) == len(values) and all(isinstance(v, (int, np.integer)) for v in present):
+            array = np.array(values, dtype=np.int64)
+        else:
+            array = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+        np.save(os.path.join(path, f"{stem}.npy"), array)
+        return {"kind": "int" if array.dtype == np.int64 else "float", "file": f"{stem}.npy"}
+
+    if all(isinstance(v, str) for v in present):
+        categories = sorted(set(present))
+        lookup = {c: i for i, c in enumerate(categories)}
+        codes = np.array([-1 if v is None else lookup[v] for v in values], dtype=np.int32)
+        np.save(os.path.join(path, f"{stem}.npy"), codes)
+        return {"kind": "category", "file": f"{stem}.npy", "categories": categories}
+
+    # Anything irregular stays in the header as JSON
+    return {"kind": "json", "data": values}
+
+def write_table(run_dir, name, columns, rows=None):
+    # columns: {column_name: list of per-row values, array or Ragged}
+    path = bundle_dir(run_dir)
+    os.makedirs(path, exist_ok=True)
+
+    if rows is None:
+        rows = len(next(iter(columns.values()), []))
+
+    header = _read_header(path)
+    header["tables"][name] = {
+        "rows": rows,
+        "columns": {col: _encode(path, f"{name}.{col}",
+                                 values if isinstance(values, (np.ndarray, Ragged)) else list(values))
+                    for col, values in columns.items()}
+    }
+    _write_header(path, header)
+
+def _column_files(entry):
+    # The .npy files behind one column's header entry
+    for key in ("file", "offsets"):
+        if key in entry:
+            yield entry[key]
+    if "values" in entry:
+        yield from _column_files(entry["values"])
+
+def drop_tables(run_dir, names):
+    # Unregisters tables from the bundle and deletes their column files
+    path = bundle_dir(run_dir)
+    header = _read_header(path)
+    dropped = [header["tables"].pop(name) for name in names if name in header["tables"]]
+    if not dropped:
+        return
+    _write_header(path, header)
+    for spec in dropped:
+        for entry in spec["columns"].values():
+            for name in _column_files(entry):
+                try:
+                    os.remove(os.path.join(path, name))
+                except FileNotFoundError:
+                    pass
+
+def records_to_columns(records):
+    keys = list(dict.fromkeys(k for r in records for k in r))
+    return {k: [r.get(k) for r in records] for k in keys}
+
+class Table:
+    # Column access over a memory-mapped bundle table
+    def __init__(self, path, spec):
+        self.path = path
+        self.spec = spec
+        self.rows = spec["rows"]
+
+    def __contains__(self, name):
+        return name in self.spec["columns"]
+
+    def names(self):
+        return list(self.spec["columns"])
+
+    def _load(self, entry):
+        if entry["kind"] == "json":
+            return entry["data"]
+        return np.load(os.path.join(self.path, entry["file"]), mmap_mode="r")
+
+    def raw(self, name):
+        # Stored array: codes for categories, flat values for ragged columns
+        entry = self.spec["columns"][name]
+        if entry["kind"] == "ragged":
+            return self._load(entry["values"])
+        return self._load(entry)
+
+    def offsets(self, name):
+        entry = self.spec["columns"][name]
+        return np.load(os.path.join(self.path, entry["offsets"]), mmap_mode="r")
+
+    def column(self, name):
+        # Decoded values; ragged columns come back as one list per row
+        entry = self.spec["columns"][name]
+        if entry["kind"] == "ragged":
+            values = self._decode(entry["values"])
+            offsets = self.offsets(name)
+            return [values[offsets[i]:offsets[i + 1]] for i in range(self.rows)]
+        return self._decode(entry)
+
+    def _decode(self, entry):
+        data = self._load(entry)
+        if entry["kind"] == "category":
+            categories = np.array(entry["categories"] + [None], dtype=object)
+            return list(categories[np.asarray(data)])
+        if entry["kind"] == "json":
+            return data
+        return data.tolist()
+
+    def columns(self):
+        return {name: self.column(name) for name in self.names()}
+
+    def records(self):
+        # Export view: one dict per row, dropping missing values
+        cols = self.columns()
+        out = []
+        for i in range(self.rows):
+            row = {}
+            for name, values in cols.items():
+                v = values[i]
+                if v is None or (isinstance(v, float) and np.isnan(v)):
+                    continue
+                row[name] = v
+            out.append(row)
+        return out
+
+def read_table(run_dir, name):
+    path = bundle_dir(run_dir)
+    header = _read_header(path)
+    if name not in header["tables"]:
+        raise KeyError(f"{name} not found in {path}")
+    return Table(path, header["tables"][name])
+
+def has_table(run_dir, name):
+    return name in _read_header(bundle_dir(run_dir))["tables"]
+
+def _write_json(run_dir, name, data):
+    with open(f"{run_dir}/{name}.json", "w") as f:
+        if name == "dom_snapshots":
+            json.dump(data, f, separators=(",", ":"))
+        else:
+            json.dump(data, f, indent=2)
+
+def save_artifact(run_dir, name, data, fmt="binary"):
+    # fmt: "binary", "json" or "both". effects.json is always JSON. Columnar
+    # data (anything with columns() and records(), e.g. TrackColumns) is
+    # written to the bundle without going through per-row dicts
+    columnar = hasattr(data, "columns") and hasattr(data, "records")
+    if columnar:
+        columns, rows = data.columns(), len(data)
+        if fmt in ("json", "both") or name not in TABLE_ARTIFACTS:
+            data = data.records()
+
+    if fmt in ("json", "both") or name not in TABLE_ARTIFACTS + ("dom_snapshots",):
+        _write_json(run_dir, name, data)
+
+    if fmt == "json":
+        # A stage rewrote its output as JSON only: drop the stale binary
+        # copy so load_artifact reads the fresh JSON
+        drop_tables(run_dir, ("dom_snapshot", "dom_deltas") if name == "dom_snapshots" else (name,))
+
+    if fmt in ("binary", "both"):
+        if name == "dom_snapshots":
+            write_table(run_dir, "dom_snapshot", data["snapshot"])
+            write_table(run_dir, "dom_deltas", records_to_columns(data["deltas"]), len(data["deltas"]))
+        elif name in TABLE_ARTIFACTS and columnar:
+            write_table(run_dir, name, columns, rows)
+        elif name in TABLE_ARTIFACTS:
+            write_table(run_dir, name, records_to_columns(data), len(data))
+
+def load_artifact(run_dir, name):
+    # Prefers the binary bundle and falls back to <name>.json
+    if name == "dom_snapshots" and has_table(run_dir, "dom_snapshot"):
+        return {
+            "snapshot": read_table(run_dir, "dom_snapshot").columns(),
+            "deltas": read_table(run_dir, "dom_deltas").records()
+        }
+    if name in TABLE_ARTIFACTS and has_table(run_dir, name):
+        return read_table(run_dir, name).records()
+
+    with open(f"{run_dir}/{name}.json") as f:
+        return json.load(f)
+
+def export_json(run_dir):
+    # JSON copies beside the bundle, which stays as it is
+    for name in TABLE_ARTIFACTS:
+        if has_table(run_dir, name):
+            _write_json(run_dir, name, load_artifact(run_dir, name))
+    if has_table(run_dir, "dom_snapshot"):
+        _write_json(run_dir, "dom_snapshots", load_artifact(run_dir, "dom_snapshots"))
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 2:
+        print("Usage: python -m pipeline.artifacts <run_dir> [<run_dir> ...]")
+        print("  Writes JSON exports of the binary bundle in each run directory")
+        sys.exit(1)
+
+    for run_dir in sys.argv[1:]:
+        export_json(run_dir)
+        print(f"Exported {run_dir}")
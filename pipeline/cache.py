@@ -0,0 +1,158 @@
+import hashlib, json, os, shutil, time, uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Source files each stage's output depends on; their contents form the
+# stage's code version, so editing them invalidates that stage's entries
+STAGE_SOURCES = {
+    "capture": ["capture/browser.py", "capture/dom.py", "capture/network.py", "capture/record.py",
+                "capture/scroll.py", "capture/settle.py", "capture/telemetry.py",
+                "capture/virtual_time.py"],
+    "regions": ["analysis/correlate.py", "analysis/frames.py", "analysis/motion.py",
+                "analysis/parallel.py"],
+    "tracks": ["analysis/motion.py", "analysis/tracks.py"]
+}
+
+def hash_file(path, chunk_size=1 << 20):
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def hash_json(data):
+    encoded = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(encoded.encode(), digest_size=20).hexdigest()
+
+def code_version(stage):
+    digest = hashlib.blake2b(digest_size=12)
+    for rel_path in STAGE_SOURCES.get(stage, []):
+        path = os.path.join(ROOT, rel_path)
+        if os.path.exists(path):
+            digest.update(rel_path.encode())
+            with open(path, "rb") as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+def _dir_size(path):
+    return sum(
+        os.path.getsize(os.path.join(root, f))
+        for root, _, files in os.walk(path) for f in files
+    )
+
+class StageCache:
+    # Content-addressed cache of stage outputs under <root>/<stage>/<key>.
+    # Each entry holds its payload files plus meta.json (inputs, code
+    # version, size, last use). Total size is kept under max_bytes by
+    # evicting the least recently used entries.
+    def __init__(self, root="output/cache", max_bytes=5 * 1024 ** 3):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.versions = {stage: code_version(stage) for stage in STAGE_SOURCES}
+        os.makedirs(root, exist_ok=True)
+
+    def key(self, stage, **inputs):
+        return hash_json({"stage": stage, "version": self.versions[stage], "inputs": inputs})
+
+    def _entry(self, stage, key):
+        return os.path.join(self.root, stage, key)
+
+    def _entries(self):
+        for stage in os.listdir(self.root):
+            stage_dir = os.path.join(self.root, stage)
+            if not os.path.isdir(stage_dir):
+                continue
+            for key in os.listdir(stage_dir):
+                meta_path = os.path.join(stage_dir, key, "meta.json")
+                try:
+                    with open(meta_path) as f:
+                        yield os.path.join(stage_dir, key), json.load(f)
+                except (OSError, ValueError):
+                    continue
+
+    def get(self, stage, key):
+        # Returns the entry directory on a hit, touching its last-use time
+        path = self._entry(stage, key)
+        meta_path = os.path.join(path, "meta.json")
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get("version") != self.versions.get(stage):
+            return None
+
+        # Replaced rather than rewritten, so a concurrent reader never sees
+        # a half-written meta.json; an entry evicted meanwhile is a miss
+        meta["last_used"] = time.time()
+        tmp_path = f"{meta_path}.tmp-{uuid.uuid4().hex}"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(meta, f)
+            os.replace(tmp_path, meta_path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return None
+        return path
+
+    def put(self, stage, key, write, inputs=None):
+        # write(dir) fills a staging directory that is then moved into place,
+        # so readers never see a half-written entry
+        tmp_path = os.path.join(self.root, f".tmp-{uuid.uuid4().hex}")
+        os.makedirs(tmp_path)
+        try:
+            write(tmp_path)
+            meta = {
+                "stage": stage,
+                "key": key,
+                "version": self.versions[stage],
+                "inputs": inputs,
+                "created": time.time(),
+                "last_used": time.time(),
+                "size": _dir_size(tmp_path)
+            }
+            with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+                json.dump(meta, f)
+
+            path = self._entry(stage, key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if os.path.exists(path):
+                shutil.rmtree(path)
+            os.replace(tmp_path, path)
+        finally:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+        self.evict()
+        return path
+
+    def get_json(self, stage, key):
+        path = self.get(stage, key)
+        if path is None:
+            return None
+        with open(os.path.join(path, "data.json")) as f:
+            return json.load(f)
+
+    def put_json(self, stage, key, data, inputs=None):
+        def write(path):
+            with open(os.path.join(path, "data.json"), "w") as f:
+                json.dump(data, f, separators=(",", ":"))
+        self.put(stage, key, write, inputs)
+
+    def prune_stale(self):
+        # Removes entries written by an older version of their stage's code
+        removed = 0
+        for path, meta in list(self._entries()):
+            if meta.get("version") != self.versions.get(meta.get("stage")):
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+        return removed
+
+    def evict(self):
+        entries = sorted(self._entries(), key=lambda e: e[1].get("last_used", 0))
+        total = sum(meta.get("size", 0) for _, meta in entries)
+        for path, meta in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= meta.get("size", 0)
@@ -0,0 +1,328 @@
+import json, os, sqlite3, time
+from contextlib import contextmanager
+import numpy as np
+from pipeline.stages import STAGES, marker_path, read_marker
+from analysis.tracks import TrackColumns
+from analysis.correlate import compute_motion_ratios
+from analysis.classify import classify_effects
+
+# Cross-run effects database. ingest() walks run directories and loads each
+# classified run's metadata, effects and scroll-correlated track summaries
+# into SQLite. A run is re-read only when its classify marker changed
+# (size and mtime), so repeated ingests over tens of thousands of runs cost
+# one stat per run. Effects are indexed by type, confidence and scroll
+# range, with the remaining filter columns in each index so queries are
+# answered from the indexes alone; a range filter matches effects whose
+# scroll range overlaps it.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    run_dir TEXT NOT NULL UNIQUE,
+    site TEXT NOT NULL,
+    url TEXT,
+    speed TEXT,
+    capture TEXT,
+    captured REAL,
+    classified REAL,
+    total_seconds REAL,
+    timings TEXT,
+    params TEXT,
+    effects INTEGER,
+    tracks INTEGER,
+    fingerprint TEXT NOT NULL,
+    ingested REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_site ON runs (site);
+
+CREATE TABLE IF NOT EXISTS effects (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    type TEXT NOT NULL,
+    confidence TEXT NOT NULL,
+    scroll_start REAL NOT NULL,
+    scroll_end REAL NOT NULL,
+    motion_ratio REAL NOT NULL
+);
+-- Covering: filters on type/confidence/scroll range/ratio never touch rows
+CREATE INDEX IF NOT EXISTS effects_type ON effects (type, scroll_start, scroll_end, motion_ratio, run_id);
+CREATE INDEX IF NOT EXISTS effects_confidence ON effects (confidence, type, scroll_start, scroll_end, motion_ratio, run_id);
+CREATE INDEX IF NOT EXISTS effects_scroll ON effects (scroll_start, scroll_end, motion_ratio, run_id);
+CREATE INDEX IF NOT EXISTS effects_run ON effects (run_id);
+
+CREATE TABLE IF NOT EXISTS tracks (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    track_id TEXT NOT NULL,
+    effect TEXT NOT NULL,
+    avg_dx REAL NOT NULL,
+    avg_dy REAL NOT NULL,
+    motion_ratio REAL NOT NULL,
+    scroll_start REAL NOT NULL,
+    scroll_end REAL NOT NULL,
+    frames INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tracks_run ON tracks (run_id);
+CREATE INDEX IF NOT EXISTS tracks_effect ON tracks (effect, scroll_start);
+"""
+
+def fingerprint(run_dir):
+    # Changes whenever the classify stage finishes again
+    try:
+        st = os.stat(marker_path(run_dir, "classify"))
+    except FileNotFoundError:
+        return None
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+def find_runs(roots):
+    # Run directories directly under each root (or the roots themselves).
+    # Paths are normalized, since they key runs in the database
+    for root in roots:
+        root = os.path.normpath(root)
+        if os.path.isdir(os.path.join(root, "stages")):
+            yield root
+            continue
+        try:
+            entries = sorted(os.scandir(root), key=lambda e: e.name)
+        except FileNotFoundError:
+            continue
+        for entry in entries:
+            if entry.is_dir() and os.path.isdir(os.path.join(entry.path, "stages")):
+                yield entry.path
+
+def _track_rows(run_dir):
+    try:
+        tracks = TrackColumns.load(run_dir, "scroll_tracks")
+    except FileNotFoundError:
+        return []
+    if not len(tracks):
+        return []
+
+    ratios = compute_motion_ratios(
+        tracks["scroll_start"], tracks["scroll_end"], tracks["avg_dx"], tracks["avg_dy"]
+    )
+    effects, _ = classify_effects(tracks["avg_dx"], tracks["avg_dy"], ratios)
+    frames = tracks["frames"].lengths() if "frames" in tracks else np.zeros(len(tracks), dtype=np.int64)
+    return list(zip(
+        [str(t) for t in tracks["track_id"].tolist()],
+        effects.tolist(),
+        tracks["avg_dx"].tolist(),
+        tracks["avg_dy"].tolist(),
+        ratios.tolist(),
+        tracks["scroll_start"].tolist(),
+        tracks["scroll_end"].tolist(),
+        frames.tolist()
+    ))
+
+def read_run(run_dir):
+    # Everything ingest stores for one classified run, or None
+    classify = read_marker(run_dir, "classify")
+    if classify is None:
+        return None
+    try:
+        with open(os.path.join(run_dir, "effects.json")) as f:
+            effects = json.load(f)
+    except FileNotFoundError:
+        return None
+
+    markers = {stage: read_marker(run_dir, stage) for stage in STAGES}
+    capture = markers["capture"] or {"params": {}}
+    analyze = markers["analyze"] or {"params": {}}
+    timings = {stage: m["seconds"] for stage, m in markers.items() if m}
+
+    return {
+        "run_dir": run_dir,
+        "site": os.path.basename(run_dir),
+        "url": capture["params"].get("url"),
+        "speed": capture["params"].get("speed"),
+        "capture": capture["params"].get("capture"),
+        "captured": capture.get("finished"),
+        "classified": classify["finished"],
+        "total_seconds": round(sum(timings.values()), 2),
+        "timings": timings,
+        "params": analyze["params"],
+        "effects": [
+            (e["type"], e["confidence"], e["scroll_range"][0], e["scroll_range"][1], e["motion_ratio"])
+            for e in effects
+        ],
+        "tracks": _track_rows(run_dir)
+    }
+
+class EffectsDB:
+    def __init__(self, path, busy_timeout=60.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = sqlite3.connect(path, timeout=busy_timeout, isolation_level=None)
+        try:
+            conn.executescript(SCHEMA)
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _connect(self, write=False):
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys = ON")
+        try:
+            conn.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _store(self, conn, run, fp):
+        conn.execute("DELETE FROM runs WHERE run_dir = ?", (run["run_dir"],))
+        run_id = conn.execute(
+            "INSERT INTO runs (run_dir, site, url, speed, capture, captured, classified, total_seconds, "
+            "timings, params, effects, tracks, fingerprint, ingested) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (run["run_dir"], run["site"], run["url"], run["speed"], run["capture"], run["captured"],
+             run["classified"], run["total_seconds"], json.dumps(run["timings"]), json.dumps(run["params"]),
+             len(run["effects"]), len(run["tracks"]), fp, time.time())
+        ).lastrowid
+        conn.executemany(
+            "INSERT INTO effects (run_id, type, confidence, scroll_start, scroll_end, motion_ratio) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [(run_id, *e) for e in run["effects"]]
+        )
+        conn.executemany(
+            "INSERT INTO tracks (run_id, track_id, effect, avg_dx, avg_dy, motion_ratio, "
+            "scroll_start, scroll_end, frames) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(run_id, *t) for t in run["tracks"]]
+        )
+
+    def ingest(self, roots, prune=False, batch_size=200):
+        # Loads new and re-classified runs under roots; with prune, drops
+        # runs whose directory or classify marker is gone. Returns counts
+        with self._connect() as conn:
+            known = dict(conn.execute("SELECT run_dir, fingerprint FROM runs").fetchall())
+
+        stats = {"ingested": 0, "unchanged": 0, "skipped": 0, "pruned": 0}
+        pending = []
+
+        def flush():
+            with self._connect(write=True) as conn:
+                for run, fp in pending:
+                    self._store(conn, run, fp)
+            pending.clear()
+
+        for run_dir in find_runs(roots):
+            fp = fingerprint(run_dir)
+            if fp is None:
+                stats["skipped"] += 1
+                continue
+            if known.get(run_dir) == fp:
+                stats["unchanged"] += 1
+                continue
+
+            run = read_run(run_dir)
+            if run is None:
+                stats["skipped"] += 1
+                continue
+            pending.append((run, fp))
+            stats["ingested"] += 1
+            if len(pending) >= batch_size:
+                flush()
+
+        if pending:
+            flush()
+
+        if stats["ingested"]:
+            # Refreshes planner statistics for the indexes
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            try:
+                conn.execute("PRAGMA optimize")
+            finally:
+                conn.close()
+
+        if prune:
+            # Runs outside this call's roots stay while their directory and
+            # classify marker exist
+            gone = [d for d in known if fingerprint(d) is None]
+            if gone:
+                with self._connect(write=True) as conn:
+                    conn.executemany("DELETE FROM runs WHERE run_dir = ?", [(d,) for d in gone])
+            stats["pruned"] = len(gone)
+
+        return stats
+
+    def _where(self, type=None, confidence=None, min_ratio=None, max_ratio=None,
+               scroll_from=None, scroll_to=None, site=None, url=None):
+        clauses, params = [], []
+        for column, value in (("e.type", type), ("e.confidence", confidence)):
+            if value:
+                values = [value] if isinstance(value, str) else list(value)
+                clauses.append(f"{column} IN ({','.join('?' * len(values))})")
+                params.extend(values)
+        if min_ratio is not None:
+            clauses.append("e.motion_ratio > ?")
+            params.append(min_ratio)
+        if max_ratio is not None:
+            clauses.append("e.motion_ratio < ?")
+            params.append(max_ratio)
+        # Overlap with [scroll_from, scroll_to]
+        if scroll_to is not None:
+            clauses.append("e.scroll_start <= ?")
+            params.append(scroll_to)
+        if scroll_from is not None:
+            clauses.append("e.scroll_end >= ?")
+            params.append(scroll_from)
+        if site:
+            clauses.append("r.site = ?")
+            params.append(site)
+        if url:
+            clauses.append("r.url = ?")
+            params.append(url)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def effects(self, limit=None, **filters):
+        # Matching effects with their run's site and URL, e.g.
+        # effects(type="horizontal_translate", min_ratio=0.5,
+        #         scroll_from=2000, scroll_to=5000)
+        where, params = self._where(**filters)
+        query = (
+            "SELECT r.site, r.url, r.run_dir, e.type, e.confidence, e.scroll_start, "
+            "e.scroll_end, e.motion_ratio FROM effects e JOIN runs r ON r.id = e.run_id"
+            + where + " ORDER BY r.site, e.scroll_start"
+        )
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._connect() as conn:
+            return [dict(r) for r in conn.execute(query, params)]
+
+    def runs(self, limit=None, **filters):
+        # Runs with at least one matching effect, and how many match
+        where, params = self._where(**filters)
+        query = (
+            "SELECT r.site, r.url, r.run_dir, r.classified, r.total_seconds, COUNT(*) AS matches "
+            "FROM effects e JOIN runs r ON r.id = e.run_id"
+            + where + " GROUP BY r.id ORDER BY matches DESC, r.site"
+        )
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._connect() as conn:
+            return [dict(r) for r in conn.execute(query, params)]
+
+    def tracks(self, run_dir):
+        with self._connect() as conn:
+            return [dict(r) for r in conn.execute(
+                "SELECT t.track_id, t.effect, t.avg_dx, t.avg_dy, t.motion_ratio, t.scroll_start, "
+                "t.scroll_end, t.frames FROM tracks t JOIN runs r ON r.id = t.run_id "
+                "WHERE r.run_dir = ? ORDER BY t.id",
+                (run_dir,)
+            )]
+
+    def summary(self):
+        # Run count plus effect counts by type and confidence
+        with self._connect() as conn:
+            runs = conn.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+            by_type = conn.execute(
+                "SELECT type, confidence, COUNT(*) FROM effects GROUP BY type, confidence ORDER BY type, confidence"
+            ).fetchall()
+        return {"runs": runs, "effects": [tuple(r) for r in by_type]}
@@ -0,0 +1,308 @@
+import json, os, signal, socket, sqlite3, subprocess, time
+from contextlib import contextmanager
+from pipeline.stages import STAGES, read_marker
+
+# Job queue in one SQLite file that workers on several hosts can share over
+# a network mount. Network filesystems rarely support SQLite's WAL shared
+# memory, so the file stays in rollback-journal mode and every operation is
+# one short transaction on a fresh connection; a claim takes the write lock
+# up front (BEGIN IMMEDIATE), so two workers never claim the same job.
+#
+# A claimed job holds a lease that its worker renews while the job runs.
+# A worker that dies stops renewing, and once the lease expires any worker
+# may claim the job again. Failed or timed-out jobs go back to the queue
+# until they have used max_attempts; `retry` re-queues them after that.
+#
+#   queued -> running -> done
+#                     -> queued (attempts left) / failed
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL,
+    run_dir TEXT NOT NULL,
+    command TEXT NOT NULL,
+    options TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    timeout REAL,
+    worker TEXT,
+    lease_expires REAL,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    seconds REAL,
+    timings TEXT,
+    effects INTEGER,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, attempts, id);
+"""
+
+JOB_STATUSES = ("queued", "running", "done", "failed")
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def _job(row):
+    job = dict(row)
+    job["options"] = json.loads(job["options"])
+    job["timings"] = json.loads(job["timings"]) if job["timings"] else None
+    return job
+
+class JobQueue:
+    def __init__(self, path, busy_timeout=60.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = sqlite3.connect(path, timeout=busy_timeout, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=DELETE")
+            conn.executescript(SCHEMA)
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _connect(self, immediate=False):
+        # Autocommit connection with one explicit transaction
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def enqueue(self, jobs, max_attempts=3, timeout=None):
+        # jobs: dicts with url, run_dir, command and options (extra CLI
+        # arguments). URLs already queued or running are skipped. A run_dir
+        # that another URL's job already uses gets a numbered suffix, so
+        # jobs never share a directory. Returns the new job ids
+        now = time.time()
+        ids = []
+        with self._connect(immediate=True) as conn:
+            active = {r["url"] for r in conn.execute(
+                "SELECT url FROM jobs WHERE status IN ('queued', 'running')"
+            )}
+            owners = {r["run_dir"]: r["url"] for r in conn.execute("SELECT run_dir, url FROM jobs")}
+            for job in jobs:
+                if job["url"] in active:
+                    continue
+                active.add(job["url"])
+                run_dir, n = job["run_dir"], 1
+                while owners.get(run_dir, job["url"]) != job["url"]:
+                    n += 1
+                    run_dir = f"{job['run_dir']}_{n}"
+                owners[run_dir] = job["url"]
+                cursor = conn.execute(
+                    "INSERT INTO jobs (url, run_dir, command, options, max_attempts, timeout, created) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (job["url"], run_dir, job["command"], json.dumps(job["options"]),
+                     max_attempts, timeout, now)
+                )
+                ids.append(cursor.lastrowid)
+        return ids
+
+    def claim(self, worker, lease=60.0):
+        # Oldest queued job, or a running job whose worker stopped renewing
+        # its lease; jobs on fewer attempts go first, so a retry waits
+        # behind fresh work. Returns the job, or None when nothing is claimable
+        now = time.time()
+        with self._connect(immediate=True) as conn:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE (status = 'queued' "
+                "OR (status = 'running' AND lease_expires < ?)) "
+                "AND attempts < max_attempts ORDER BY attempts, id LIMIT 1",
+                (now,)
+            ).fetchone()
+            if row is None:
+                # Abandoned jobs that already used every attempt
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', finished = ?, "
+                    "error = COALESCE(error, 'worker lost') "
+                    "WHERE status = 'running' AND lease_expires < ? AND attempts >= max_attempts",
+                    (now, now)
+                )
+                return None
+
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1, "
+                "lease_expires = ?, started = ?, finished = NULL WHERE id = ?",
+                (worker, now + lease, now, row["id"])
+            )
+        return _job({**dict(row), "worker": worker, "attempts": row["attempts"] + 1,
+                     "status": "running", "started": now})
+
+    def renew(self, ids, worker, lease=60.0):
+        # Extends the leases this worker still holds; returns the ids it lost
+        if not ids:
+            return []
+        expires = time.time() + lease
+        lost = []
+        with self._connect(immediate=True) as conn:
+            for job_id in ids:
+                updated = conn.execute(
+                    "UPDATE jobs SET lease_expires = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                    (expires, job_id, worker)
+                ).rowcount
+                if not updated:
+                    lost.append(job_id)
+        return lost
+
+    def finish(self, job_id, worker, ok, seconds, timings=None, effects=None, error=None):
+        # Records the outcome if this worker still holds the job. Failures
+        # with attempts left are queued again
+        with self._connect(immediate=True) as conn:
+            conn.execute(
+                "UPDATE jobs SET "
+                "status = CASE WHEN ? THEN 'done' WHEN attempts < max_attempts THEN 'queued' ELSE 'failed' END, "
+                "worker = NULL, lease_expires = NULL, finished = ?, seconds = ?, "
+                "timings = ?, effects = ?, error = ? "
+                "WHERE id = ? AND worker = ? AND status = 'running'",
+                (ok, time.time(), round(seconds, 2), json.dumps(timings) if timings else None,
+                 effects, error, job_id, worker)
+            )
+
+    def release(self, job_id, worker):
+        # Hands a job back without using up an attempt (worker shutdown)
+        with self._connect(immediate=True) as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', attempts = MAX(0, attempts - 1), "
+                "worker = NULL, lease_expires = NULL WHERE id = ? AND worker = ? AND status = 'running'",
+                (job_id, worker)
+            )
+
+    def retry(self, ids=None):
+        # Re-queues failed jobs (or the given ids, whatever their state
+        # unless running) with a fresh set of attempts; returns the count
+        with self._connect(immediate=True) as conn:
+            if ids:
+                marks = ",".join("?" * len(ids))
+                cursor = conn.execute(
+                    f"UPDATE jobs SET status = 'queued', attempts = 0, error = NULL "
+                    f"WHERE id IN ({marks}) AND status != 'running'",
+                    list(ids)
+                )
+            else:
+                cursor = conn.execute(
+                    "UPDATE jobs SET status = 'queued', attempts = 0, error = NULL WHERE status = 'failed'"
+                )
+            return cursor.rowcount
+
+    def counts(self):
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: 0 for status in JOB_STATUSES} | {r[0]: r[1] for r in rows}
+
+    def jobs(self, status=None, limit=None):
+        query = "SELECT * FROM jobs"
+        params = []
+        if status:
+            query += " WHERE status = ?"
+            params.append(status)
+        query += " ORDER BY id"
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._connect() as conn:
+            return [_job(r) for r in conn.execute(query, params)]
+
+def stage_timings(run_dir, since):
+    # {stage: seconds} for the stages a job finished, from their markers
+    timings = {}
+    for stage in STAGES:
+        marker = read_marker(run_dir, stage)
+        if marker and marker["finished"] >= since:
+            timings[stage] = marker["seconds"]
+    return timings
+
+def _kill(proc):
+    # Jobs run in their own session, so the browser goes down with them
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+    proc.wait()
+
+def run_worker(queue, command, concurrency=1, poll=2.0, lease=60.0, exit_when_empty=False,
+               worker=None):
+    # Runs up to `concurrency` jobs at once as subprocesses. command(job)
+    # returns the argv for a job; its output goes to <run_dir>/worker.log.
+    # Jobs past their timeout are killed and count as failed attempts.
+    # Returns {"done": jobs finished, "failed": attempts failed}
+    worker = worker or worker_name()
+    running = {}
+    outcome = {"done": 0, "failed": 0}
+    last_renew = time.time()
+    print(f"Worker {worker} taking up to {concurrency} jobs from {queue.path}")
+
+    try:
+        while True:
+            while len(running) < concurrency:
+                job = queue.claim(worker, lease)
+                if job is None:
+                    break
+                os.makedirs(job["run_dir"], exist_ok=True)
+                log = open(os.path.join(job["run_dir"], "worker.log"), "a")
+                log.write(f"\n=== job {job['id']} attempt {job['attempts']} on {worker} "
+                          f"at {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
+                log.flush()
+                proc = subprocess.Popen(
+                    command(job), stdout=log, stderr=subprocess.STDOUT, start_new_session=True
+                )
+                running[job["id"]] = (job, proc, log, time.time())
+                print(f"[start] job {job['id']} {job['url']} (attempt {job['attempts']}/{job['max_attempts']})")
+
+            if not running:
+                if exit_when_empty:
+                    return outcome
+                time.sleep(poll)
+                continue
+
+            time.sleep(min(poll, 0.5))
+            now = time.time()
+
+            if now - last_renew >= min(poll, lease / 3):
+                for job_id in queue.renew(list(running), worker, lease):
+                    # Another worker took over after our lease lapsed
+                    job, proc, log, _ = running.pop(job_id)
+                    _kill(proc)
+                    log.close()
+                    print(f"[lost] job {job_id} {job['url']}")
+                last_renew = now
+
+            for job_id, (job, proc, log, started) in list(running.items()):
+                timed_out = job["timeout"] and now - started > job["timeout"]
+                if proc.poll() is None and not timed_out:
+                    continue
+
+                if timed_out and proc.poll() is None:
+                    _kill(proc)
+                    error = f"timed out after {job['timeout']:g}s"
+                else:
+                    error = None if proc.returncode == 0 else f"exit status {proc.returncode}"
+                log.close()
+                del running[job_id]
+
+                ok = error is None
+                classified = read_marker(job["run_dir"], "classify")
+                queue.finish(
+                    job_id, worker, ok, now - started,
+                    timings=stage_timings(job["run_dir"], started),
+                    effects=classified["effects"] if ok and classified and classified["finished"] >= started else None,
+                    error=error
+                )
+                outcome["done" if ok else "failed"] += 1
+                print(f"[{'done' if ok else 'failed'}] job {job_id} {job['url']} "
+                      f"({now - started:.1f}s{', ' + error if error else ''})")
+    finally:
+        # Interrupted: stop our jobs and hand them back untouched
+        for job_id, (job, proc, log, _) in running.items():
+            _kill(proc)
+            log.close()
+            queue.release(job_id, worker)
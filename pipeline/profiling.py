@@ -0,0 +1,182 @@
+import functools, json, os, threading, time
+
+try:
+    import resource
+except ImportError:  # Windows has no getrusage
+    resource = None
+
+# Process-wide span/counter recorder. Disabled by default: span() then
+# returns a shared no-op context manager and count()/gauge() return after
+# one flag check, so instrumented hot loops cost almost nothing. Hot loops
+# should read `enabled` once outside the loop rather than per iteration.
+#
+#   span(name, **args)  - wall time, thread CPU time and peak RSS of a block
+#   @profiled(name)     - the same around every call of a function
+#   count(name, n)      - running total (frames decoded, evaluate calls)
+#   gauge(name, value)  - sampled value (regions per frame, active tracks)
+#
+# write_trace() exports Chrome trace-event JSON (chrome://tracing,
+# ui.perfetto.dev); summary() formats totals per name. Spans recorded in
+# worker processes are not collected.
+enabled = False
+
+_lock = threading.Lock()
+_origin = time.perf_counter()
+_events = []
+_spans = {}
+_counters = {}
+_gauges = {}
+
+def enable():
+    global enabled, _origin
+    reset()
+    _origin = time.perf_counter()
+    enabled = True
+
+def disable():
+    global enabled
+    enabled = False
+
+def reset():
+    with _lock:
+        _events.clear()
+        _spans.clear()
+        _counters.clear()
+        _gauges.clear()
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 ** 2 if os.uname().sysname == "Darwin" else 1024), 1)
+
+def _ts(t):
+    return round((t - _origin) * 1e6, 1)
+
+class _Span:
+    __slots__ = ("name", "args", "start", "cpu")
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.cpu = time.thread_time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        wall = end - self.start
+        cpu = time.thread_time() - self.cpu
+        rss = peak_rss_mb()
+
+        with _lock:
+            _events.append({
+                "name": self.name,
+                "ph": "X",
+                "ts": _ts(self.start),
+                "dur": round(wall * 1e6, 1),
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": {**self.args, "cpu_ms": round(cpu * 1e3, 3), "peak_rss_mb": rss}
+            })
+            stats = _spans.setdefault(self.name, [0, 0.0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += wall
+            stats[2] += cpu
+            stats[3] = max(stats[3], rss or 0.0)
+        return False
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+def span(name, **args):
+    return _Span(name, args) if enabled else _NULL_SPAN
+
+def profiled(name):
+    # Decorator form of span() for whole functions
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return fn(*args, **kwargs)
+            with _Span(name, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def count(name, value=1):
+    if not enabled:
+        return
+    with _lock:
+        total = _counters.get(name, 0) + value
+        _counters[name] = total
+        _events.append({"name": name, "ph": "C", "ts": _ts(time.perf_counter()),
+                        "pid": os.getpid(), "args": {name: total}})
+
+def gauge(name, value):
+    if not enabled:
+        return
+    with _lock:
+        stats = _gauges.setdefault(name, [0, 0.0, value])
+        stats[0] += 1
+        stats[1] += value
+        stats[2] = max(stats[2], value)
+        _events.append({"name": name, "ph": "C", "ts": _ts(time.perf_counter()),
+                        "pid": os.getpid(), "args": {name: value}})
+
+def wrap_calls(obj, attr, name=None):
+    # Replaces obj.attr with a wrapper that counts and times each call,
+    # e.g. wrap_calls(page, "evaluate"). Does nothing while disabled
+    if not enabled:
+        return
+    name = name or attr
+    original = getattr(obj, attr)
+
+    def wrapper(*args, **kwargs):
+        count(f"{name} calls")
+        with span(name):
+            return original(*args, **kwargs)
+
+    setattr(obj, attr, wrapper)
+
+def write_trace(path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with _lock:
+        events = list(_events)
+    with open(path, "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+def summary():
+    with _lock:
+        spans = dict(_spans)
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+
+    lines = [f"{'span':<28} {'calls':>7} {'wall s':>9} {'mean ms':>9} {'cpu s':>8} {'peak rss MB':>12}"]
+    for name, (calls, wall, cpu, rss) in sorted(spans.items(), key=lambda s: -s[1][1]):
+        lines.append(f"{name:<28} {calls:>7} {wall:>9.3f} {wall / calls * 1e3:>9.2f} {cpu:>8.3f} {rss:>12.1f}")
+
+    if counters:
+        lines.append("")
+        lines.append(f"{'counter':<28} {'total':>7}")
+        for name, total in sorted(counters.items()):
+            lines.append(f"{name:<28} {total:>7}")
+
+    if gauges:
+        lines.append("")
+        lines.append(f"{'gauge':<28} {'samples':>7} {'mean':>9} {'max':>9}")
+        for name, (samples, total, peak) in sorted(gauges.items()):
+            lines.append(f"{name:<28} {samples:>7} {total / samples:>9.2f} {peak:>9.2f}")
+
+    return "\n".join(lines)
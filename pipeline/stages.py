@@ -0,0 +1,67 @@
+import json, os, time
+
+# Named pipeline stages, in run order. A finished stage leaves a marker at
+# <run_dir>/stages/<stage>.json recording when it finished, how long it took
+# and the parameters it ran with; an interrupted run resumes from the first
+# stage without a matching marker.
+STAGES = ("capture", "analyze", "correlate", "classify")
+
+def marker_path(run_dir, stage):
+    return os.path.join(run_dir, "stages", f"{stage}.json")
+
+def read_marker(run_dir, stage):
+    try:
+        with open(marker_path(run_dir, stage)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def mark_done(run_dir, stage, seconds, params=None, **info):
+    path = marker_path(run_dir, stage)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    marker = {
+        "stage": stage,
+        "finished": time.time(),
+        "seconds": round(seconds, 2),
+        "params": params or {},
+        **info
+    }
+
+    # Written last and renamed into place, so a marker only exists once
+    # every artifact of its stage has been saved
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(marker, f, indent=2)
+    os.replace(tmp_path, path)
+
+def invalidate(run_dir, stage):
+    # Removes the markers of stage and every stage after it
+    for later in STAGES[STAGES.index(stage):]:
+        try:
+            os.remove(marker_path(run_dir, later))
+        except FileNotFoundError:
+            pass
+
+def next_stage(run_dir, params=None):
+    # First stage that has not finished, or that finished with different
+    # parameters than requested. params: {stage: dict}; stages missing from
+    # it accept any recorded parameters. Returns None when all are done
+    params = params or {}
+    for stage in STAGES:
+        marker = read_marker(run_dir, stage)
+        if marker is None:
+            return stage
+        if stage in params and marker.get("params") != params[stage]:
+            return stage
+    return None
+
+class StageError(RuntimeError):
+    # A stage cannot run because an earlier stage's output is missing
+    pass
+
+def require(run_dir, stage):
+    marker = read_marker(run_dir, stage)
+    if marker is None:
+        raise StageError(f"{run_dir} has not finished the {stage} stage; run it first")
+    return marker
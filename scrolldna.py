@@ -1,130 +1,377 @@
-import sys, json, os, shutil, time, re, cv2
+import argparse, json, os, queue, shutil, sys, time, re
 from urllib.parse import urlparse
-from capture.browser import launch_browser
+from capture.browser import launch_browser, maximize_window
+from capture.record import normalize_url, site_name, record_page, save_video
 from capture.scroll import scroll_page
-from capture.dom import snapshot_dom
-from analysis.frames import extract_frames
-from analysis.motion import diff_frames, extract_motion_regions, track_regions, summarize_tracks
+from capture.pool import BATCH_VIEWPORT, run_capture_pool
+from capture.screencast import Screencast, iter_screencast_frames
+from capture.virtual_time import virtual_scroll
+from capture.network import HAR_MODES, RESOURCE_TYPES, setup_network, finish_recording
+from analysis.frames import frame_size, iter_frames, with_samples, adaptive_frames
+from analysis.parallel import analyze_video_parallel
+from analysis.online import OnlinePipeline
+from pipeline.artifacts import save_artifact, load_artifact, has_table, export_json
+from pipeline.cache import StageCache, hash_file, hash_json
+from pipeline.jobs import JobQueue, JOB_STATUSES, run_worker
+from pipeline.effects_db import EffectsDB
+from pipeline import profiling
+from pipeline.stages import (
+    STAGES,
+    StageError,
+    read_marker,
+    mark_done,
+    invalidate,
+    next_stage,
+    require
+)
+from analysis.dom_effects import summarize_elements
+from analysis.motion import detect_motion, RegionTracker, pyramid_params
+from analysis.tracks import TrackColumns
 from analysis.correlate import (
+    scroll_offsets,
     build_frame_scroll_map,
-    attach_scroll_to_tracks,
-    build_effects
+    attach_scroll_columns,
+    build_effects_columns
 )
 
-if len(sys.argv) < 2:
-    print("Error: URL argument is required")
-    print("Usage: python scrolldna.py <url> [speed]")
-    print("  Example: python scrolldna.py https://example.com 2x")
-    print("  Speed format: 2x, 1.5x, 0.5x, 3x, etc. (default: 1x)")
-    sys.exit(1)
+QUEUE_COMMANDS = ("enqueue", "worker", "status", "retry")
+DB_COMMANDS = ("ingest", "query")
+COMMANDS = STAGES + ("all",) + QUEUE_COMMANDS + DB_COMMANDS
+
+def comma_list(value):
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+def resource_types(value):
+    types = comma_list(value)
+    unknown = [t for t in types if t not in RESOURCE_TYPES]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown resource type: {', '.join(unknown)}")
+    return types
+
+def parse_args(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    # Without a subcommand, run the whole pipeline as before
+    if not argv or (argv[0] not in COMMANDS and argv[0] not in ("-h", "--help")):
+        argv = ["all"] + argv
+
+    # Arguments after -- on enqueue are passed through to every job
+    job_options = []
+    if argv[0] == "enqueue" and "--" in argv:
+        split = argv.index("--")
+        argv, job_options = argv[:split], argv[split + 1:]
+
+    capture_opts = argparse.ArgumentParser(add_help=False)
+    capture_opts.add_argument("url", nargs="?")
+    capture_opts.add_argument(
+        "speed", nargs="?", default="1x",
+        help="Scroll speed: 2x, 1.5x, 0.5x, 3x, etc. (default: 1x)"
+    )
+    capture_opts.add_argument(
+        "--batch", metavar="FILE",
+        help="Capture every URL in FILE (one per line) with a pooled headless browser"
+    )
+    capture_opts.add_argument(
+        "--concurrency", type=int, default=4,
+        help="Pages captured at once in --batch mode (default: 4)"
+    )
+    capture_opts.add_argument(
+        "--capture", choices=["video", "screencast", "dom", "virtual"], default="video",
+        help="Record a WebM and decode it afterwards, stream CDP screencast "
+             "frames straight into motion analysis while scrolling, skip "
+             "video and classify effects from sampled element geometry, or "
+             "step the page on virtual time and screenshot every tick"
+    )
+    capture_opts.add_argument(
+        "--screencast-max-width", type=int, default=None,
+        help="Downscale screencast and virtual-time frames to this width"
+    )
+    capture_opts.add_argument(
+        "--virtual-step-ms", type=float, default=100.0,
+        help="Page time each scroll step runs for with --capture virtual (default: 100)"
+    )
+    capture_opts.add_argument(
+        "--virtual-frames", type=int, default=2,
+        help="Frames captured per scroll step with --capture virtual (default: 2)"
+    )
+    capture_opts.add_argument(
+        "--max-settle", type=float, default=2.5, metavar="SECONDS",
+        help="Longest wait after each scroll step for scrolling, DOM mutations, "
+             "animations and requests to go quiet (default: 2.5)"
+    )
+    capture_opts.add_argument(
+        "--run-dir",
+        help="Run directory for a single URL (default: output/runs/<site>)"
+    )
+    capture_opts.add_argument(
+        "--har", choices=HAR_MODES, default="off",
+        help="Record every response to a network archive, replay a recorded archive "
+             "offline (missing requests are aborted), or replay when one exists and "
+             "record otherwise (default: off)"
+    )
+    capture_opts.add_argument(
+        "--har-file", metavar="FILE",
+        help="Network archive path (default: <run_dir>/network.har.zip)"
+    )
+    capture_opts.add_argument(
+        "--block-types", type=resource_types, default=[], metavar="TYPES",
+        help="Comma-separated resource types to abort, e.g. media,font "
+             f"({', '.join(RESOURCE_TYPES)})"
+    )
+    capture_opts.add_argument(
+        "--block-domains", type=comma_list, default=[], metavar="DOMAINS",
+        help="Comma-separated domains to abort, subdomains included, "
+             "e.g. doubleclick.net,intercom.io"
+    )
+
+    analysis_opts = argparse.ArgumentParser(add_help=False)
+    analysis_opts.add_argument(
+        "--workers", type=int, default=1,
+        help="Worker processes for motion analysis (0 = one per CPU)"
+    )
+    analysis_opts.add_argument(
+        "--threshold", type=int, default=25,
+        help="Pixel difference threshold for motion masks (default: 25)"
+    )
+    analysis_opts.add_argument(
+        "--min-area", type=int, default=500,
+        help="Minimum motion region area in full-resolution pixels (default: 500)"
+    )
+    analysis_opts.add_argument(
+        "--sampling", choices=["fixed", "adaptive"], default="fixed",
+        help="Analyze every third frame, or decode every frame and keep those "
+             "that changed since the last kept one (default: fixed)"
+    )
+    analysis_opts.add_argument(
+        "--min-change", type=float, default=0.5,
+        help="Adaptive sampling: mean absolute thumbnail difference (0-255) "
+             "that makes a frame worth keeping (default: 0.5)"
+    )
+    analysis_opts.add_argument(
+        "--max-gap", type=int, default=30,
+        help="Adaptive sampling: keep at least one frame in this many (default: 30)"
+    )
+    analysis_opts.add_argument(
+        "--compensate", choices=["off", "phase", "scroll"], default="off",
+        help="Cancel page scrolling before diffing, using the vertical shift found "
+             "by phase correlation or the scroll log (screencast runs use phase)"
+    )
+    analysis_opts.add_argument(
+        "--pyramid-level", type=int, default=0,
+        help="Detect motion on a frame downsampled 2^N times (default: 0 = full resolution)"
+    )
+    analysis_opts.add_argument(
+        "--refine", action="store_true",
+        help="Re-check coarse pyramid boxes at full resolution"
+    )
+    analysis_opts.add_argument(
+        "--dump-frames", action="store_true",
+        help="Write sampled frames as PNGs for debugging"
+    )
+
+    format_opts = argparse.ArgumentParser(add_help=False)
+    format_opts.add_argument(
+        "--format", choices=["binary", "json", "both"], default="binary",
+        help="Run artifact format: memory-mappable binary bundle, JSON, or both "
+             "(effects.json is always written)"
+    )
+
+    cache_opts = argparse.ArgumentParser(add_help=False)
+    cache_opts.add_argument(
+        "--cache", action="store_true",
+        help="Reuse cached capture, motion and tracking results whose inputs are unchanged"
+    )
+    cache_opts.add_argument(
+        "--cache-dir", default="output/cache",
+        help="Stage cache location (default: output/cache)"
+    )
+    cache_opts.add_argument(
+        "--cache-size", type=int, default=5120,
+        help="Stage cache size limit in MB; least recently used entries are evicted (default: 5120)"
+    )
+
+    profile_opts = argparse.ArgumentParser(add_help=False)
+    profile_opts.add_argument(
+        "--profile", nargs="?", const="", default=None, metavar="FILE",
+        help="Record per-stage timings and print a summary; the Chrome trace "
+             "goes to FILE (default: <run_dir>/trace.json)"
+    )
+
+    queue_opts = argparse.ArgumentParser(add_help=False)
+    queue_opts.add_argument(
+        "--queue", default="output/queue.sqlite",
+        help="Job queue file; may sit on a mount shared by several hosts "
+             "(default: output/queue.sqlite)"
+    )
+
+    run_opts = argparse.ArgumentParser(add_help=False)
+    run_opts.add_argument(
+        "run",
+        help="Run directory (output/runs/<site>) or the URL it was captured from"
+    )
+
+    parser = argparse.ArgumentParser(
+        description="Record a scrolling page and detect scroll-driven effects",
+        epilog="Example: python scrolldna.py https://example.com 2x"
+    )
+    commands = parser.add_subparsers(dest="command", metavar="command")
+
+    commands.add_parser(
+        "capture", parents=[capture_opts, analysis_opts, format_opts, cache_opts, profile_opts],
+        help="Scroll the page and record video, scroll log and DOM samples"
+    )
+    commands.add_parser(
+        "analyze", parents=[run_opts, analysis_opts, format_opts, cache_opts, profile_opts],
+        help="Detect and track motion in a captured run (no browser needed)"
+    )
+    commands.add_parser(
+        "correlate", parents=[run_opts, format_opts, profile_opts],
+        help="Attach scroll positions to a run's motion tracks"
+    )
+    commands.add_parser(
+        "classify", parents=[run_opts, profile_opts],
+        help="Classify a run's scroll-correlated tracks into effects"
+    )
+    run_all = commands.add_parser(
+        "all", parents=[capture_opts, analysis_opts, format_opts, cache_opts, profile_opts],
+        help="Run every stage, resuming after the last finished one (default)"
+    )
+    run_all.add_argument(
+        "--force", action="store_true",
+        help="Ignore finished stages and start again from capture"
+    )
+
+    enqueue = commands.add_parser(
+        "enqueue", parents=[queue_opts],
+        help="Add URLs to the job queue",
+        epilog="Arguments after -- are passed to every job, "
+               "e.g. enqueue --file urls.txt -- 2x --capture dom"
+    )
+    enqueue.add_argument("urls", nargs="*", metavar="url")
+    enqueue.add_argument("--file", metavar="FILE", help="Also enqueue every URL in FILE (one per line)")
+    enqueue.add_argument(
+        "--capture-only", action="store_true",
+        help="Jobs run the capture stage only, leaving analysis for later"
+    )
+    enqueue.add_argument(
+        "--max-attempts", type=int, default=3,
+        help="Runs per job before it is marked failed (default: 3)"
+    )
+    enqueue.add_argument(
+        "--timeout", type=float, default=900,
+        help="Seconds before a job is killed and counted as a failed attempt; 0 = no limit (default: 900)"
+    )
+
+    worker = commands.add_parser(
+        "worker", parents=[queue_opts],
+        help="Run queued jobs until interrupted"
+    )
+    worker.add_argument(
+        "--concurrency", type=int, default=1,
+        help="Jobs this worker runs at once (default: 1)"
+    )
+    worker.add_argument(
+        "--poll", type=float, default=2.0,
+        help="Seconds between queue checks while idle (default: 2)"
+    )
+    worker.add_argument(
+        "--lease", type=float, default=60.0,
+        help="Seconds a job stays claimed without a renewal from its worker; "
+             "keep it well above the clock skew between hosts (default: 60)"
+    )
+    worker.add_argument(
+        "--exit-when-empty", action="store_true",
+        help="Stop once no job is left to claim"
+    )
+
+    status = commands.add_parser(
+        "status", parents=[queue_opts],
+        help="Show queue progress, running jobs, failures and stage timings"
+    )
+    status.add_argument(
+        "--jobs", choices=JOB_STATUSES, metavar="STATUS",
+        help=f"List every job in STATUS ({', '.join(JOB_STATUSES)})"
+    )
 
-url = sys.argv[1]
+    retry = commands.add_parser(
+        "retry", parents=[queue_opts],
+        help="Re-queue failed jobs with a fresh set of attempts"
+    )
+    retry.add_argument("ids", nargs="*", type=int, metavar="id", help="Jobs to re-queue (default: every failed job)")
 
-if not url.startswith(('http://', 'https://')):
-    url = 'https://' + url
+    db_opts = argparse.ArgumentParser(add_help=False)
+    db_opts.add_argument(
+        "--db", default="output/effects.sqlite",
+        help="Effects database (default: output/effects.sqlite)"
+    )
 
-speed_multiplier = 1.0  
-if len(sys.argv) >= 3:
-    speed_arg = sys.argv[2].lower().strip()
+    ingest = commands.add_parser(
+        "ingest", parents=[db_opts],
+        help="Load classified runs into the effects database; unchanged runs are skipped"
+    )
+    ingest.add_argument(
+        "roots", nargs="*", default=["output/runs"], metavar="dir",
+        help="Run directories, or directories of them (default: output/runs)"
+    )
+    ingest.add_argument(
+        "--prune", action="store_true",
+        help="Drop runs whose directory or classify result no longer exists"
+    )
+
+    query = commands.add_parser(
+        "query", parents=[db_opts],
+        help="Find effects across ingested runs",
+        epilog="Example: query --type horizontal_translate --min-ratio 0.5 "
+               "--scroll-from 2000 --scroll-to 5000 --runs"
+    )
+    query.add_argument("--type", type=comma_list, help="Effect types, comma-separated")
+    query.add_argument("--confidence", type=comma_list, help="Confidences, comma-separated")
+    query.add_argument("--min-ratio", type=float, help="Only motion_ratio above this")
+    query.add_argument("--max-ratio", type=float, help="Only motion_ratio below this")
+    query.add_argument("--scroll-from", type=float, help="Effects whose scroll range reaches this position")
+    query.add_argument("--scroll-to", type=float, help="Effects whose scroll range starts by this position")
+    query.add_argument("--site", help="Only this run directory name, e.g. example_com")
+    query.add_argument("--url", help="Only runs captured from this URL")
+    query.add_argument("--runs", action="store_true", help="One line per matching run instead of per effect")
+    query.add_argument("--limit", type=int, default=None, help="Show at most this many rows")
+    query.add_argument("--json", action="store_true", help="Print JSON instead of a table")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "enqueue":
+        if not args.urls and not args.file:
+            parser.error("enqueue needs URLs or --file FILE")
+        job_args = parse_args(["all", "https://example.com"] + job_options)
+        if job_args.batch or job_args.run_dir:
+            parser.error("--batch and --run-dir cannot be passed to jobs")
+        args.options = job_options
+        return args
+    if args.command in QUEUE_COMMANDS + DB_COMMANDS:
+        return args
+
+    if args.command in ("capture", "all") and not args.url and not args.batch:
+        parser.error("a URL argument or --batch FILE is required")
+    if args.command in ("capture", "all") and args.batch and args.har_file:
+        parser.error("--har-file applies to a single URL; --batch keeps one archive per run directory")
+    if args.command in ("capture", "all") and args.batch and args.run_dir:
+        parser.error("--run-dir applies to a single URL")
+    if args.command in ("capture", "all") and (args.virtual_step_ms <= 0 or args.virtual_frames < 1):
+        parser.error("--virtual-step-ms must be positive and --virtual-frames at least 1")
+    if args.command in ("capture", "all") and args.max_settle < 0:
+        parser.error("--max-settle cannot be negative")
+
+    return args
+
+def parse_speed(speed):
+    speed_arg = speed.lower().strip()
     match = re.match(r'^(\d+\.?\d*)x?$', speed_arg)
     if match:
         speed_multiplier = float(match.group(1))
         print(f"Scroll speed set to {speed_multiplier}x")
-    else:
-        print(f"Warning: Invalid speed format '{speed_arg}'. Using default speed (1x).")
-        print("Speed format should be like: 2x, 1.5x, 0.5x, etc.")
-
-pw, browser, context, page = launch_browser()
-
-# Maximize window BEFORE loading the page so website adjusts properly
-try:
-    cdp_session = context.new_cdp_session(page)
-    targets_response = cdp_session.send("Target.getTargets")
-    target_infos = targets_response.get("targetInfos", [])
-    
-    page_target = None
-    for target in target_infos:
-        if target.get("type") == "page":
-            page_target = target
-            break
-    
-    if page_target:
-        window_info = cdp_session.send("Browser.getWindowForTarget", {"targetId": page_target["targetId"]})
-        window_id = window_info.get("windowId")
-        
-        if window_id:
-            cdp_session.send("Browser.setWindowBounds", {
-                "windowId": window_id,
-                "bounds": {"windowState": "maximized"}
-            })
-            time.sleep(1.0)  # Wait for window to maximize
-except Exception as e:
-    print(f"Note: Could not maximize window automatically: {e}")
-    print("Please maximize the browser window manually.")
-
-# Now load the page - it will load at the maximized size
-page.goto(url, wait_until="networkidle")
-time.sleep(1.0)
-
-# Get actual window dimensions and ensure viewport matches
-try:
-    window_size = page.evaluate("""
-        () => {
-            return {
-                width: window.outerWidth,
-                height: window.outerHeight,
-                innerWidth: window.innerWidth,
-                innerHeight: window.innerHeight
-            };
-        }
-    """)
-    print(f"Window size: {window_size['width']}x{window_size['height']}, Content area: {window_size['innerWidth']}x{window_size['innerHeight']}")
-    
-    # Set viewport to match actual content area
-    page.set_viewport_size({
-        "width": window_size['innerWidth'],
-        "height": window_size['innerHeight']
-    })
-    
-    # Trigger resize event to ensure website adjusts
-    page.evaluate("window.dispatchEvent(new Event('resize'))")
-    time.sleep(0.5)
-except Exception as e:
-    print(f"Note: Could not set viewport size: {e}")
-
-scroll_step = int(120 * speed_multiplier)
-scroll_log = scroll_page(page, step=scroll_step)
-
-dom_snapshots = snapshot_dom(page)
-
-parsed_url = urlparse(url)
-website_name = parsed_url.netloc or parsed_url.path.split('/')[0]
-website_name = website_name.split(':')[0]
-website_name = website_name.replace('.', '_')
-
-run_dir = f"output/runs/{website_name}"
-os.makedirs(run_dir, exist_ok=True)
-
-with open(f"{run_dir}/scroll_log.json", "w") as f:
-    json.dump(scroll_log, f, indent=2)
-
-with open(f"{run_dir}/dom_snapshots.json", "w") as f:
-    json.dump(dom_snapshots, f, indent=2)
-
-video_path = page.video.path() if page.video else None
-
-context.close()
-
-if video_path and os.path.exists(video_path):
-    video_ext = os.path.splitext(video_path)[1] or '.webm'
-    new_video_path = os.path.join(run_dir, f"{website_name}{video_ext}")
-    shutil.move(video_path, new_video_path)
-    print(f"Video saved to: {new_video_path}")
-else:
-    print("Warning: Video file not found or could not be accessed")
-
-browser.close()
-pw.stop()
+        return speed_multiplier
+
+    print(f"Warning: Invalid speed format '{speed_arg}'. Using default speed (1x).")
+    print("Speed format should be like: 2x, 1.5x, 0.5x, etc.")
+    return 1.0
 
 def find_recorded_video(run_dir):
     for root, _, files in os.walk(run_dir):
@@ -133,47 +380,767 @@ def find_recorded_video(run_dir):
                 return os.path.join(root, f)
     return None
 
-video_path = find_recorded_video(run_dir)
+def start_screencast_analysis(cdp_session, start_time, args):
+    # Frames are decoded, diffed and tracked on background threads as they
+    # arrive, so tracks are ready when scrolling ends
+    frame_queue = queue.Queue(maxsize=64)
+    screencast = Screencast(
+        cdp_session,
+        frame_queue,
+        start_time=start_time,
+        max_width=args.screencast_max_width
+    )
+    frames = iter_screencast_frames(frame_queue)
+    sampling = sampling_args(args)
+    if sampling:
+        frames = adaptive_frames(frames, **sampling)
 
-frames_dir = f"{run_dir}/frames"
-frame_count = extract_frames(
-    video_path=video_path,
-    output_dir=frames_dir,
-    every_n_frames=3
-)
+    # The scroll log is only complete after scrolling, so streamed frames
+    # can only be compensated by phase correlation
+    _, max_dist = pyramid_params(args.pyramid_level)
+    pipeline = OnlinePipeline(
+        frames,
+        max_dist=max_dist,
+        threshold=args.threshold,
+        min_area=args.min_area,
+        pyramid_level=args.pyramid_level,
+        refine=args.refine,
+        compensate=args.compensate != "off",
+        source=frame_queue
+    ).start()
+    screencast.start()
+    return screencast, pipeline
 
-frame_files = sorted(os.listdir(frames_dir))
-region_sequences = []
+def capture_site(context, page, url, run_dir, args, start_time, cdp_session=None, resize=True):
+    # Scrolls the page and closes the context. Returns the scroll log, DOM
+    # snapshots and either the saved video path or the running screencast
+    # analysis
+    scroll_step = int(120 * parse_speed(args.speed))
+    motion = None
 
-for i in range(len(frame_files) - 1):
-    f1 = cv2.imread(os.path.join(frames_dir, frame_files[i]))
-    f2 = cv2.imread(os.path.join(frames_dir, frame_files[i + 1]))
+    har_path = args.har_file or os.path.join(run_dir, "network.har.zip")
+    network = setup_network(
+        context, har_path, args.har, block_types=args.block_types, block_domains=args.block_domains
+    )
 
-    diff = diff_frames(f1, f2)
-    regions = extract_motion_regions(diff)
+    def on_ready():
+        nonlocal motion, cdp_session
+        if args.capture in ("screencast", "virtual") and cdp_session is None:
+            cdp_session = context.new_cdp_session(page)
+        if args.capture == "screencast":
+            motion = start_screencast_analysis(cdp_session, start_time, args)
 
-    region_sequences.append(regions)
+    # Virtual-time captures write their own video, timed in page time from
+    # start_time like the scroll log
+    virtual_path = os.path.join(run_dir, f"{site_name(url)}.mp4")
 
-tracks = track_regions(region_sequences)
-motion_tracks = summarize_tracks(tracks)
+    def scroll(page, step, start_time):
+        if args.capture != "virtual":
+            return scroll_page(page, step=step, start_time=start_time, max_settle=args.max_settle)
+        return virtual_scroll(
+            page, cdp_session, virtual_path, step=step, start_time=start_time,
+            step_ms=args.virtual_step_ms, frames_per_step=args.virtual_frames,
+            max_width=args.screencast_max_width
+        )
 
-with open(f"{run_dir}/motion_tracks.json", "w") as f:
-    json.dump(motion_tracks, f, indent=2)
+    # Replayed responses arrive at once, so there is no network to wait for
+    scroll_log, dom_snapshots = record_page(page, url, run_dir, scroll_step, start_time,
+                                            resize=resize, on_ready=on_ready,
+                                            artifact_format=args.format,
+                                            wait_until="load" if network == "replay" else "networkidle",
+                                            scroll=scroll)
 
-# Correlate motion tracks with scroll data
-frame_scroll_map = build_frame_scroll_map(
-    scroll_log=scroll_log,
-    total_frames=len(region_sequences)
-)
+    if motion:
+        screencast = motion[0]
+        screencast.stop()
+        print(f"Streamed {screencast.frames} screencast frames")
 
-tracks_with_scroll = attach_scroll_to_tracks(
-    motion_tracks,
-    frame_scroll_map
-)
+    video_path = page.video.path() if page.video else None
+    context.close()
 
-effects = build_effects(
-    tracks_with_scroll
-)
+    # The archive is written when the context closes
+    if network == "record" and finish_recording(har_path):
+        print(f"Network archive saved to: {har_path}")
+
+    if args.capture == "video":
+        video_path = save_video(video_path, run_dir, site_name(url))
+    elif args.capture == "virtual":
+        video_path = virtual_path
+        print(f"Video saved to: {video_path}")
+
+    return {
+        "scroll_log": scroll_log,
+        "dom_snapshots": dom_snapshots,
+        "video_path": video_path,
+        "motion": motion
+    }
+
+def open_cache(args):
+    if not args.cache:
+        return None
+    cache = StageCache(args.cache_dir, max_bytes=args.cache_size * 1024 ** 2)
+    cache.prune_stale()
+    return cache
+
+def cached(cache, stage, key, compute):
+    if cache is None or key is None:
+        return compute()
+
+    value = cache.get_json(stage, key)
+    if value is None:
+        value = compute()
+        cache.put_json(stage, key, value)
+    else:
+        print(f"Using cached {stage}")
+    return value
+
+# The browsers captures run in. Viewport and headless rendering change what
+# is recorded, so both are part of the capture cache key; the local
+# browser's viewport is its maximized window
+LOCAL_BROWSER = {"headless": False, "viewport": "maximized"}
+BATCH_BROWSER = {"headless": True, "viewport": BATCH_VIEWPORT}
+
+def capture_cache_key(cache, url, args, browser=LOCAL_BROWSER):
+    # Screencast captures keep no frames to replay, so they are never cached
+    if cache is None or args.capture == "screencast":
+        return None
+    return cache.key("capture", url=url, speed=args.speed, capture=args.capture,
+                     browser=browser, **virtual_params(args), **network_params(args),
+                     **settle_params(args))
+
+def load_cached_capture(cache, key, url, run_dir, args):
+    path = cache.get("capture", key) if key else None
+    if path is None:
+        return None
+
+    with open(os.path.join(path, "capture.json")) as f:
+        data = json.load(f)
+
+    os.makedirs(run_dir, exist_ok=True)
+    save_artifact(run_dir, "scroll_log", data["scroll_log"], args.format)
+    save_artifact(run_dir, "dom_snapshots", data["dom_snapshots"], args.format)
+
+    video_path = None
+    if data["video"]:
+        video_path = os.path.join(run_dir, f"{site_name(url)}{os.path.splitext(data['video'])[1]}")
+        shutil.copyfile(os.path.join(path, data["video"]), video_path)
+
+    print(f"Using cached capture for {url}")
+    return {
+        "scroll_log": data["scroll_log"],
+        "dom_snapshots": data["dom_snapshots"],
+        "video_path": video_path,
+        "motion": None
+    }
+
+def store_capture(cache, key, url, captured):
+    if key is None:
+        return
+
+    def write(path):
+        video_name = None
+        if captured["video_path"]:
+            video_name = "video" + os.path.splitext(captured["video_path"])[1]
+            shutil.copyfile(captured["video_path"], os.path.join(path, video_name))
+        with open(os.path.join(path, "capture.json"), "w") as f:
+            json.dump({
+                "scroll_log": captured["scroll_log"],
+                "dom_snapshots": captured["dom_snapshots"],
+                "video": video_name
+            }, f, separators=(",", ":"))
+
+    cache.put("capture", key, write, inputs={"url": url})
+
+def sampling_args(args):
+    # adaptive_frames arguments, or None for the fixed every-third-frame stride
+    if args.sampling != "adaptive":
+        return None
+    return {"min_change": args.min_change, "max_gap": args.max_gap}
+
+def scroll_scale(run_dir, video_path):
+    # Video pixels per CSS pixel, from the viewport height recorded with
+    # the DOM samples; recordings are usually 1:1
+    try:
+        deltas = load_artifact(run_dir, "dom_snapshots")["deltas"]
+    except (OSError, KeyError):
+        return 1.0
+    viewport = next((d["viewportHeight"] for d in deltas if d.get("viewportHeight")), None)
+    if not viewport:
+        return 1.0
+    return frame_size(video_path)[1] / viewport
+
+@profiling.profiled("detect_regions")
+def region_inputs(run_dir, video_path, args):
+    # What detect_regions reads besides the video and the motion options;
+    # the regions cache key is built from the same values
+    sampling = sampling_args(args)
+    scroll_log = scale = None
+    if args.compensate == "scroll":
+        scroll_log = load_artifact(run_dir, "scroll_log")
+        scale = scroll_scale(run_dir, video_path)
+    return {
+        "every_n_frames": 3 if sampling is None else 1,
+        "sampling": sampling,
+        "scroll_log": scroll_log,
+        "scroll_scale": scale
+    }
+
+def detect_regions(run_dir, video_path, args, inputs=None):
+    # Returns the region lists of consecutive analyzed frames and each
+    # analyzed frame's (source frame index, timestamp)
+    inputs = inputs or region_inputs(run_dir, video_path, args)
+    sampling = inputs["sampling"]
+    every_n_frames = inputs["every_n_frames"]
+    scroll_log, scale = inputs["scroll_log"], inputs["scroll_scale"]
+
+    if args.dump_frames or args.workers == 1:
+        frames = iter_frames(
+            video_path=video_path,
+            every_n_frames=every_n_frames,
+            debug_dir=f"{run_dir}/frames" if args.dump_frames else None
+        )
+        if sampling:
+            frames = adaptive_frames(frames, **sampling)
+        samples = []
+        region_sequences = list(detect_motion(
+            with_samples(frames, samples),
+            threshold=args.threshold,
+            min_area=args.min_area,
+            pyramid_level=args.pyramid_level,
+            refine=args.refine,
+            compensate=args.compensate == "phase",
+            offsets=scroll_offsets(samples, scroll_log, scale) if scroll_log else None
+        ))
+    else:
+        region_sequences, samples = analyze_video_parallel(
+            video_path,
+            workers=args.workers or None,
+            every_n_frames=every_n_frames,
+            threshold=args.threshold,
+            min_area=args.min_area,
+            pyramid_level=args.pyramid_level,
+            refine=args.refine,
+            sampling=sampling,
+            compensate=args.compensate == "phase",
+            scroll_log=scroll_log,
+            scroll_scale=scale
+        )
+
+    if sampling:
+        print(f"Adaptive sampling kept {len(samples)} frames")
+
+    return {"regions": region_sequences, "samples": [list(s) for s in samples]}
+
+def network_params(args):
+    # Only non-default settings, so earlier markers and cache keys still match
+    params = {}
+    if args.har != "off":
+        params["har"] = args.har
+    if args.block_types:
+        params["block_types"] = sorted(args.block_types)
+    if args.block_domains:
+        params["block_domains"] = sorted(args.block_domains)
+    return params
+
+def settle_params(args):
+    # Virtual-time captures step on page time and never wait to settle
+    if args.capture == "virtual" or args.max_settle == 2.5:
+        return {}
+    return {"max_settle": args.max_settle}
+
+def virtual_params(args):
+    # Page time per step and frames per step shape a virtual-time capture
+    if args.capture != "virtual":
+        return {}
+    params = {"virtual_step_ms": args.virtual_step_ms, "virtual_frames": args.virtual_frames}
+    if args.screencast_max_width:
+        params["max_width"] = args.screencast_max_width
+    return params
+
+def capture_params(url, args):
+    return {"url": url, "speed": args.speed, "capture": args.capture,
+            **virtual_params(args), **network_params(args), **settle_params(args)}
+
+def analyze_params(args):
+    return {
+        "threshold": args.threshold,
+        "min_area": args.min_area,
+        "pyramid_level": args.pyramid_level,
+        "refine": args.refine,
+        "sampling": sampling_args(args),
+        "compensate": args.compensate
+    }
+
+def resolve_run_dir(target):
+    if os.path.isdir(target):
+        return target.rstrip("/")
+    return f"output/runs/{site_name(normalize_url(target))}"
+
+def capture_info(run_dir):
+    info = read_marker(run_dir, "capture")
+    if info:
+        return info
+
+    # Runs recorded before stage markers existed
+    video_path = find_recorded_video(run_dir)
+    if video_path:
+        return {"params": {"capture": "video"}, "video": os.path.relpath(video_path, run_dir)}
+    if os.path.exists(f"{run_dir}/dom_snapshots.json") or has_table(run_dir, "dom_snapshot"):
+        return {"params": {"capture": "dom"}, "video": None}
+    return require(run_dir, "capture")
+
+def capture_local(url, run_dir, args):
+    pw, browser, context, page = launch_browser(record_video=args.capture == "video")
+    # Recording starts with the page, so scroll log times measured from here
+    # line up with the video timestamps
+    video_start = time.time()
+    cdp_session = maximize_window(context, page)
+
+    captured = capture_site(
+        context, page, url, run_dir, args, video_start, cdp_session=cdp_session
+    )
+
+    browser.close()
+    pw.stop()
+
+    return captured
+
+@profiling.profiled("stage:capture")
+def run_capture(url, run_dir, args, cache=None, capture=capture_local, browser=LOCAL_BROWSER):
+    # capture(url, run_dir, args) scrolls the page in a browser and returns
+    # capture_site's result; browser describes that browser (LOCAL_BROWSER
+    # or BATCH_BROWSER)
+    invalidate(run_dir, "capture")
+    os.makedirs(run_dir, exist_ok=True)
+    start = time.time()
+
+    capture_key = capture_cache_key(cache, url, args, browser)
+    captured = load_cached_capture(cache, capture_key, url, run_dir, args)
+    if captured is None:
+        captured = capture(url, run_dir, args)
+        store_capture(cache, capture_key, url, captured)
+
+    video_path = captured["video_path"]
+    info = {
+        "params": capture_params(url, args),
+        "video": os.path.relpath(video_path, run_dir) if video_path else None
+    }
+    seconds = time.time() - start
+
+    # Screencast frames were analyzed while scrolling and are not kept, so
+    # the analyze stage has to finish before the capture counts as done
+    if captured["motion"]:
+        run_analyze(run_dir, args, info=info, motion=captured["motion"])
+
+    mark_done(run_dir, "capture", seconds, **info)
+
+@profiling.profiled("stage:analyze")
+def run_analyze(run_dir, args, cache=None, info=None, motion=None):
+    info = info or capture_info(run_dir)
+    mode = info["params"].get("capture", "video")
+    invalidate(run_dir, "analyze")
+    start = time.time()
+
+    if mode == "dom":
+        # Video-free path: element geometry sampled while scrolling stands
+        # in for motion tracks
+        motion_tracks = summarize_elements(load_artifact(run_dir, "dom_snapshots")["deltas"])
+    else:
+        video_path = os.path.join(run_dir, info["video"]) if info.get("video") else None
+        if motion is None and not (video_path and os.path.exists(video_path)):
+            raise StageError(
+                f"{run_dir} has no video to analyze"
+                + ("; screencast frames are not kept, capture again" if mode == "screencast" else "")
+            )
+        motion_tracks, samples = track_motion(run_dir, video_path, motion, args, cache)
+        # Tracks index analyzed frames; the map ties each back to the video
+        frame_map = [{"frame": frame_idx, "time": t} for frame_idx, t in samples]
+        save_artifact(run_dir, "frame_map", frame_map, args.format)
+
+    save_artifact(run_dir, "motion_tracks", motion_tracks, args.format)
+    mark_done(run_dir, "analyze", time.time() - start, params=analyze_params(args))
+
+def track_motion(run_dir, video_path, motion, args, cache=None):
+    # Returns the summarized motion tracks (TrackColumns) and the (source
+    # frame index, timestamp) of each analyzed frame
+    if motion:
+        # Screencast frames were tracked while scrolling
+        _, pipeline = motion
+        tracks, samples = pipeline.finish()
+        return tracks, [list(s) for s in samples]
+
+    _, max_dist = pyramid_params(args.pyramid_level)
+
+    # The tracks key chains the regions key, so a change upstream
+    # invalidates both
+    regions_key = tracks_key = None
+    inputs = region_inputs(run_dir, video_path, args)
+    if cache:
+        regions_key = cache.key(
+            "regions",
+            video=hash_file(video_path),
+            every_n_frames=inputs["every_n_frames"],
+            sampling=inputs["sampling"],
+            compensate=args.compensate,
+            scroll_log=hash_json(inputs["scroll_log"]) if inputs["scroll_log"] else None,
+            scroll_scale=inputs["scroll_scale"],
+            threshold=args.threshold,
+            min_area=args.min_area,
+            pyramid_level=args.pyramid_level,
+            refine=args.refine
+        )
+        tracks_key = cache.key("tracks", regions=regions_key, max_dist=max_dist, max_age=5)
+
+    def compute_tracks():
+        found = cached(
+            cache, "regions", regions_key,
+            lambda: detect_regions(run_dir, video_path, args, inputs)
+        )
+        with profiling.span("track_regions"):
+            tracker = RegionTracker(max_dist=max_dist, max_age=5)
+            for regions in found["regions"]:
+                tracker.update(regions)
+        return {"tracks": tracker.summary(), "samples": found["samples"]}
+
+    if cache is None or tracks_key is None:
+        result = compute_tracks()
+        return result["tracks"], result["samples"]
+
+    # Cache entries are JSON, so tracks go in and out as records
+    def compute_records():
+        result = compute_tracks()
+        return {"tracks": result["tracks"].records(), "samples": result["samples"]}
+
+    result = cached(cache, "tracks", tracks_key, compute_records)
+    return TrackColumns.from_records(result["tracks"]), result["samples"]
+
+@profiling.profiled("stage:correlate")
+def run_correlate(run_dir, args):
+    info = capture_info(run_dir)
+    require(run_dir, "analyze")
+    invalidate(run_dir, "correlate")
+    start = time.time()
+
+    motion_tracks = TrackColumns.load(run_dir, "motion_tracks")
+
+    if info["params"].get("capture") == "dom":
+        # DOM samples already carry the scroll position they were taken at
+        scroll_tracks = motion_tracks
+    else:
+        # Correlate motion tracks with scroll data
+        # Track frame i is the pair ending at analyzed frame i + 1
+        pair_times = [s["time"] for s in load_artifact(run_dir, "frame_map")[1:]]
+        frame_scroll_map = build_frame_scroll_map(
+            scroll_log=load_artifact(run_dir, "scroll_log"),
+            total_frames=len(pair_times),
+            frame_times=pair_times
+        )
+
+        scroll_tracks = attach_scroll_columns(
+            motion_tracks,
+            frame_scroll_map
+        )
+
+    save_artifact(run_dir, "scroll_tracks", scroll_tracks, args.format)
+    mark_done(run_dir, "correlate", time.time() - start)
+
+@profiling.profiled("stage:classify")
+def run_classify(run_dir):
+    require(run_dir, "correlate")
+    invalidate(run_dir, "classify")
+    start = time.time()
+
+    effects = build_effects_columns(
+        TrackColumns.load(run_dir, "scroll_tracks")
+    )
+
+    save_artifact(run_dir, "effects", effects)
+    mark_done(run_dir, "classify", time.time() - start, effects=len(effects))
+
+    return effects
+
+def run_pipeline(url, run_dir, args, cache=None, capture=capture_local, browser=LOCAL_BROWSER):
+    # Runs every stage that has not finished with the requested parameters.
+    # Returns {stage: seconds} for the stages run this time
+    if args.force:
+        invalidate(run_dir, "capture")
+
+    started = time.time()
+    params = {"capture": capture_params(url, args), "analyze": analyze_params(args)}
+
+    stage = next_stage(run_dir, params)
+    if stage is None:
+        print(f"{run_dir} is up to date")
+    elif stage != "capture":
+        print(f"Resuming {run_dir} from the {stage} stage")
+
+    while stage is not None:
+        if stage == "analyze" and read_marker(run_dir, "capture")["params"]["capture"] == "screencast":
+            # Screencast runs can only be re-analyzed by capturing again
+            stage = "capture"
+
+        if stage == "capture":
+            run_capture(url, run_dir, args, cache, capture, browser)
+        elif stage == "analyze":
+            run_analyze(run_dir, args, cache)
+        elif stage == "correlate":
+            run_correlate(run_dir, args)
+        else:
+            run_classify(run_dir)
+
+        stage = next_stage(run_dir, params)
+
+    timings = {}
+    for name in STAGES:
+        marker = read_marker(run_dir, name)
+        if marker and marker["finished"] >= started:
+            timings[name] = marker["seconds"]
+
+    # The artifact format is not a stage parameter, so stages finished
+    # earlier in binary only still get the requested JSON
+    if args.format != "binary" and len(timings) < len(STAGES):
+        export_json(run_dir)
+    return timings
+
+def batch_run_dirs(urls):
+    # Pages on the same host (e.g. a local test server) get the path appended
+    run_dirs = {}
+    for url in urls:
+        name = site_name(url)
+        if f"output/runs/{name}" in run_dirs.values():
+            path = re.sub(r"[^A-Za-z0-9]+", "_", urlparse(url).path).strip("_")
+            name = f"{name}_{path or len(run_dirs)}"
+        run_dirs[url] = f"output/runs/{name}"
+    return run_dirs
+
+def read_urls(path):
+    with open(path) as f:
+        return [
+            normalize_url(line.strip()) for line in f
+            if line.strip() and not line.startswith("#")
+        ]
+
+def run_batch(args):
+    urls = list(dict.fromkeys(read_urls(args.batch)))
+    run_dirs = batch_run_dirs(urls)
+    cache = open_cache(args)
+
+    def job(browser, url):
+        run_dir = run_dirs[url]
+
+        def capture(url, run_dir, args):
+            return capture_in_pool(browser, url, run_dir)
+
+        if args.command == "capture":
+            run_capture(url, run_dir, args, cache, capture, BATCH_BROWSER)
+            timings = {"capture": read_marker(run_dir, "capture")["seconds"]}
+        else:
+            timings = run_pipeline(url, run_dir, args, cache, capture, BATCH_BROWSER)
+
+        classified = read_marker(run_dir, "classify")
+        return {
+            "run_dir": run_dir,
+            "capture_seconds": timings.get("capture", 0.0),
+            "analysis_seconds": round(sum(v for k, v in timings.items() if k != "capture"), 2),
+            "effects": classified["effects"] if classified else None
+        }
+
+    def capture_in_pool(browser, url, run_dir):
+        context = browser.new_context(
+            viewport=BATCH_VIEWPORT,
+            record_video_dir=run_dir if args.capture == "video" else None,
+            record_video_size=BATCH_VIEWPORT if args.capture == "video" else None
+        )
+        context.set_default_navigation_timeout(60000)
+        context.set_default_timeout(60000)
+        page = context.new_page()
+
+        start = time.time()
+        try:
+            return capture_site(
+                context, page, url, run_dir, args, start, resize=False
+            )
+        except Exception:
+            context.close()
+            raise
+
+    results = run_capture_pool(urls, job, concurrency=args.concurrency)
+
+    os.makedirs("output/runs", exist_ok=True)
+    with open("output/runs/batch_report.json", "w") as f:
+        json.dump(results, f, indent=2)
+
+    failed = [r for r in results if r["status"] != "ok"]
+    print(f"\n{len(results) - len(failed)}/{len(results)} sites captured")
+    for r in results:
+        if r["status"] != "ok":
+            print(f"  {r['url']}: FAILED after {r['seconds']}s - {r['error']}")
+        elif r["effects"] is None:
+            print(f"  {r['url']}: capture {r['capture_seconds']}s")
+        else:
+            print(f"  {r['url']}: capture {r['capture_seconds']}s, analysis {r['analysis_seconds']}s, {r['effects']} effects")
+
+def run_enqueue(args):
+    urls = [normalize_url(u) for u in args.urls] + (read_urls(args.file) if args.file else [])
+    urls = list(dict.fromkeys(urls))
+    run_dirs = batch_run_dirs(urls)
+
+    queue = JobQueue(args.queue)
+    ids = queue.enqueue(
+        [{"url": url, "run_dir": run_dirs[url], "command": "capture" if args.capture_only else "all",
+          "options": args.options} for url in urls],
+        max_attempts=args.max_attempts,
+        timeout=args.timeout or None
+    )
+    skipped = len(urls) - len(ids)
+    print(f"Enqueued {len(ids)} jobs in {args.queue}"
+          + (f" ({skipped} already queued or running)" if skipped else ""))
+
+def job_command(job):
+    # Each job is a separate scrolldna.py run, so a hung browser can be
+    # killed without taking the worker down
+    return [sys.executable, os.path.abspath(__file__), job["command"], job["url"],
+            *job["options"], "--run-dir", job["run_dir"]]
+
+def print_status(args):
+    queue = JobQueue(args.queue)
+    counts = queue.counts()
+    print("  ".join(f"{status} {counts[status]}" for status in JOB_STATUSES))
+
+    if args.jobs:
+        for job in queue.jobs(args.jobs):
+            line = f"  #{job['id']} {job['url']} -> {job['run_dir']} (attempts {job['attempts']}/{job['max_attempts']})"
+            if job["seconds"] is not None:
+                line += f", {job['seconds']}s"
+            if job["error"]:
+                line += f": {job['error']}"
+            print(line)
+        return
+
+    now = time.time()
+    running = queue.jobs("running")
+    if running:
+        print("\nRunning:")
+        for job in running:
+            print(f"  #{job['id']} {job['url']} on {job['worker']}, {now - job['started']:.0f}s "
+                  f"(attempt {job['attempts']}/{job['max_attempts']})")
+
+    failed = queue.jobs("failed")
+    if failed:
+        print("\nFailed:")
+        for job in failed:
+            print(f"  #{job['id']} {job['url']} after {job['attempts']} attempts: {job['error']} "
+                  f"(see {job['run_dir']}/worker.log)")
+
+    # Mean seconds per stage over finished jobs
+    stage_totals = {}
+    done = queue.jobs("done")
+    for job in done:
+        for stage, seconds in (job["timings"] or {}).items():
+            totals = stage_totals.setdefault(stage, [0, 0.0])
+            totals[0] += 1
+            totals[1] += seconds
+    if stage_totals:
+        print(f"\nMean stage seconds over {len(done)} finished jobs:")
+        for stage in STAGES:
+            if stage in stage_totals:
+                n, total = stage_totals[stage]
+                print(f"  {stage:>10} {total / n:>8.2f}  ({n} runs)")
+
+def run_query(args):
+    db = EffectsDB(args.db)
+    filters = {
+        "type": args.type, "confidence": args.confidence,
+        "min_ratio": args.min_ratio, "max_ratio": args.max_ratio,
+        "scroll_from": args.scroll_from, "scroll_to": args.scroll_to,
+        "site": args.site, "url": args.url
+    }
+    start = time.perf_counter()
+    rows = db.runs(limit=args.limit, **filters) if args.runs else db.effects(limit=args.limit, **filters)
+    seconds = time.perf_counter() - start
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+
+    for r in rows:
+        if args.runs:
+            print(f"{r['site']:<32} {r['matches']:>5} effects  {r['url'] or ''}")
+        else:
+            print(f"{r['site']:<32} {r['type']:<22} {r['confidence']:<7} "
+                  f"{r['scroll_start']:>9.1f} {r['scroll_end']:>9.1f} {r['motion_ratio']:>7.3f}")
+    print(f"{len(rows)} {'runs' if args.runs else 'effects'} ({seconds * 1e3:.1f} ms)")
+
+def run_command(args):
+    if args.command == "ingest":
+        stats = EffectsDB(args.db).ingest(args.roots, prune=args.prune)
+        print(f"Ingested {stats['ingested']} runs into {args.db} ({stats['unchanged']} unchanged, "
+              f"{stats['skipped']} not classified, {stats['pruned']} pruned)")
+        return None
+    if args.command == "query":
+        run_query(args)
+        return None
+    if args.command == "enqueue":
+        run_enqueue(args)
+        return None
+    if args.command == "worker":
+        try:
+            outcome = run_worker(
+                JobQueue(args.queue), job_command, concurrency=args.concurrency,
+                poll=args.poll, lease=args.lease, exit_when_empty=args.exit_when_empty
+            )
+        except KeyboardInterrupt:
+            print("\nWorker stopped; its running jobs were returned to the queue")
+            return None
+        print(f"{outcome['done']} jobs done, {outcome['failed']} attempts failed")
+        return None
+    if args.command == "status":
+        print_status(args)
+        return None
+    if args.command == "retry":
+        count = JobQueue(args.queue).retry(args.ids)
+        print(f"Re-queued {count} jobs")
+        return None
+
+    if args.command in ("capture", "all"):
+        if args.batch:
+            run_batch(args)
+            return "output/runs/batch"
+
+        url = normalize_url(args.url)
+        run_dir = args.run_dir or f"output/runs/{site_name(url)}"
+        if args.command == "capture":
+            run_capture(url, run_dir, args, open_cache(args))
+        else:
+            run_pipeline(url, run_dir, args, open_cache(args))
+        return run_dir
+
+    run_dir = resolve_run_dir(args.run)
+    if args.command == "analyze":
+        run_analyze(run_dir, args, open_cache(args))
+    elif args.command == "correlate":
+        run_correlate(run_dir, args)
+    else:
+        effects = run_classify(run_dir)
+        print(f"{len(effects)} effects written to {run_dir}/effects.json")
+    return run_dir
+
+def main():
+    args = parse_args()
+
+    if getattr(args, "profile", None) is not None:
+        profiling.enable()
+
+    run_dir = None
+    try:
+        run_dir = run_command(args)
+    except StageError as e:
+        sys.exit(f"Error: {e}")
+    finally:
+        if profiling.enabled:
+            trace_path = args.profile or f"{run_dir or 'output'}/trace.json"
+            profiling.write_trace(trace_path)
+            print(f"\n{profiling.summary()}\n\nTrace written to {trace_path}")
 
-with open(f"{run_dir}/effects.json", "w") as f:
-    json.dump(effects, f, indent=2)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import json, os
+import numpy as np
+from pipeline.artifacts import (
+    Ragged, save_artifact, load_artifact, export_json, has_table, read_table, bundle_dir
+)
+
+SCROLL_LOG = [
+    {"time": 0.0, "scrollY": 0, "method": "standard", "step": 0, "settle_ms": 120, "settle_reason": "settled"},
+    {"time": 0.51, "scrollY": 120, "method": "standard", "step": 1, "settle_ms": 2500, "settle_reason": "network"},
+    {"time": 1.02, "scrollY": 240, "method": "wheel", "step": 2, "progress": 12.5}
+]
+
+def test_records_round_trip_through_bundle(tmp_path):
+    run_dir = str(tmp_path)
+    save_artifact(run_dir, "scroll_log", SCROLL_LOG)
+
+    assert has_table(run_dir, "scroll_log")
+    assert not os.path.exists(tmp_path / "scroll_log.json")
+    loaded = load_artifact(run_dir, "scroll_log")
+    # Keys missing from a record come back as None
+    assert [{k: v for k, v in r.items() if v is not None} for r in loaded] == SCROLL_LOG
+
+def test_columns_are_typed(tmp_path):
+    run_dir = str(tmp_path)
+    save_artifact(run_dir, "scroll_log", SCROLL_LOG)
+    table = read_table(run_dir, "scroll_log")
+    assert table.raw("scrollY").dtype == np.int64
+    assert table.raw("time").dtype == np.float64
+    assert table.column("method") == ["standard", "standard", "wheel"]
+
+def test_dom_snapshots_round_trip(tmp_path):
+    run_dir = str(tmp_path)
+    dom = {
+        "snapshot": {"id": [0, 1], "tag": ["DIV", "HEADER"], "y": [10.5, 0.0]},
+        "deltas": [
+            {"t": 0.1, "scrollY": 0, "id": [0, 1], "y": [10.5, 0.0], "removed": []},
+            {"t": 0.6, "scrollY": 120, "id": [0], "y": [-109.5], "removed": [1]}
+        ]
+    }
+    save_artifact(run_dir, "dom_snapshots", dom)
+
+    loaded = load_artifact(run_dir, "dom_snapshots")
+    assert {k: list(v) for k, v in loaded["snapshot"].items()} == dom["snapshot"]
+    assert loaded["deltas"] == dom["deltas"]
+
+def test_json_save_replaces_binary_copy(tmp_path):
+    run_dir = str(tmp_path)
+    save_artifact(run_dir, "scroll_log", SCROLL_LOG)
+    files = os.listdir(bundle_dir(run_dir))
+    save_artifact(run_dir, "scroll_log", SCROLL_LOG[:1], fmt="json")
+
+    assert not has_table(run_dir, "scroll_log")
+    assert not [f for f in os.listdir(bundle_dir(run_dir)) if f in files and f != "header.json"]
+    assert load_artifact(run_dir, "scroll_log") == SCROLL_LOG[:1]
+
+def test_export_keeps_bundle(tmp_path):
+    run_dir = str(tmp_path)
+    save_artifact(run_dir, "scroll_log", SCROLL_LOG)
+    export_json(run_dir)
+
+    assert has_table(run_dir, "scroll_log")
+    with open(tmp_path / "scroll_log.json") as f:
+        assert len(json.load(f)) == len(SCROLL_LOG)
+
+def test_ragged_select():
+    ragged = Ragged.from_lists([[1, 2], [], [3, 4, 5]])
+    assert ragged.lengths().tolist() == [2, 0, 3]
+    assert ragged.select([0, 2]).tolist() == [[1, 2], [3, 4, 5]]
+    assert ragged.select(np.array([False, True, True])).tolist() == [[], [3, 4, 5]]
@@ -0,0 +1,52 @@
+import json, os
+from pipeline.cache import StageCache
+
+def test_key_depends_on_stage_and_inputs(tmp_path):
+    cache = StageCache(str(tmp_path))
+    key = cache.key("capture", url="https://example.com", speed="1x")
+    assert key == cache.key("capture", speed="1x", url="https://example.com")
+    assert key != cache.key("capture", url="https://example.com", speed="2x")
+    assert key != cache.key("regions", url="https://example.com", speed="1x")
+
+def test_json_round_trip(tmp_path):
+    cache = StageCache(str(tmp_path))
+    key = cache.key("regions", video="abc")
+    assert cache.get_json("regions", key) is None
+    cache.put_json("regions", key, {"regions": [[[1, 2, 3, 4]]]})
+    assert cache.get_json("regions", key) == {"regions": [[[1, 2, 3, 4]]]}
+
+def test_entries_from_other_code_versions_miss(tmp_path):
+    cache = StageCache(str(tmp_path))
+    key = cache.key("tracks", regions="abc")
+    cache.put_json("tracks", key, [])
+
+    cache.versions["tracks"] = "changed"
+    assert cache.get("tracks", key) is None
+    assert cache.prune_stale() == 1
+    assert not os.path.exists(os.path.join(str(tmp_path), "tracks", key))
+
+def test_corrupt_meta_is_a_miss(tmp_path):
+    cache = StageCache(str(tmp_path))
+    key = cache.key("tracks", regions="abc")
+    cache.put_json("tracks", key, [])
+    with open(os.path.join(cache._entry("tracks", key), "meta.json"), "w") as f:
+        f.write('{"stage": "tra')
+    assert cache.get("tracks", key) is None
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = StageCache(str(tmp_path), max_bytes=10 ** 6)
+    payload = "x" * 4000
+    keys = [cache.key("regions", n=n) for n in range(3)]
+    for key in keys:
+        cache.put_json("regions", key, payload)
+    # Touch the oldest entry so the second one is now least recently used
+    assert cache.get("regions", keys[0])
+
+    with open(os.path.join(cache._entry("regions", keys[0]), "meta.json")) as f:
+        size = json.load(f)["size"]
+    cache.max_bytes = 2 * size
+    cache.evict()
+
+    assert cache.get("regions", keys[0])
+    assert cache.get("regions", keys[1]) is None
+    assert cache.get("regions", keys[2])
@@ -0,0 +1,71 @@
+import json, os, shutil
+import pytest
+from pipeline.artifacts import save_artifact
+from pipeline.effects_db import EffectsDB
+from pipeline.stages import mark_done
+
+def make_run(root, name, effects, url=None, tracks=None):
+    run_dir = os.path.join(root, name)
+    os.makedirs(run_dir)
+    mark_done(run_dir, "capture", 12.0, {"url": url or f"https://{name}", "speed": "1x", "capture": "video"})
+    with open(os.path.join(run_dir, "effects.json"), "w") as f:
+        json.dump([
+            {"type": t, "confidence": c, "scroll_range": [start, end], "motion_ratio": ratio}
+            for t, c, start, end, ratio in effects
+        ], f)
+    if tracks:
+        save_artifact(run_dir, "scroll_tracks", tracks)
+    mark_done(run_dir, "classify", 0.5)
+    return run_dir
+
+@pytest.fixture
+def runs(tmp_path):
+    root = str(tmp_path / "runs")
+    make_run(root, "a_com", [
+        ("horizontal_translate", "high", 1000, 3000, 0.8),
+        ("sticky", "medium", 0, 6000, 0.0)
+    ], tracks=[
+        {"track_id": 0, "avg_dx": 12.0, "avg_dy": 0.5, "scroll_start": 1000, "scroll_end": 3000, "frames": [1, 2, 3]}
+    ])
+    make_run(root, "b_com", [("horizontal_translate", "low", 5000, 7000, 0.3)])
+    return root
+
+def test_ingest_and_query(tmp_path, runs):
+    db = EffectsDB(str(tmp_path / "effects.sqlite"))
+    assert db.ingest([runs]) == {"ingested": 2, "unchanged": 0, "skipped": 0, "pruned": 0}
+
+    found = db.effects(type="horizontal_translate")
+    assert [(e["site"], e["confidence"]) for e in found] == [("a_com", "high"), ("b_com", "low")]
+    assert [e["site"] for e in db.effects(type="horizontal_translate", min_ratio=0.5)] == ["a_com"]
+    # Scroll ranges match when they overlap the requested one
+    assert [e["type"] for e in db.effects(scroll_from=6500, scroll_to=8000)] == ["horizontal_translate"]
+    assert [e["type"] for e in db.effects(scroll_from=3500, scroll_to=4000)] == ["sticky"]
+
+    assert [(r["site"], r["matches"]) for r in db.runs()] == [("a_com", 2), ("b_com", 1)]
+    assert db.summary()["runs"] == 2
+
+    tracks = db.tracks(os.path.join(runs, "a_com"))
+    assert len(tracks) == 1 and tracks[0]["frames"] == 3
+
+def test_unchanged_runs_are_skipped(tmp_path, runs):
+    db = EffectsDB(str(tmp_path / "effects.sqlite"))
+    db.ingest([runs])
+    assert db.ingest([runs])["unchanged"] == 2
+
+    # Re-classifying a run replaces its rows
+    run_dir = os.path.join(runs, "b_com")
+    with open(os.path.join(run_dir, "effects.json"), "w") as f:
+        json.dump([], f)
+    mark_done(run_dir, "classify", 10.75)
+    assert db.ingest([runs])["ingested"] == 1
+    assert [r["site"] for r in db.runs()] == ["a_com"]
+
+def test_prune_drops_removed_runs(tmp_path, runs):
+    db = EffectsDB(str(tmp_path / "effects.sqlite"))
+    # A trailing slash must not make the same runs look new
+    db.ingest([runs + os.sep])
+    shutil.rmtree(os.path.join(runs, "b_com"))
+
+    stats = db.ingest([runs], prune=True)
+    assert stats["pruned"] == 1 and stats["unchanged"] == 1
+    assert db.summary()["runs"] == 1
@@ -0,0 +1,68 @@
+import time
+import pytest
+from pipeline.jobs import JobQueue
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / "jobs.sqlite"))
+
+def job(url, run_dir=None):
+    return {"url": url, "run_dir": run_dir or f"output/runs/{url}", "command": "all", "options": []}
+
+def test_enqueue_skips_active_urls_and_suffixes_shared_dirs(queue):
+    assert len(queue.enqueue([job("a"), job("b")])) == 2
+    assert queue.enqueue([job("a")]) == []
+
+    queue.enqueue([job("c", "output/runs/a")])
+    assert [j["run_dir"] for j in queue.jobs()] == ["output/runs/a", "output/runs/b", "output/runs/a_2"]
+
+def test_claims_are_exclusive(queue):
+    queue.enqueue([job("a"), job("b")])
+    first = queue.claim("w1")
+    second = queue.claim("w2")
+    assert {first["url"], second["url"]} == {"a", "b"}
+    assert first["status"] == "running" and first["attempts"] == 1
+    assert queue.claim("w3") is None
+
+def test_expired_lease_is_reclaimed(queue):
+    queue.enqueue([job("a")])
+    lost = queue.claim("w1", lease=-1)
+    again = queue.claim("w2")
+    assert again["id"] == lost["id"]
+    assert again["attempts"] == 2
+
+    # The first worker no longer holds the job
+    assert queue.renew([lost["id"]], "w1") == [lost["id"]]
+    queue.finish(lost["id"], "w1", ok=True, seconds=1.0)
+    assert queue.jobs()[0]["status"] == "running"
+
+def test_failures_retry_until_attempts_run_out(queue):
+    queue.enqueue([job("a")], max_attempts=2)
+    for attempt in range(2):
+        claimed = queue.claim("w1")
+        assert claimed["attempts"] == attempt + 1
+        queue.finish(claimed["id"], "w1", ok=False, seconds=0.5, error="boom")
+
+    assert queue.claim("w1") is None
+    assert queue.counts()["failed"] == 1
+
+    assert queue.retry() == 1
+    claimed = queue.claim("w1")
+    assert claimed["attempts"] == 1
+    queue.finish(claimed["id"], "w1", ok=True, seconds=2.0, timings={"capture": 2.0})
+    done = queue.jobs("done")[0]
+    assert done["timings"] == {"capture": 2.0} and done["error"] is None
+
+def test_release_returns_the_attempt(queue):
+    queue.enqueue([job("a")])
+    claimed = queue.claim("w1")
+    queue.release(claimed["id"], "w1")
+    assert queue.jobs()[0]["status"] == "queued"
+    assert queue.claim("w2")["attempts"] == 1
+
+def test_abandoned_job_on_last_attempt_fails(queue):
+    queue.enqueue([job("a")], max_attempts=1)
+    queue.claim("w1", lease=-1)
+    assert queue.claim("w2") is None
+    failed = queue.jobs("failed")[0]
+    assert failed["error"] == "worker lost"
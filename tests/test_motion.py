@@ -0,0 +1,52 @@
+from analysis.motion import RegionTracker, track_regions
+
+def box(cx, cy, size=10):
+    return (cx - size / 2, cy - size / 2, size, size)
+
+def test_regions_follow_nearest_track():
+    tracker = RegionTracker(max_dist=40)
+    tracker.update([box(100, 100), box(300, 100)])
+    tracker.update([box(310, 105), box(110, 95)])
+
+    assert len(tracker.tracks) == 2
+    first, second = tracker.tracks
+    assert first["frames"] == [0, 1]
+    assert first["centers"][-1] == (110, 95)
+    assert second["centers"][-1] == (310, 105)
+
+def test_each_track_takes_one_region():
+    tracker = RegionTracker(max_dist=40)
+    tracker.update([box(100, 100)])
+    # Both are in range; the nearer one continues the track
+    tracker.update([box(120, 100), box(105, 100)])
+
+    assert len(tracker.tracks) == 2
+    assert tracker.tracks[0]["centers"][-1] == (105, 100)
+    assert tracker.tracks[1]["frames"] == [1]
+
+def test_regions_out_of_range_start_new_tracks():
+    tracks = track_regions([[box(100, 100)], [box(200, 100)]], max_dist=40)
+    assert [t["frames"] for t in tracks] == [[0], [1]]
+
+def test_tracks_expire_after_max_age():
+    tracker = RegionTracker(max_dist=40, max_age=2)
+    tracker.update([box(100, 100)])
+    tracker.update([])
+    tracker.update([])
+    tracker.update([])
+    tracker.update([box(100, 100)])
+    assert len(tracker.tracks) == 2
+
+def test_store_matches_tracks():
+    tracker = RegionTracker(max_dist=40)
+    for x in range(100, 160, 10):
+        tracker.update([box(x, 100), box(400, 100 + x)])
+
+    store = tracker.store()
+    assert store.offsets.tolist() == [0, 6, 12]
+    assert store.frame[:6].tolist() == list(range(6))
+    assert store.cx[:6].tolist() == list(range(100, 160, 10))
+
+    summary = tracker.summary()
+    assert summary["avg_dx"].tolist() == [10.0, 0.0]
+    assert summary["avg_dy"].tolist() == [0.0, 10.0]
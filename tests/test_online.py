@@ -0,0 +1,65 @@
+import base64, queue, threading
+import cv2
+import numpy as np
+import pytest
+from analysis.online import OnlinePipeline
+from capture.screencast import Screencast, iter_screencast_frames
+
+class FakeCDPSession:
+    def on(self, event, handler):
+        pass
+
+    def send(self, method, params=None):
+        return {}
+
+def screencast_frame(i):
+    frame = np.zeros((48, 64), dtype=np.uint8)
+    frame[10:20, i % 40:i % 40 + 10] = 255
+    data = base64.b64encode(cv2.imencode(".jpg", frame)[1].tobytes()).decode()
+    return {"data": data, "sessionId": i, "metadata": {"timestamp": 1000.0 + i / 30}}
+
+def failing_after(frames, count):
+    for i, item in enumerate(frames):
+        if i == count:
+            raise RuntimeError("decode failed")
+        yield item
+
+def test_decode_failure_drains_screencast_queue():
+    # Frames are pushed the way Playwright delivers CDP events; a failed
+    # decode must not leave the producer blocked on the full queue
+    frame_queue = queue.Queue(maxsize=4)
+    screencast = Screencast(FakeCDPSession(), frame_queue, start_time=1000.0)
+    screencast.start()
+
+    pipeline = OnlinePipeline(
+        failing_after(iter_screencast_frames(frame_queue), 3),
+        queue_size=2, source=frame_queue
+    ).start()
+
+    def produce():
+        for i in range(200):
+            screencast._on_frame(screencast_frame(i))
+        screencast.stop()
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    producer.join(timeout=5)
+    assert not producer.is_alive()
+
+    with pytest.raises(RuntimeError, match="decode failed"):
+        pipeline.finish()
+
+def test_decode_failure_after_end_marker_finishes():
+    # The generator took the end marker before failing; finish() must not
+    # wait for another one
+    frame_queue = queue.Queue()
+    frame_queue.put(None)
+
+    def frames():
+        assert frame_queue.get() is None
+        raise RuntimeError("decode failed")
+        yield
+
+    pipeline = OnlinePipeline(frames(), source=frame_queue).start()
+    with pytest.raises(RuntimeError):
+        pipeline.finish()
@@ -0,0 +1,37 @@
+from analysis.parallel import split_segments, segments_agree
+
+def test_segments_cover_every_sampled_frame_once():
+    segments = split_segments(100, 3, 4)
+    assert len(segments) == 4
+    assert segments[0][0] == 0
+    # Each segment ends on the first frame of the next one
+    for (_, stop), (start, _) in zip(segments, segments[1:]):
+        assert stop == start + 1
+    # The last segment decodes to the end of the video
+    assert segments[-1][1] is None
+
+def test_segments_start_on_sampled_frames():
+    for start, _ in split_segments(1000, 7, 6):
+        assert start % 7 == 0
+
+def test_workers_capped_by_frame_pairs():
+    assert len(split_segments(9, 3, 8)) == 2
+    assert split_segments(2, 3, 4) == []
+    assert split_segments(0, 1, 4) == []
+
+def samples(indices):
+    return [(i, i / 30) for i in indices]
+
+def test_segments_agree_on_shared_boundaries():
+    segments = [(0, 7), (6, None)]
+    results = [([], samples([0, 3, 6])), ([], samples([6, 9, 12]))]
+    assert segments_agree(segments, results)
+
+def test_segments_disagree_after_inaccurate_seek():
+    segments = [(0, 7), (6, None)]
+    # The second segment landed on frame 8 instead of 6
+    assert not segments_agree(segments, [([], samples([0, 3, 6])), ([], samples([8, 11]))])
+    # Same index, different picture time
+    assert not segments_agree(segments, [([], samples([0, 3, 6])), ([], [(6, 0.5), (9, 0.6)])])
+    # A segment that decoded nothing
+    assert not segments_agree(segments, [([], samples([0, 3, 6])), ([], [])])